@@ -54,20 +54,18 @@ SPACY_UNIVERSAL_POS_TAGS = spacy_conf.tags['Universal Part-of-speech Tags']
 
 SPACY_PIPELINE_TAGS = spacy_conf.pipeline_tags
 
-SPACY_DEFAULT_STOPWORDS = spacy.load(LANG).Defaults.stop_words
-
-# Text normalizer instances
-
-LEMMATIZER_INSTANCE = spacy.load(LANG, disable=['parser', 'ner'])
-
-POS_TAGGER_INSTANCE = spacy.load(LANG, disable=SPACY_PIPELINE_TAGS[1:])
-
-NER_INSTANCE = spacy.load(LANG, disable=['tagger',
-                                         'parser',
-                                         'textcat',
-                                         'sentencizer',
-                                         'merge_noun_chunks',
-                                         'merge_subtokens'])
+SPACY_DEFAULT_STOPWORDS = spacy.util.get_lang_class(LANG.split('_')[0]).Defaults.stop_words
+
+# Text normalizer pipeline components disabled by step (one shared spaCy instance, loaded at first use)
+
+SPACY_DISABLED_PIPES = {'lemmatizer': ['parser', 'ner'],
+                        'pos_tagger': SPACY_PIPELINE_TAGS[1:],
+                        'ner': ['tagger',
+                                'parser',
+                                'textcat',
+                                'sentencizer',
+                                'merge_noun_chunks',
+                                'merge_subtokens']}
 
 
 ########################################################################################################################
@@ -1,8 +1,11 @@
 from flask import Flask
 from flask import request, render_template, jsonify
-from config.app_config import APP_LOGO_NAME, TEXT_NORMALIZER_PARAMS, multilabel_encoder, gru_tokenizer, gru, keras
-from src.text_preprocessor import filter_html_tags, tokenize, text_normalizer
-from utils.autotagger import words_translator, autotag_question
+from config.app_config import APP_LOGO_NAME, HTML_FILTER_PARAMS, BULK_TAGGING_PARAMS, GRU_INFERENCE_MODE, \
+                              TAG_DECODING_PARAMS, GRU_INPUT_LENGTH, multilabel_encoder, gru_tokenizer, gru, \
+                              gru_predictor, gru_batcher, text_translator, compiled_text_normalizer, prediction_cache
+from src.text_preprocessor import filter_html_tags, tokenize
+from utils.autotagger import words_translator, autotag_question, vectorize_questions, cached_autotag_questions, \
+                            compare_inference_modes, INFERENCE_MODES
 
 
 ########################################################################################################################
@@ -13,6 +16,25 @@ from utils.autotagger import words_translator, autotag_question
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
 
+def normalize_question(question):
+    """
+    Question text preprocessing (filter HTML tags, translate to english, tokenize, normalize question)
+
+    :param question: a raw question (str)
+
+    :return: normalized tokens (list of strings)
+    """
+    # Filter HTML tags
+    question = filter_html_tags(question, **HTML_FILTER_PARAMS)
+    # Translate a question from an unknown language to english
+    question = words_translator(question, translator=text_translator)
+    # Lowerize & Tokenize question
+    tokenized_question = tokenize(question, lowerize=True)
+    # Normalise tokenized question
+    normalized_tokens = compiled_text_normalizer(tokenized_question)
+    return normalized_tokens
+
+
 ########################################################################################################################
 #                                               MAIN VIEW                                                              #
 ########################################################################################################################
@@ -44,23 +66,100 @@ def tag_question():
     :return: question predicted tags (JSON)
     """
     question = request.form['text']
-    # Filter HTML tags
-    question = filter_html_tags(question)
-    # Translate a question from an unknown language to english
-    question = words_translator(question)
-    # Lowerize & Tokenize question
-    tokenized_question = tokenize(question, lowerize=True)
-    # Normalise tokenized question
-    normalized_tokens = text_normalizer(tokenized_question, **TEXT_NORMALIZER_PARAMS)
+    # Inference mode ('token' or 'question', see GRU_INFERENCE_MODE)
+    mode = request.args.get('mode', GRU_INFERENCE_MODE)
+    if mode not in INFERENCE_MODES:
+        return jsonify({'error': f"expected mode in {', '.join(INFERENCE_MODES)}"}), 400
+    # Text preprocessing
+    normalized_tokens = normalize_question(question)
     # GRU preprocessing (preprocess normalized tokens)
-    padded_question = keras.preprocessing.sequence.pad_sequences(gru_tokenizer.texts_to_sequences(normalized_tokens),
-                                                                 maxlen=gru.get_layer('embedding').input_length)
-    # GRU Predicted tags
-    gru_predicted_tags = autotag_question(padded_question, gru, multilabel_encoder)
+    padded_question, _ = vectorize_questions([normalized_tokens],
+                                             gru_tokenizer,
+                                             maxlen=GRU_INPUT_LENGTH,
+                                             mode=mode)
+    # GRU Predicted tags (already seen questions are read from prediction cache)
+    cache_key = prediction_cache.make_key(padded_question) if prediction_cache is not None else None
+    gru_predicted_tags = prediction_cache.get(cache_key) if prediction_cache is not None else None
+    if gru_predicted_tags is None:
+        gru_predicted_tags = autotag_question(padded_question, gru_predictor, multilabel_encoder, **TAG_DECODING_PARAMS)
+        if prediction_cache is not None:
+            prediction_cache.set(cache_key, gru_predicted_tags)
     predicted_tags_by_model = {'GRU': gru_predicted_tags}
     return jsonify(predicted_tags_by_model)
 
 
+@app.route('/_tag_questions', methods=['POST'])
+def tag_questions():
+    """
+    Bulk question tagger feature which implies :
+        - Retrieve questions from JSON request body (list of strings)
+        - Text preprocessing of each question
+        - Auto-tag all questions at once with deep neural network model (GRU)
+
+    :return: predicted tags of each question (JSON list, same order as input questions)
+    """
+    questions = request.get_json(force=True, silent=True)
+    if type(questions) is not list or not all(type(question) is str for question in questions):
+        return jsonify({'error': 'expected a JSON list of questions (strings)'}), 400
+    # Inference mode ('token' or 'question', see GRU_INFERENCE_MODE)
+    mode = request.args.get('mode', GRU_INFERENCE_MODE)
+    if mode not in INFERENCE_MODES:
+        return jsonify({'error': f"expected mode in {', '.join(INFERENCE_MODES)}"}), 400
+    # Text preprocessing
+    normalized_questions = [normalize_question(question) for question in questions]
+    # GRU preprocessing (one padded matrix for all questions)
+    padded_questions, question_ids = vectorize_questions(normalized_questions,
+                                                         gru_tokenizer,
+                                                         maxlen=GRU_INPUT_LENGTH,
+                                                         mode=mode)
+    # GRU Predicted tags (only questions missing from prediction cache are predicted)
+    gru_predicted_tags = cached_autotag_questions(padded_questions,
+                                                  question_ids,
+                                                  len(questions),
+                                                  gru_predictor,
+                                                  multilabel_encoder,
+                                                  prediction_cache=prediction_cache,
+                                                  **BULK_TAGGING_PARAMS,
+                                                  **TAG_DECODING_PARAMS)
+    predicted_tags_by_model = [{'GRU': question_predicted_tags} for question_predicted_tags in gru_predicted_tags]
+    return jsonify(predicted_tags_by_model)
+
+
+@app.route('/_compare_inference_modes', methods=['POST'])
+def compare_gru_inference_modes():
+    """
+    Compare GRU inference modes ('token' & 'question') on a JSON list of questions
+
+    :return: latency of each inference mode & tag agreement between modes (JSON)
+    """
+    questions = request.get_json(force=True, silent=True)
+    if type(questions) is not list or not all(type(question) is str for question in questions):
+        return jsonify({'error': 'expected a JSON list of questions (strings)'}), 400
+    # Text preprocessing
+    normalized_questions = [normalize_question(question) for question in questions]
+    # Latency & tag agreement report
+    report = compare_inference_modes(normalized_questions,
+                                     gru_tokenizer,
+                                     GRU_INPUT_LENGTH,
+                                     gru,
+                                     multilabel_encoder,
+                                     **BULK_TAGGING_PARAMS)
+    return jsonify(report)
+
+
+@app.route('/_metrics', methods=['GET'])
+def metrics():
+    """
+    Inference metrics (GRU micro-batching queue depth, batch size & wait time, prediction cache hits & misses,
+    text normalizer vocabularies)
+
+    :return: metrics (JSON)
+    """
+    return jsonify({'micro_batcher': gru_batcher.get_metrics(),
+                    'prediction_cache': prediction_cache.get_stats() if prediction_cache is not None else None,
+                    'vocabularies': compiled_text_normalizer.get_vocabulary_stats()})
+
+
 ########################################################################################################################
 #                                                  RUN APP                                                             #
 ########################################################################################################################
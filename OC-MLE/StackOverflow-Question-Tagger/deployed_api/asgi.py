@@ -0,0 +1,241 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from config.app_config import APP_LOGO_NAME, HTML_FILTER_PARAMS, BULK_TAGGING_PARAMS, GRU_INFERENCE_MODE, \
+                              TAG_DECODING_PARAMS, GRU_INPUT_LENGTH, ASGI_PARAMS, multilabel_encoder, gru_tokenizer, \
+                              gru, gru_predictor, gru_batcher, text_translator, compiled_text_normalizer, \
+                              prediction_cache
+from src.text_preprocessor import filter_html_tags, tokenize
+from utils.autotagger import words_translator, autotag_question, vectorize_questions, cached_autotag_questions, \
+                            compare_inference_modes, INFERENCE_MODES
+
+
+########################################################################################################################
+#                                            APP PREPROCESSING                                                         #
+########################################################################################################################
+
+# Translation I/O threads & bounded pools of CPU-bound work (normalization & prediction)
+io_executor = ThreadPoolExecutor(max_workers=ASGI_PARAMS['io_workers'], thread_name_prefix='io')
+cpu_executor = ThreadPoolExecutor(max_workers=ASGI_PARAMS['cpu_workers'], thread_name_prefix='cpu')
+if ASGI_PARAMS['normalization_pool'] == 'process':
+    normalization_executor = ProcessPoolExecutor(max_workers=ASGI_PARAMS['cpu_workers'])
+elif ASGI_PARAMS['normalization_pool'] == 'thread':
+    normalization_executor = cpu_executor
+else:
+    raise Exception(f"{ASGI_PARAMS['normalization_pool']} normalization pool not implemented")
+
+# Templates (same url_for('static', filename=...) calls as Flask templates)
+templates = Jinja2Templates(directory='templates')
+templates.env.globals['url_for'] = lambda name, filename: f'/{name}/{filename}'
+
+
+def filter_question(question):
+    """
+    Filter HTML tags of a raw question (CPU-bound)
+
+    :param question: a raw question (str)
+
+    :return: question text (str)
+    """
+    return filter_html_tags(question, **HTML_FILTER_PARAMS)
+
+
+def normalize_translated_question(question):
+    """
+    Lowerize, tokenize & normalize a translated question (CPU-bound)
+
+    :param question: a translated question (str)
+
+    :return: normalized tokens (list of strings)
+    """
+    return compiled_text_normalizer(tokenize(question, lowerize=True))
+
+
+async def normalize_question(question):
+    """
+    Question text preprocessing (filter HTML tags, translate to english, tokenize, normalize question), translation
+    I/O is awaited in I/O threads, CPU-bound steps run in the bounded normalization pool
+
+    :param question: a raw question (str)
+
+    :return: normalized tokens (list of strings)
+    """
+    loop = asyncio.get_running_loop()
+    # Filter HTML tags
+    question = await loop.run_in_executor(normalization_executor, filter_question, question)
+    # Translate a question from an unknown language to english
+    question = await loop.run_in_executor(io_executor, words_translator, question, 'en', text_translator)
+    # Lowerize, tokenize & normalise question
+    return await loop.run_in_executor(normalization_executor, normalize_translated_question, question)
+
+
+def tag_normalized_question(normalized_tokens, mode):
+    """
+    Auto-tag a normalized question with GRU model (CPU-bound, same steps as app.tag_question)
+
+    :param normalized_tokens: normalized tokens (list of strings)
+    :param mode: inference mode ('token' or 'question')
+
+    :return: predicted tags (list of strings)
+    """
+    padded_question, _ = vectorize_questions([normalized_tokens], gru_tokenizer, maxlen=GRU_INPUT_LENGTH, mode=mode)
+    cache_key = prediction_cache.make_key(padded_question) if prediction_cache is not None else None
+    gru_predicted_tags = prediction_cache.get(cache_key) if prediction_cache is not None else None
+    if gru_predicted_tags is None:
+        gru_predicted_tags = autotag_question(padded_question, gru_predictor, multilabel_encoder, **TAG_DECODING_PARAMS)
+        if prediction_cache is not None:
+            prediction_cache.set(cache_key, gru_predicted_tags)
+    return gru_predicted_tags
+
+
+def tag_normalized_questions(normalized_questions, mode):
+    """
+    Auto-tag a batch of normalized questions with GRU model (CPU-bound, same steps as app.tag_questions)
+
+    :param normalized_questions: list of normalized questions (list of lists of tokens)
+    :param mode: inference mode ('token' or 'question')
+
+    :return: predicted tags of each question (list of lists of strings)
+    """
+    padded_questions, question_ids = vectorize_questions(normalized_questions,
+                                                         gru_tokenizer,
+                                                         maxlen=GRU_INPUT_LENGTH,
+                                                         mode=mode)
+    return cached_autotag_questions(padded_questions,
+                                    question_ids,
+                                    len(normalized_questions),
+                                    gru_predictor,
+                                    multilabel_encoder,
+                                    prediction_cache=prediction_cache,
+                                    **BULK_TAGGING_PARAMS,
+                                    **TAG_DECODING_PARAMS)
+
+
+async def get_questions(request):
+    """
+    Retrieve questions from JSON request body
+
+    :param request: a starlette request
+
+    :return: questions (list of strings, None if request body is not a JSON list of strings)
+    """
+    try:
+        questions = await request.json()
+    except ValueError:
+        return None
+    if type(questions) is not list or not all(type(question) is str for question in questions):
+        return None
+    return questions
+
+
+########################################################################################################################
+#                                               MAIN VIEW                                                              #
+########################################################################################################################
+
+
+async def index(request):
+    """
+    API landing page
+
+    :return: main API view (landing page)
+    """
+    return templates.TemplateResponse(request, 'index.html', {'image_name': APP_LOGO_NAME})
+
+
+########################################################################################################################
+#                                                 TASKS                                                                #
+########################################################################################################################
+
+
+async def tag_question(request):
+    """
+    Question tagger feature (same JSON contract as app.tag_question)
+
+    :return: question predicted tags (JSON)
+    """
+    form = await request.form()
+    if 'text' not in form:
+        return JSONResponse({'error': "expected a 'text' form field"}, status_code=400)
+    mode = request.query_params.get('mode', GRU_INFERENCE_MODE)
+    if mode not in INFERENCE_MODES:
+        return JSONResponse({'error': f"expected mode in {', '.join(INFERENCE_MODES)}"}, status_code=400)
+    normalized_tokens = await normalize_question(form['text'])
+    gru_predicted_tags = await asyncio.get_running_loop().run_in_executor(cpu_executor,
+                                                                          tag_normalized_question,
+                                                                          normalized_tokens,
+                                                                          mode)
+    return JSONResponse({'GRU': gru_predicted_tags})
+
+
+async def tag_questions(request):
+    """
+    Bulk question tagger feature (same JSON contract as app.tag_questions, questions are normalized concurrently)
+
+    :return: predicted tags of each question (JSON list, same order as input questions)
+    """
+    questions = await get_questions(request)
+    if questions is None:
+        return JSONResponse({'error': 'expected a JSON list of questions (strings)'}, status_code=400)
+    mode = request.query_params.get('mode', GRU_INFERENCE_MODE)
+    if mode not in INFERENCE_MODES:
+        return JSONResponse({'error': f"expected mode in {', '.join(INFERENCE_MODES)}"}, status_code=400)
+    normalized_questions = await asyncio.gather(*[normalize_question(question) for question in questions])
+    gru_predicted_tags = await asyncio.get_running_loop().run_in_executor(cpu_executor,
+                                                                          tag_normalized_questions,
+                                                                          list(normalized_questions),
+                                                                          mode)
+    return JSONResponse([{'GRU': question_predicted_tags} for question_predicted_tags in gru_predicted_tags])
+
+
+async def compare_gru_inference_modes(request):
+    """
+    Compare GRU inference modes ('token' & 'question') on a JSON list of questions
+
+    :return: latency of each inference mode & tag agreement between modes (JSON)
+    """
+    questions = await get_questions(request)
+    if questions is None:
+        return JSONResponse({'error': 'expected a JSON list of questions (strings)'}, status_code=400)
+    normalized_questions = await asyncio.gather(*[normalize_question(question) for question in questions])
+    report = await asyncio.get_running_loop().run_in_executor(cpu_executor,
+                                                              lambda: compare_inference_modes(
+                                                                  list(normalized_questions),
+                                                                  gru_tokenizer,
+                                                                  GRU_INPUT_LENGTH,
+                                                                  gru,
+                                                                  multilabel_encoder,
+                                                                  **BULK_TAGGING_PARAMS))
+    return JSONResponse(report)
+
+
+async def metrics(request):
+    """
+    Inference metrics (GRU micro-batching queue depth, batch size & wait time, prediction cache hits & misses,
+    text normalizer vocabularies)
+
+    :return: metrics (JSON)
+    """
+    return JSONResponse({'micro_batcher': gru_batcher.get_metrics(),
+                         'prediction_cache': prediction_cache.get_stats() if prediction_cache is not None else None,
+                         'vocabularies': compiled_text_normalizer.get_vocabulary_stats()})
+
+
+########################################################################################################################
+#                                                  RUN APP                                                             #
+########################################################################################################################
+
+# Main app configuration (run with : uvicorn asgi:app --workers 4)
+app = Starlette(routes=[Route('/', index, methods=['GET', 'POST']),
+                        Route('/_tag_question', tag_question, methods=['POST']),
+                        Route('/_tag_questions', tag_questions, methods=['POST']),
+                        Route('/_compare_inference_modes', compare_gru_inference_modes, methods=['POST']),
+                        Route('/_metrics', metrics, methods=['GET']),
+                        Mount('/static', app=StaticFiles(directory='static'), name='static')])
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app)
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import argparse
+import functools
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from config.app_config import HTML_FILTER_PARAMS, GRU_INFERENCE_MODE, TAG_DECODING_PARAMS, GRU_INPUT_LENGTH, \
+                              multilabel_encoder, gru_tokenizer, gru, text_translator, compiled_text_normalizer
+from src.text_preprocessor import filter_html_tags, tokenize
+from utils.autotagger import words_translator, vectorize_questions, autotag_questions
+
+
+########################################################################################################################
+#                                            QUESTIONS PREPROCESSING                                                   #
+########################################################################################################################
+
+
+def normalize_text(text, translate=False):
+    """
+    Question text preprocessing (filter HTML tags, translate to english, tokenize, normalize question), run in
+    normalization worker processes
+
+    :param text: a raw question (str)
+    :param translate: translate questions to english (boolean, each translation may be a network call)
+
+    :return: normalized tokens (list of strings)
+    """
+    text = filter_html_tags(text if isinstance(text, str) else '', **HTML_FILTER_PARAMS)
+    if translate:
+        text = words_translator(text, translator=text_translator)
+    return compiled_text_normalizer(tokenize(text, lowerize=True))
+
+
+def tag_chunk(chunk, text_columns, executor, n_workers, translate=False, mode=GRU_INFERENCE_MODE, batch_size=4096,
+              tags_separator=' '):
+    """
+    Predict tags of a chunk of questions
+
+    :param chunk: a chunk of questions (dataframe)
+    :param text_columns: question text columns (joined, e.g. ['Title', 'Body'])
+    :param executor: normalization process pool
+    :param n_workers: number of normalization processes
+    :param translate: translate questions to english (boolean)
+    :param mode: inference mode ('token' or 'question')
+    :param batch_size: maximum number of padded sequences predicted at once
+    :param tags_separator: predicted tags separator
+
+    :return: predicted tags of each question (list of strings)
+    """
+    texts = chunk[text_columns].fillna('').astype(str).agg(' '.join, axis=1).tolist()
+    # Normalization in worker processes (large map chunks to limit inter-process communication)
+    normalized_questions = list(executor.map(functools.partial(normalize_text, translate=translate),
+                                             texts,
+                                             chunksize=max(1, len(texts) // (4 * n_workers))))
+    padded_questions, question_ids = vectorize_questions(normalized_questions, gru_tokenizer, GRU_INPUT_LENGTH,
+                                                         mode=mode)
+    predicted_tags = autotag_questions(padded_questions,
+                                       question_ids,
+                                       len(texts),
+                                       gru,
+                                       multilabel_encoder,
+                                       chunk_size=batch_size,
+                                       **TAG_DECODING_PARAMS)
+    return [tags_separator.join(tags) for tags in predicted_tags]
+
+
+########################################################################################################################
+#                                                 INPUT / OUTPUT                                                       #
+########################################################################################################################
+
+
+def get_file_format(path, file_format=None):
+    """
+    Get file format from its extension
+
+    :param path: file path
+    :param file_format: forced file format ('csv' or 'parquet', None uses file extension)
+
+    :return: file format ('csv' or 'parquet')
+    """
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format not in ['csv', 'parquet']:
+        raise Exception(f'{file_format} file format not implemented')
+    return file_format
+
+
+def iter_input_chunks(path, columns, chunk_size=10000, skip_rows=0, file_format=None):
+    """
+    Stream input questions chunk by chunk (only one chunk is loaded in memory)
+
+    :param path: input file path (CSV or Parquet)
+    :param columns: loaded columns
+    :param chunk_size: number of questions by chunk
+    :param skip_rows: number of first questions skipped (already tagged questions when resuming)
+    :param file_format: forced file format ('csv' or 'parquet')
+
+    :return: chunks of questions (dataframe generator)
+    """
+    if get_file_format(path, file_format) == 'csv':
+        yield from pd.read_csv(path,
+                               usecols=columns,
+                               chunksize=chunk_size,
+                               skiprows=lambda i: 0 < i <= skip_rows)
+    else:
+        import pyarrow.parquet as pq
+        rows_to_skip = skip_rows
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            if rows_to_skip >= batch.num_rows:
+                rows_to_skip -= batch.num_rows
+                continue
+            yield batch.slice(rows_to_skip).to_pandas()
+            rows_to_skip = 0
+
+
+class TagsWriter:
+
+    def __init__(self, path, file_format=None, resume_offset=None):
+        """
+        Incremental writer of predicted tags (CSV file or folder of Parquet part files)
+
+        :param path: output path (CSV file or Parquet folder)
+        :param file_format: forced file format ('csv' or 'parquet')
+        :param resume_offset: output offset saved in checkpoint (CSV size in bytes or number of Parquet parts),
+        output written after this offset (by an interrupted run) is discarded
+        """
+        self.path = path
+        self.file_format = get_file_format(path, file_format)
+        if self.file_format == 'csv':
+            if resume_offset is not None and os.path.exists(path):
+                with open(path, 'r+b') as file:
+                    file.truncate(resume_offset)
+            elif os.path.exists(path):
+                os.remove(path)
+            self.offset = resume_offset or 0
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.offset = resume_offset or 0
+            # Remove parts written after checkpoint (or all parts for a new run)
+            for filename in os.listdir(path):
+                if filename.startswith('part-') and int(filename[5:11]) >= self.offset:
+                    os.remove(os.path.join(path, filename))
+
+    def write(self, chunk):
+        """
+        Write a chunk of predicted tags
+
+        :param chunk: predicted tags chunk (dataframe)
+
+        :return: output offset after writing chunk (saved in checkpoint)
+        """
+        if self.file_format == 'csv':
+            with open(self.path, 'a', newline='') as file:
+                chunk.to_csv(file, header=self.offset == 0, index=False)
+                file.flush()
+                os.fsync(file.fileno())
+            self.offset = os.path.getsize(self.path)
+        else:
+            part_path = os.path.join(self.path, f'part-{self.offset:06d}.parquet')
+            chunk.to_parquet(part_path + '.tmp', index=False)
+            os.replace(part_path + '.tmp', part_path)
+            self.offset += 1
+        return self.offset
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Load a bulk tagging checkpoint
+
+    :param checkpoint_path: checkpoint path (JSON file)
+
+    :return: checkpoint (dict with 'rows' : number of tagged questions & 'output_offset', None if no checkpoint)
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as file:
+        return json.load(file)
+
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """
+    Save a bulk tagging checkpoint atomically
+
+    :param checkpoint_path: checkpoint path (JSON file)
+    :param checkpoint: checkpoint (dict)
+    """
+    with open(checkpoint_path + '.tmp', 'w') as file:
+        json.dump(checkpoint, file)
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+
+########################################################################################################################
+#                                                  BULK TAGGING                                                        #
+########################################################################################################################
+
+
+def run_bulk_tagging(input_path, output_path, id_column='Id', text_columns=('Title', 'Body'), keep_columns=(),
+                     chunk_size=10000, batch_size=4096, n_workers=None, mode=GRU_INFERENCE_MODE, translate=False,
+                     tags_separator=' ', checkpoint_path=None, resume=False, input_format=None, output_format=None):
+    """
+    Tag a CSV/Parquet questions dump chunk by chunk (memory only depends on chunk size)
+
+    :param input_path: input questions path (CSV or Parquet file, e.g. Stack Exchange Data Explorer export)
+    :param output_path: output path (CSV file or Parquet folder)
+    :param id_column: question id column
+    :param text_columns: question text columns (joined)
+    :param keep_columns: other input columns copied to output (e.g. ['Tags'])
+    :param chunk_size: number of questions by chunk
+    :param batch_size: maximum number of padded sequences predicted at once
+    :param n_workers: number of normalization processes (default is number of CPUs)
+    :param mode: inference mode ('token' or 'question')
+    :param translate: translate questions to english (boolean)
+    :param tags_separator: predicted tags separator
+    :param checkpoint_path: checkpoint path (default is output path + '.checkpoint.json')
+    :param resume: resume from checkpoint (boolean)
+    :param input_format: forced input format ('csv' or 'parquet')
+    :param output_format: forced output format ('csv' or 'parquet')
+
+    :return: number of tagged questions
+    """
+    checkpoint_path = checkpoint_path or f'{output_path}.checkpoint.json'
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint is None:
+        checkpoint = {'rows': 0, 'output_offset': None}
+    writer = TagsWriter(output_path, file_format=output_format, resume_offset=checkpoint['output_offset'])
+    columns = [id_column] + list(text_columns) + list(keep_columns)
+    n_workers = n_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for chunk in iter_input_chunks(input_path, columns, chunk_size, checkpoint['rows'], input_format):
+            start_time = time.perf_counter()
+            output_chunk = chunk[[id_column] + list(keep_columns)].copy()
+            output_chunk['PredictedTags'] = tag_chunk(chunk, list(text_columns), executor, n_workers, translate, mode,
+                                                      batch_size, tags_separator)
+            checkpoint['output_offset'] = writer.write(output_chunk)
+            checkpoint['rows'] += len(chunk)
+            save_checkpoint(checkpoint_path, checkpoint)
+            print(f"{checkpoint['rows']} questions tagged ({len(chunk) / (time.perf_counter() - start_time):.1f} "
+                  f"questions/s)")
+    return checkpoint['rows']
+
+
+if __name__ == '__main__':
+    # e.g. python bulk_tagger.py ../data/csv/data_2019/QueryResults.csv predicted_tags.parquet --keep-columns Tags
+    parser = argparse.ArgumentParser(description='Bulk tagging of Stack Overflow questions (CSV/Parquet dumps)')
+    parser.add_argument('input', help='input questions file (.csv or .parquet)')
+    parser.add_argument('output', help='output file (.csv) or folder of part files (.parquet)')
+    parser.add_argument('--id-column', default='Id')
+    parser.add_argument('--text-columns', nargs='+', default=['Title', 'Body'])
+    parser.add_argument('--keep-columns', nargs='*', default=[], help='input columns copied to output')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='number of questions loaded at once')
+    parser.add_argument('--batch-size', type=int, default=4096, help='number of sequences predicted at once')
+    parser.add_argument('--workers', type=int, default=None, help='number of normalization processes')
+    parser.add_argument('--mode', default=GRU_INFERENCE_MODE, choices=['token', 'question'])
+    parser.add_argument('--translate', action='store_true', help='translate questions to english')
+    parser.add_argument('--tags-separator', default=' ')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file (default is output + .checkpoint.json)')
+    parser.add_argument('--resume', action='store_true', help='resume from checkpoint')
+    parser.add_argument('--input-format', default=None, choices=['csv', 'parquet'])
+    parser.add_argument('--output-format', default=None, choices=['csv', 'parquet'])
+    args = parser.parse_args()
+    run_bulk_tagging(args.input,
+                     args.output,
+                     id_column=args.id_column,
+                     text_columns=args.text_columns,
+                     keep_columns=args.keep_columns,
+                     chunk_size=args.chunk_size,
+                     batch_size=args.batch_size,
+                     n_workers=args.workers,
+                     mode=args.mode,
+                     translate=args.translate,
+                     tags_separator=args.tags_separator,
+                     checkpoint_path=args.checkpoint,
+                     resume=args.resume,
+                     input_format=args.input_format,
+                     output_format=args.output_format)
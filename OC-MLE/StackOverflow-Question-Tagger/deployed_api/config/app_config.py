@@ -1,11 +1,25 @@
-from tensorflow import keras
-from src.text_classifier_evaluator import pickle_data, keras_f1_score
+from src.text_classifier_evaluator import keras_f1_score
+from src.artifact_store import load_artifact
+from src.sequence_encoder import SequenceEncoder
+from src.text_preprocessor import CompiledTextNormalizer, VocabularyFilter, load_stopwords_artifact
+from src.gru_runtime import load_gru_model, supports_masking, BucketedModel
+from utils.micro_batcher import MicroBatcher
+from utils.prediction_cache import PredictionCache, LRUCacheBackend, SharedMemoryCacheBackend, get_model_version
+from utils.translator import TextTranslator, GoogleTranslateBackend, TranslationCache
 
 
 ########################################################################################################################
 #                                          TEXT NORMALIZER PARAMETERS                                                  #
 ########################################################################################################################
 
+# HTML tags filter parameters ('stream' method strips tags without building a BeautifulSoup tree)
+
+HTML_FILTER_PARAMS = {'method': 'stream', 'keep_code_blocks': True}
+
+# IDF based stopwords discovered at training time (frozen artifact, ignored if missing)
+
+IDF_STOPWORDS_PATH = 'data/preprocessing/idf_stopwords.json'
+
 # Text normalizer parameters
 
 TEXT_NORMALIZER_PARAMS = {'no_digits': True,
@@ -13,22 +27,95 @@ TEXT_NORMALIZER_PARAMS = {'no_digits': True,
                           'no_repeated_characters': True,
                           'no_single_letters': True,
                           'no_stopwords': True,
-                          'stopwords_params': {'lib': 'spacy', 'min_token_length': 2},
+                          'stopwords_params': {'lib': 'spacy',
+                                               'min_token_length': 2,
+                                               'other_stopwords': load_stopwords_artifact(IDF_STOPWORDS_PATH)},
                           # Keep specific programming tags like 'c++', 'c#' etc ...
-                          'domain_words': pickle_data(filename='tags', folder='data/preprocessing', method='r')
+                          'domain_words': VocabularyFilter(load_artifact('tags', folder='data/preprocessing'),
+                                                           name='domain_words')
                           }
 
+# Text normalizer built once (precompiled regexes & frozen vocabularies, same output as text_normalizer)
+compiled_text_normalizer = CompiledTextNormalizer(**TEXT_NORMALIZER_PARAMS)
+
 
 ########################################################################################################################
 #                                           PREPROCESSING PARAMETERS                                                   #
 ########################################################################################################################
 
+# Preprocessing artifacts are memory mapped (pages shared by forked workers) if converted with
+# python -m src.artifact_store data/preprocessing GRU_tokenizer multilabel_encoder tags, otherwise .pkl files are loaded
 # Load multi label binarizer
-multilabel_encoder = pickle_data(filename='multilabel_encoder', folder='data/preprocessing', method='r')
-# Load keras tokenizer
-gru_tokenizer = pickle_data(filename='GRU_tokenizer', folder='data/preprocessing', method='r')
-# Load GRU trained model
-gru = keras.models.load_model('data/models/stackoverflow_tag_predictor.h5', custom_objects={'f1_score': keras_f1_score})
+multilabel_encoder = load_artifact('multilabel_encoder', folder='data/preprocessing')
+# Load keras tokenizer (wrapped in a sequence encoder : same padded sequences, memoized tokens encodings)
+gru_tokenizer = SequenceEncoder.from_tokenizer(load_artifact('GRU_tokenizer', folder='data/preprocessing'))
+# GRU inference runtime ('keras' : .h5 model (imports TensorFlow), 'numpy' : pure-NumPy forward pass of exported
+# weights, 'tflite' : TFLite interpreter), see src.gru_runtime export functions to build numpy & tflite artifacts
+MODEL_RUNTIME = 'keras'
+GRU_MODEL_PATHS = {'keras': 'data/models/stackoverflow_tag_predictor.h5',
+                   'numpy': 'data/models/stackoverflow_tag_predictor.npz',
+                   'tflite': 'data/models/stackoverflow_tag_predictor.tflite'}
+GRU_MODEL_PATH = GRU_MODEL_PATHS[MODEL_RUNTIME]
+# Load GRU trained model (& padded sequences length)
+gru, GRU_INPUT_LENGTH = load_gru_model(MODEL_RUNTIME, GRU_MODEL_PATH, custom_objects={'f1_score': keras_f1_score})
+# Length bucketing : padded sequences are predicted by batches of similar lengths trimmed to their longest sequence
+# (same predictions, only applied to models masking padding zeros, e.g. trained with a variable_length DNN embedding)
+LENGTH_BUCKETING = True
+LENGTH_BUCKETING_PARAMS = {'bucket_boundaries': (8, 16, 32, 64), 'batch_size': 256}
+if LENGTH_BUCKETING and supports_masking(gru):
+    gru = BucketedModel(gru, **LENGTH_BUCKETING_PARAMS)
+
+
+########################################################################################################################
+#                                            INFERENCE PARAMETERS                                                      #
+########################################################################################################################
+
+# Coalesce concurrent GRU predictions into batched predictions (wait at most max_wait_ms or max_batch_size rows)
+MICRO_BATCHING = True
+MICRO_BATCHING_PARAMS = {'max_batch_size': 512, 'max_wait_ms': 5}
+
+gru_batcher = MicroBatcher(gru, **MICRO_BATCHING_PARAMS)
+# GRU predictor used by tagging routes
+gru_predictor = gru_batcher if MICRO_BATCHING else gru
+
+# Predicted tags decoding parameters (threshold : shared threshold, array of thresholds by tag or {tag: threshold}
+# dict, top_k : maximum number of tags by question or None)
+TAG_DECODING_PARAMS = {'threshold': 0.5, 'top_k': None}
+
+# Cache predicted tags of already seen questions (keyed by padded GRU input & model file version)
+# backend : 'memory' (LRU cache of each worker) or 'shared' (SQLite cache in shared memory, shared by all workers)
+PREDICTION_CACHING = True
+PREDICTION_CACHE_PARAMS = {'backend': 'memory',
+                           'max_size': 100000,
+                           'shared_path': '/dev/shm/stackoverflow_tagger_cache.sqlite'}
+
+# Cached predicted tags also expire when decoding parameters change
+PREDICTION_CACHE_VERSION = get_model_version(GRU_MODEL_PATH) + f':{TAG_DECODING_PARAMS}'
+if not PREDICTION_CACHING:
+    prediction_cache = None
+elif PREDICTION_CACHE_PARAMS['backend'] == 'memory':
+    prediction_cache = PredictionCache(LRUCacheBackend(max_size=PREDICTION_CACHE_PARAMS['max_size']),
+                                       model_version=PREDICTION_CACHE_VERSION)
+elif PREDICTION_CACHE_PARAMS['backend'] == 'shared':
+    prediction_cache = PredictionCache(SharedMemoryCacheBackend(path=PREDICTION_CACHE_PARAMS['shared_path'],
+                                                                max_size=PREDICTION_CACHE_PARAMS['max_size'],
+                                                                model_version=PREDICTION_CACHE_VERSION),
+                                       model_version=PREDICTION_CACHE_VERSION)
+else:
+    raise Exception(f"{PREDICTION_CACHE_PARAMS['backend']} prediction cache backend not implemented")
+
+
+########################################################################################################################
+#                                            TRANSLATION PARAMETERS                                                    #
+########################################################################################################################
+
+# Translation backend timeout (in seconds) & translations cache parameters (ttl in seconds)
+TRANSLATOR_PARAMS = {'timeout': 2.0, 'max_retries': 1, 'cache_size': 10000, 'cache_ttl': 86400}
+
+text_translator = TextTranslator(backend=GoogleTranslateBackend(timeout=TRANSLATOR_PARAMS['timeout']),
+                                 cache=TranslationCache(max_size=TRANSLATOR_PARAMS['cache_size'],
+                                                        ttl=TRANSLATOR_PARAMS['cache_ttl']),
+                                 max_retries=TRANSLATOR_PARAMS['max_retries'])
 
 
 ########################################################################################################################
@@ -38,3 +125,13 @@ gru = keras.models.load_model('data/models/stackoverflow_tag_predictor.h5', cust
 # App logo filename
 APP_LOGO_NAME = 'stackoverflow_autotagger_logo.svg'
 
+# GRU inference mode ('token' : one sequence per normalized token (legacy), 'question' : one sequence per question)
+GRU_INFERENCE_MODE = 'token'
+
+# Bulk tagging parameters (maximum number of padded sequences predicted at once)
+BULK_TAGGING_PARAMS = {'chunk_size': 4096}
+
+
+# ASGI serving parameters (see asgi.py) : translation I/O threads, bounded pool of CPU-bound work (normalization &
+# prediction) & pool type used for text normalization ('thread' or 'process')
+ASGI_PARAMS = {'io_workers': 32, 'cpu_workers': 4, 'normalization_pool': 'thread'}
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import pickle
+import argparse
+import numpy as np
+
+# Memory mapped artifacts folder suffix (e.g. data/preprocessing/GRU_tokenizer.mmap/)
+ARTIFACT_SUFFIX = '.mmap'
+
+
+########################################################################################################################
+#                                              SORTED STRING TABLES                                                    #
+########################################################################################################################
+
+
+def save_string_table(words, folder, values=None):
+    """
+    Save words as a sorted string table (fixed width UTF-8 bytes array, binary searchable without decoding) & value
+    arrays aligned on sorted words
+
+    :param words: distinct words (list of strings)
+    :param folder: artifact folder
+    :param values: value arrays of words (dict of column name & list of values in words order, e.g. {'index': [...]})
+
+    :return: table columns names (list)
+    """
+    strings = np.array([word.encode('utf-8') for word in words], dtype=bytes)
+    order = np.argsort(strings, kind='stable')
+    np.save(os.path.join(folder, 'strings.npy'), strings[order])
+    for column, column_values in (values or {}).items():
+        np.save(os.path.join(folder, f'{column}.npy'), np.asarray(column_values)[order])
+    return list(values or {})
+
+
+class MappedStringTable:
+
+    def __init__(self, folder, value_column=None, mmap_mode='r'):
+        """
+        Read only string table memory mapped from disk (pages are shared by all processes mapping the same files) :
+        words are looked up by binary search on sorted UTF-8 strings
+
+        :param folder: artifact folder (see save_string_table)
+        :param value_column: value column returned by get & __getitem__ (None : table is a set of words)
+        :param mmap_mode: numpy memory map mode (None loads arrays in memory)
+        """
+        self.strings = np.load(os.path.join(folder, 'strings.npy'), mmap_mode=mmap_mode)
+        self.value_column = value_column
+        self.values = np.load(os.path.join(folder, f'{value_column}.npy'), mmap_mode=mmap_mode) \
+            if value_column is not None else None
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __iter__(self):
+        return (string.decode('utf-8') for string in self.strings)
+
+    def __contains__(self, word):
+        return self.lookup([word])[0] >= 0
+
+    def __getitem__(self, word):
+        position = self.lookup([word])[0]
+        if position < 0:
+            raise KeyError(word)
+        return self.values[position].item()
+
+    def lookup(self, words):
+        """
+        Positions of words in table (vectorized binary search)
+
+        :param words: list of words
+
+        :return: positions (numpy array, -1 for missing words)
+        """
+        if len(words) == 0 or len(self.strings) == 0:
+            return np.full(len(words), -1, dtype=np.int64)
+        encoded_words = [word.encode('utf-8') for word in words]
+        # Words longer than table strings width are missing (they would be truncated by numpy cast)
+        too_long = np.array([len(word) > self.strings.itemsize for word in encoded_words])
+        keys = np.array(encoded_words, dtype=self.strings.dtype)
+        positions = np.searchsorted(self.strings, keys)
+        found = (positions < len(self.strings)) & ~too_long
+        found[found] = self.strings[positions[found]] == keys[found]
+        return np.where(found, positions, -1)
+
+    def get_many(self, words, default=None):
+        """
+        Values of a list of words
+
+        :param words: list of words
+        :param default: value of missing words
+
+        :return: list of values
+        """
+        positions = self.lookup(words)
+        values = self.values[np.maximum(positions, 0)].tolist() if len(positions) > 0 else []
+        return [value if position >= 0 else default for value, position in zip(values, positions)]
+
+    def get(self, word, default=None):
+        return self.get_many([word], default)[0]
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return zip(iter(self), self.values.tolist())
+
+
+########################################################################################################################
+#                                               MAPPED ARTIFACTS                                                       #
+########################################################################################################################
+
+
+class MappedTokenizer:
+
+    def __init__(self, folder, mmap_mode='r'):
+        """
+        Memory mapped keras Tokenizer (same texts_to_sequences output, word_index & word_counts are string tables)
+
+        :param folder: tokenizer artifact folder (see save_artifact)
+        :param mmap_mode: numpy memory map mode
+        """
+        with open(os.path.join(folder, 'meta.json')) as file:
+            self.config = json.load(file)['config']
+        self.num_words = self.config['num_words']
+        self.filters = self.config['filters']
+        self.lower = self.config['lower']
+        self.split = self.config['split']
+        self.char_level = self.config['char_level']
+        self.oov_token = self.config['oov_token']
+        self.document_count = self.config['document_count']
+        self.word_index = MappedStringTable(folder, value_column='index', mmap_mode=mmap_mode)
+        self.word_counts = MappedStringTable(folder, value_column='count', mmap_mode=mmap_mode)
+        self.translation_table = str.maketrans({character: self.split for character in self.filters})
+
+    def text_to_word_sequence(self, text):
+        """
+        Split a text into words (keras text_to_word_sequence with tokenizer parameters)
+
+        :param text: a text (str) or a list of words
+
+        :return: list of words
+        """
+        if self.char_level or isinstance(text, list):
+            if self.lower:
+                return [word.lower() for word in text] if isinstance(text, list) else text.lower()
+            return text
+        text = text.lower() if self.lower else text
+        return [word for word in text.translate(self.translation_table).split(self.split) if word]
+
+    def texts_to_sequences(self, texts):
+        """
+        Convert texts to sequences of words indexes (words of all texts are looked up at once)
+
+        :param texts: list of texts (str or lists of words)
+
+        :return: list of sequences (lists of integers)
+        """
+        word_sequences = [self.text_to_word_sequence(text) for text in texts]
+        unique_words = list(dict.fromkeys(word for words in word_sequences for word in words))
+        indexes = dict(zip(unique_words, self.word_index.get_many(unique_words)))
+        oov_index = self.word_index.get(self.oov_token) if self.oov_token is not None else None
+        sequences = []
+        for words in word_sequences:
+            sequence = []
+            for word in words:
+                index = indexes[word]
+                if index is not None and not (self.num_words and index >= self.num_words):
+                    sequence.append(index)
+                elif oov_index is not None:
+                    sequence.append(oov_index)
+            sequences.append(sequence)
+        return sequences
+
+
+class MappedMultiLabelBinarizer:
+
+    def __init__(self, folder, mmap_mode='r'):
+        """
+        Memory mapped fitted MultiLabelBinarizer (classes_ array)
+
+        :param folder: encoder artifact folder (see save_artifact)
+        :param mmap_mode: numpy memory map mode
+        """
+        self.classes_ = np.load(os.path.join(folder, 'classes.npy'), mmap_mode=mmap_mode)
+
+    def inverse_transform(self, yt):
+        """
+        Transform a label indicator matrix into label sets (like MultiLabelBinarizer.inverse_transform)
+
+        :param yt: label indicator matrix (numpy array of shape (n_samples, n_classes))
+
+        :return: list of tuples of labels
+        """
+        return [tuple(self.classes_[np.flatnonzero(row)].tolist()) for row in np.asarray(yt)]
+
+
+def save_artifact(data, name, folder):
+    """
+    Save a preprocessing object as a memory mapped artifact (folder of .npy arrays & meta.json)
+
+    :param data: a fitted keras Tokenizer, a fitted MultiLabelBinarizer or a list of words (e.g. tags)
+    :param name: artifact name (e.g. 'GRU_tokenizer')
+    :param folder: artifacts folder
+
+    :return: artifact folder path
+    """
+    path = os.path.join(folder, name + ARTIFACT_SUFFIX)
+    os.makedirs(path, exist_ok=True)
+    if hasattr(data, 'word_index') and hasattr(data, 'texts_to_sequences'):
+        words = list(data.word_index)
+        meta = {'type': 'tokenizer',
+                'config': {'num_words': data.num_words,
+                           'filters': data.filters,
+                           'lower': data.lower,
+                           'split': data.split,
+                           'char_level': data.char_level,
+                           'oov_token': data.oov_token,
+                           'document_count': data.document_count},
+                'columns': save_string_table(words, path, {'index': np.array([data.word_index[word] for word in words],
+                                                                             dtype=np.int32),
+                                                           'count': np.array([data.word_counts.get(word, 0)
+                                                                              for word in words], dtype=np.int64)})}
+    elif hasattr(data, 'classes_'):
+        np.save(os.path.join(path, 'classes.npy'), np.asarray(data.classes_).astype(str))
+        meta = {'type': 'multilabel_encoder'}
+    elif all(isinstance(word, str) for word in data):
+        meta = {'type': 'string_table', 'columns': save_string_table(sorted(set(data)), path)}
+    else:
+        raise Exception(f'{type(data).__name__} artifact not implemented')
+    with open(os.path.join(path, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    return path
+
+
+def load_artifact(name, folder, mmap_mode='r'):
+    """
+    Load a preprocessing artifact : memory mapped artifact if it exists, otherwise pickled object (.pkl file saved by
+    pickle_data)
+
+    :param name: artifact name (e.g. 'GRU_tokenizer')
+    :param folder: artifacts folder
+    :param mmap_mode: numpy memory map mode (None loads arrays in memory)
+
+    :return: MappedTokenizer, MappedMultiLabelBinarizer or MappedStringTable (unpickled object for .pkl files)
+    """
+    path = os.path.join(folder, name + ARTIFACT_SUFFIX)
+    if not os.path.isdir(path):
+        with open(os.path.join(folder, f'{name}.pkl'), 'rb') as file:
+            return pickle.load(file)
+    with open(os.path.join(path, 'meta.json')) as file:
+        artifact_type = json.load(file)['type']
+    if artifact_type == 'tokenizer':
+        return MappedTokenizer(path, mmap_mode=mmap_mode)
+    elif artifact_type == 'multilabel_encoder':
+        return MappedMultiLabelBinarizer(path, mmap_mode=mmap_mode)
+    elif artifact_type == 'string_table':
+        return MappedStringTable(path, mmap_mode=mmap_mode)
+    raise Exception(f'{artifact_type} artifact not implemented')
+
+
+def check_artifact(data, artifact):
+    """
+    Check a mapped artifact against its original object
+
+    :param data: original object (unpickled)
+    :param artifact: mapped artifact
+
+    :return: True if artifact gives the same outputs
+    """
+    if isinstance(artifact, MappedTokenizer):
+        words = list(data.word_index)
+        texts = [' '.join(words[start:start + 50]) for start in range(0, len(words), 50)] + words[:1000]
+        return artifact.texts_to_sequences(texts) == data.texts_to_sequences(texts)
+    elif isinstance(artifact, MappedMultiLabelBinarizer):
+        return np.array_equal(artifact.classes_, np.asarray(data.classes_).astype(str))
+    return set(artifact) == set(data)
+
+
+if __name__ == '__main__':
+    # e.g. python -m src.artifact_store data/preprocessing GRU_tokenizer multilabel_encoder tags
+    parser = argparse.ArgumentParser(description='Convert pickled preprocessing objects to memory mapped artifacts')
+    parser.add_argument('folder', help='artifacts folder (containing .pkl files)')
+    parser.add_argument('names', nargs='+', help='artifact names (.pkl filenames without extension)')
+    args = parser.parse_args()
+    for artifact_name in args.names:
+        start_time = time.perf_counter()
+        with open(os.path.join(args.folder, f'{artifact_name}.pkl'), 'rb') as pickle_file:
+            pickled_data = pickle.load(pickle_file)
+        pickle_time = time.perf_counter() - start_time
+        artifact_path = save_artifact(pickled_data, artifact_name, args.folder)
+        start_time = time.perf_counter()
+        mapped_artifact = load_artifact(artifact_name, args.folder)
+        mapped_time = time.perf_counter() - start_time
+        print(f'{artifact_name} -> {artifact_path} (pickle load {pickle_time:.3f}s, mapped load {mapped_time:.4f}s, '
+              f'check {"ok" if check_artifact(pickled_data, mapped_artifact) else "FAILED"})')
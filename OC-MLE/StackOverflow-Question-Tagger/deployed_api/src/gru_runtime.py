@@ -0,0 +1,417 @@
+import json
+import numpy as np
+
+
+########################################################################################################################
+#                                               SEQUENCES PADDING                                                      #
+########################################################################################################################
+
+
+def pad_sequences(sequences, maxlen, dtype='int32', padding='pre', truncating='pre', value=0):
+    """
+    NumPy version of keras.preprocessing.sequence.pad_sequences (same output, no TensorFlow import)
+
+    :param sequences: list of sequences (list of lists of integers)
+    :param maxlen: padded sequences length
+    :param dtype: padded sequences type
+    :param padding: 'pre' or 'post', pad before or after each sequence
+    :param truncating: 'pre' or 'post', remove values from sequences larger than maxlen at the beginning or at the end
+    :param value: padding value
+
+    :return: padded sequences (numpy array, shape (len(sequences), maxlen))
+    """
+    padded_sequences = np.full((len(sequences), maxlen), value, dtype=dtype)
+    for i, sequence in enumerate(sequences):
+        if len(sequence) == 0:
+            continue
+        sequence = sequence[-maxlen:] if truncating == 'pre' else sequence[:maxlen]
+        if padding == 'pre':
+            padded_sequences[i, maxlen - len(sequence):] = sequence
+        else:
+            padded_sequences[i, :len(sequence)] = sequence
+    return padded_sequences
+
+
+########################################################################################################################
+#                                                 MODEL EXPORT                                                         #
+########################################################################################################################
+
+# Activation functions supported by NumPy runtime
+ACTIVATIONS = {'linear': lambda x: x,
+               'relu': lambda x: np.maximum(x, 0),
+               'tanh': np.tanh,
+               'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+               'hard_sigmoid': lambda x: np.clip(0.2 * x + 0.5, 0, 1)}
+
+
+def get_input_length(model):
+    """
+    Get padded sequences length of a keras text classifier model
+
+    :param model: a keras model (starting with an embedding layer)
+
+    :return: padded sequences length (int)
+    """
+    input_length = model.layers[0].get_config().get('input_length')
+    return int(input_length) if input_length is not None else int(model.input_shape[1])
+
+
+def export_numpy_model(model, path):
+    """
+    Export embedding, GRU & dense layers weights of a keras model to a NumPy artifact (.npz file)
+    (dropout layers are ignored at inference)
+
+    :param model: a trained keras sequential model (e.g. stackoverflow_tag_predictor.h5 model)
+    :param path: artifact path (.npz file)
+    """
+    layers_config = []
+    weights = {}
+    for layer in model.layers:
+        layer_type = type(layer).__name__
+        config = layer.get_config()
+        if layer_type == 'Dropout':
+            continue
+        elif layer_type == 'Embedding':
+            layers_config.append({'type': layer_type, 'mask_zero': bool(config.get('mask_zero', False))})
+        elif layer_type == 'GRU':
+            if config.get('return_sequences', False) or config.get('go_backwards', False):
+                raise Exception(f"{layer_type} layer with return_sequences or go_backwards not implemented")
+            layers_config.append({'type': layer_type,
+                                  'units': config['units'],
+                                  'activation': config['activation'],
+                                  'recurrent_activation': config['recurrent_activation'],
+                                  'reset_after': bool(config.get('reset_after', False))})
+        elif layer_type == 'Dense':
+            layers_config.append({'type': layer_type, 'activation': config['activation']})
+        else:
+            raise Exception(f'{layer_type} layer export not implemented')
+        for i, weight in enumerate(layer.get_weights()):
+            weights[f'{len(layers_config) - 1}_{i}'] = weight.astype(np.float32)
+    config = {'input_length': get_input_length(model), 'layers': layers_config}
+    np.savez(path, config=np.array(json.dumps(config)), **weights)
+
+
+def export_tflite_model(model, path):
+    """
+    Export a keras model to a TFLite artifact (requires TensorFlow)
+
+    Recurrent layers are unrolled (fixed input length) so that the artifact only contains TFLite builtin ops and can
+    be run by tflite_runtime without TensorFlow.
+
+    :param model: a trained keras model
+    :param path: artifact path (.tflite file)
+    """
+    import tensorflow as tf
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        if isinstance(layer, tf.keras.layers.RNN):
+            config['unroll'] = True
+        return type(layer).from_config(config)
+
+    unrolled_model = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    unrolled_model.set_weights(model.get_weights())
+    converter = tf.lite.TFLiteConverter.from_keras_model(unrolled_model)
+    with open(path, 'wb') as file:
+        file.write(converter.convert())
+
+
+########################################################################################################################
+#                                                MODEL RUNTIMES                                                        #
+########################################################################################################################
+
+
+def dequantize_weights(weights, scales=None):
+    """
+    Dequantize weights of a compressed artifact (see src/nlp/model_compressor.py)
+
+    :param weights: weights (float32, float16 or int8 numpy array)
+    :param scales: int8 quantization scales (numpy array broadcastable to weights, None if not quantized)
+
+    :return: float32 weights (numpy array)
+    """
+    weights = weights.astype(np.float32, copy=False)
+    return weights * scales if scales is not None else weights
+
+
+class NumpyGRUModel:
+
+    def __init__(self, path):
+        """
+        Pure-NumPy forward pass of an exported embedding + GRU + dense layers model (see export_numpy_model),
+        compressed artifacts (int8 or float16 weights, see src/nlp/model_compressor.py) are also supported
+
+        :param path: NumPy artifact path (.npz file)
+        """
+        with np.load(path) as artifact:
+            config = json.loads(str(artifact['config']))
+            weights = {name: artifact[name] for name in artifact.files if name != 'config'}
+        self.input_length = config['input_length']
+        self.embedding_scales = None
+        self.layers = []
+        for i, layer_config in enumerate(config['layers']):
+            layer_weights = []
+            j = 0
+            while f'{i}_{j}' in weights:
+                weight, scales = weights[f'{i}_{j}'], weights.get(f'{i}_{j}_scale')
+                if layer_config['type'] == 'Embedding':
+                    # Quantized embedding stays compressed in memory (looked up rows are dequantized)
+                    self.embedding_scales = scales
+                    layer_weights.append(weight)
+                else:
+                    layer_weights.append(dequantize_weights(weight, scales))
+                j += 1
+            self.layers.append((layer_config, layer_weights))
+
+    @staticmethod
+    def _gru(inputs, mask, config, weights):
+        """
+        GRU forward pass (keras GRU equations, last hidden state)
+
+        :param inputs: embedded sequences (numpy array, shape (batch, timesteps, features))
+        :param mask: timesteps mask (boolean numpy array, shape (batch, timesteps), None means no masking)
+        :param config: GRU layer config (dict)
+        :param weights: kernel, recurrent kernel & bias (list of numpy arrays)
+
+        :return: last hidden state (numpy array, shape (batch, units))
+        """
+        kernel, recurrent_kernel, bias = weights
+        units = config['units']
+        activation = ACTIVATIONS[config['activation']]
+        recurrent_activation = ACTIVATIONS[config['recurrent_activation']]
+        if config['reset_after']:
+            input_bias, recurrent_bias = bias[0], bias[1]
+        else:
+            input_bias, recurrent_bias = bias, np.zeros_like(bias)
+        # Input projections of all timesteps at once (z, r & h gates)
+        input_projections = inputs @ kernel + input_bias
+        hidden_state = np.zeros((len(inputs), units), dtype=inputs.dtype)
+        for t in range(inputs.shape[1]):
+            x_z, x_r, x_h = np.split(input_projections[:, t], 3, axis=1)
+            if config['reset_after']:
+                h_z, h_r, h_h = np.split(hidden_state @ recurrent_kernel + recurrent_bias, 3, axis=1)
+                z = recurrent_activation(x_z + h_z)
+                r = recurrent_activation(x_r + h_r)
+                candidate_state = activation(x_h + r * h_h)
+            else:
+                h_z, h_r = np.split(hidden_state @ recurrent_kernel[:, :2 * units], 2, axis=1)
+                z = recurrent_activation(x_z + h_z)
+                r = recurrent_activation(x_r + h_r)
+                candidate_state = activation(x_h + (r * hidden_state) @ recurrent_kernel[:, 2 * units:])
+            new_hidden_state = z * hidden_state + (1 - z) * candidate_state
+            if mask is not None:
+                new_hidden_state = np.where(mask[:, t:t + 1], new_hidden_state, hidden_state)
+            hidden_state = new_hidden_state
+        return hidden_state
+
+    def _predict_batch(self, inputs):
+        """
+        Forward pass of a batch of padded sequences
+
+        :param inputs: padded sequences (numpy array)
+
+        :return: predictions (numpy array)
+        """
+        outputs, mask = inputs, None
+        for config, weights in self.layers:
+            if config['type'] == 'Embedding':
+                mask = inputs != 0 if config['mask_zero'] else None
+                outputs = dequantize_weights(weights[0][outputs],
+                                             self.embedding_scales[outputs] if self.embedding_scales is not None
+                                             else None)
+            elif config['type'] == 'GRU':
+                outputs = self._gru(outputs, mask, config, weights)
+            elif config['type'] == 'Dense':
+                outputs = ACTIVATIONS[config['activation']](outputs @ weights[0] + weights[1])
+        return outputs
+
+    def predict(self, inputs, batch_size=32):
+        """
+        Predict padded sequences (same interface as keras model predict)
+
+        :param inputs: padded sequences (numpy array)
+        :param batch_size: number of sequences predicted at once (bounds GRU input projections memory)
+
+        :return: predictions (numpy array)
+        """
+        inputs = np.asarray(inputs)
+        if len(inputs) == 0:
+            return np.zeros((0, self.layers[-1][1][-1].shape[0]), dtype=np.float32)
+        return np.concatenate([self._predict_batch(inputs[start:start + batch_size])
+                               for start in range(0, len(inputs), batch_size)])
+
+
+class TFLiteModel:
+
+    def __init__(self, path, num_threads=None):
+        """
+        TFLite interpreter wrapper (tflite_runtime is used if installed, else TensorFlow Lite)
+
+        :param path: TFLite artifact path (.tflite file)
+        :param num_threads: number of interpreter threads
+        """
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.input_length = int(self.input_details['shape'][1])
+        self._batch_size = None
+
+    def predict(self, inputs):
+        """
+        Predict padded sequences (same interface as keras model predict)
+
+        :param inputs: padded sequences (numpy array)
+
+        :return: predictions (numpy array)
+        """
+        if len(inputs) == 0:
+            return np.zeros((0, self.output_details['shape'][-1]), dtype=np.float32)
+        if self._batch_size != len(inputs):
+            self.interpreter.resize_tensor_input(self.input_details['index'], [len(inputs), self.input_length])
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(inputs)
+        self.interpreter.set_tensor(self.input_details['index'], np.asarray(inputs, dtype=self.input_details['dtype']))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_details['index']).copy()
+
+
+def load_gru_model(runtime, model_path, custom_objects=None):
+    """
+    Load GRU tagger model with an inference runtime
+
+    :param runtime: inference runtime, could be :
+
+           - 'keras': keras model (.h5 file, imports TensorFlow)
+           - 'numpy': pure-NumPy forward pass (.npz file, see export_numpy_model)
+           - 'tflite': TFLite interpreter (.tflite file, see export_tflite_model)
+
+    :param model_path: model artifact path
+    :param custom_objects: keras custom objects (keras runtime only)
+
+    :return: model (with a predict method) & padded sequences length
+    """
+    if runtime == 'keras':
+        from tensorflow import keras
+        model = keras.models.load_model(model_path, custom_objects=custom_objects)
+        return model, get_input_length(model)
+    elif runtime == 'numpy':
+        model = NumpyGRUModel(model_path)
+        return model, model.input_length
+    elif runtime == 'tflite':
+        model = TFLiteModel(model_path)
+        return model, model.input_length
+    raise Exception(f'{runtime} runtime not implemented')
+
+
+def check_runtime_parity(reference_model, model, inputs, atol=1e-4):
+    """
+    Compare predictions of an inference runtime to reference keras model predictions
+
+    :param reference_model: reference model (keras model)
+    :param model: model loaded with another runtime
+    :param inputs: padded sequences (numpy array)
+    :param atol: maximal absolute difference of predicted probabilities
+
+    :return: parity report (max absolute difference, ratio of identical predicted tags, parity boolean) (dict)
+    """
+    reference_predictions = np.asarray(reference_model.predict(inputs))
+    predictions = np.asarray(model.predict(inputs))
+    max_abs_diff = float(np.max(np.abs(reference_predictions - predictions))) if len(inputs) > 0 else 0.0
+    identical_tags = float(np.mean((reference_predictions > 0.5) == (predictions > 0.5))) if len(inputs) > 0 else 1.0
+    return {'max_abs_diff': max_abs_diff,
+            'identical_tags_ratio': round(identical_tags, 6),
+            'parity': max_abs_diff <= atol}
+
+
+########################################################################################################################
+#                                                LENGTH BUCKETING                                                      #
+########################################################################################################################
+
+
+def get_sequence_lengths(padded_sequences, padding='pre', value=0):
+    """
+    Lengths of padded sequences (padding value is never a word index)
+
+    :param padded_sequences: padded sequences (numpy array)
+    :param padding: 'pre' or 'post', sequences padding side
+    :param value: padding value
+
+    :return: sequences lengths (numpy array)
+    """
+    padded_sequences = np.asarray(padded_sequences)
+    if padded_sequences.shape[1] == 0:
+        return np.zeros(len(padded_sequences), dtype=int)
+    # First word position (last word position of post padded sequences, read backwards)
+    not_padding = padded_sequences != value if padding == 'pre' else padded_sequences[:, ::-1] != value
+    return np.where(not_padding.any(axis=1), padded_sequences.shape[1] - not_padding.argmax(axis=1), 0)
+
+
+def supports_masking(model):
+    """
+    Check if padding zeros are masked by a model (predictions don't depend on padded sequences length)
+
+    :param model: a model loaded by load_gru_model
+
+    :return: True if model embedding layer masks zeros
+    """
+    if isinstance(model, NumpyGRUModel):
+        return model.layers[0][0]['type'] == 'Embedding' and model.layers[0][0]['mask_zero']
+    elif hasattr(model, 'layers') and len(model.layers) > 0:
+        # keras model (TFLite models are unrolled on a fixed input length)
+        return bool(getattr(model.layers[0], 'mask_zero', False))
+    return False
+
+
+class BucketedModel:
+
+    def __init__(self, model, bucket_boundaries=(8, 16, 32, 64), batch_size=256, padding='pre'):
+        """
+        Length bucketed predictions : padded sequences are sorted by length, predicted by batches of similar lengths &
+        each batch is trimmed to the bucket boundary of its longest sequence (predictions are unchanged because padding
+        zeros are masked, only a few input lengths are used to limit keras retracing)
+
+        :param model: a model loaded by load_gru_model, its embedding layer must mask zeros (mask_zero)
+        :param bucket_boundaries: trimmed batches lengths (longer batches keep their padded length)
+        :param batch_size: number of sequences predicted at once
+        :param padding: 'pre' or 'post', sequences padding side
+        """
+        if not supports_masking(model):
+            raise Exception(f'Length bucketing of {type(model).__name__} model without zero masking not implemented')
+        self.model = model
+        self.bucket_boundaries = np.array(sorted(bucket_boundaries), dtype=int)
+        self.batch_size = batch_size
+        self.padding = padding
+        self.input_length = getattr(model, 'input_length', None)
+
+    def predict(self, inputs):
+        """
+        Predict padded sequences (same interface as keras model predict)
+
+        :param inputs: padded sequences (numpy array)
+
+        :return: predictions (numpy array, in inputs order)
+        """
+        inputs = np.asarray(inputs)
+        if len(inputs) == 0:
+            return self.model.predict(inputs)
+        lengths = get_sequence_lengths(inputs, padding=self.padding)
+        order = np.argsort(lengths, kind='stable')
+        predictions = None
+        for start in range(0, len(inputs), self.batch_size):
+            batch_rows = order[start:start + self.batch_size]
+            # Smallest bucket boundary holding the longest sequence of batch (sorted batch : last sequence)
+            bucket = np.searchsorted(self.bucket_boundaries, lengths[batch_rows[-1]])
+            batch_length = min(self.bucket_boundaries[bucket], inputs.shape[1]) \
+                if bucket < len(self.bucket_boundaries) else inputs.shape[1]
+            batch_inputs = inputs[batch_rows, inputs.shape[1] - batch_length:] if self.padding == 'pre' \
+                else inputs[batch_rows, :batch_length]
+            batch_predictions = np.asarray(self.model.predict(batch_inputs))
+            if predictions is None:
+                predictions = np.empty((len(inputs),) + batch_predictions.shape[1:], dtype=batch_predictions.dtype)
+            predictions[batch_rows] = batch_predictions
+        return predictions
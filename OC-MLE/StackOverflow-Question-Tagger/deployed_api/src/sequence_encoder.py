@@ -0,0 +1,151 @@
+import itertools
+import numpy as np
+
+# keras Tokenizer default filters
+KERAS_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+
+
+class SequenceEncoder:
+
+    def __init__(self, word_index, num_words=None, filters=KERAS_FILTERS, lower=True, split=' ', char_level=False,
+                 oov_token=None, max_cache_size=1000000):
+        """
+        Sequence encoder built from a fitted tokenizer vocabulary : same sequences as keras Tokenizer.texts_to_sequences
+        & pad_sequences, token encodings (filters, lower, split & vocabulary lookup) are memoized & padded sequences are
+        written in a preallocated matrix
+
+        :param word_index: word index of a fitted tokenizer (dict or MappedStringTable)
+        :param num_words: maximum number of words kept (keras Tokenizer num_words)
+        :param filters: characters filtered from texts (keras Tokenizer filters)
+        :param lower: lowerize texts
+        :param split: words separator
+        :param char_level: every character is a token
+        :param oov_token: out of vocabulary token (None removes out of vocabulary words)
+        :param max_cache_size: maximal number of memoized token encodings (cache is cleared when full)
+        """
+        self.word_index = word_index
+        self.num_words = num_words
+        self.filters = filters
+        self.lower = lower
+        self.split = split
+        self.char_level = char_level
+        self.oov_token = oov_token
+        self.oov_index = word_index.get(oov_token) if oov_token is not None else None
+        self.max_cache_size = max_cache_size
+        self.translation_table = str.maketrans({character: split for character in filters})
+        # Texts can be split by spaces before encoding (joined tokens are split like the whole text)
+        self.space_split = not char_level and (split == ' ' or ' ' in filters)
+        self.cache = {}
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer, **kwargs):
+        """
+        Build a sequence encoder from a fitted tokenizer (keras Tokenizer or MappedTokenizer)
+
+        :param tokenizer: a fitted tokenizer
+        :param kwargs: other SequenceEncoder parameters (e.g. max_cache_size)
+
+        :return: a SequenceEncoder instance
+        """
+        return cls(tokenizer.word_index,
+                   num_words=tokenizer.num_words,
+                   filters=tokenizer.filters,
+                   lower=tokenizer.lower,
+                   split=tokenizer.split,
+                   char_level=tokenizer.char_level,
+                   oov_token=tokenizer.oov_token,
+                   **kwargs)
+
+    def _get_index(self, word):
+        """
+        Encode a word (keras Tokenizer rules for out of vocabulary & rare words)
+
+        :param word: a word
+
+        :return: word index (None if word is removed)
+        """
+        index = self.word_index.get(word)
+        if index is not None and not (self.num_words and index >= self.num_words):
+            return index
+        return self.oov_index
+
+    def encode_token(self, token):
+        """
+        Encode a token (or a text) into words indexes (memoized)
+
+        :param token: a token (str)
+
+        :return: words indexes (tuple)
+        """
+        indexes = self.cache.get(token)
+        if indexes is None:
+            text = token.lower() if self.lower else token
+            words = text if self.char_level else text.translate(self.translation_table).split(self.split)
+            indexes = tuple(index for index in map(self._get_index, (word for word in words if word))
+                            if index is not None)
+            if len(self.cache) >= self.max_cache_size:
+                self.cache.clear()
+            self.cache[token] = indexes
+        return indexes
+
+    def encode(self, text):
+        """
+        Encode a text or a list of normalized tokens (tokens are joined like a text)
+
+        :param text: a text (str) or a list of tokens
+
+        :return: words indexes (list)
+        """
+        if not self.space_split:
+            return list(self.encode_token(text if isinstance(text, str) else ' '.join(text)))
+        tokens = text.split(' ') if isinstance(text, str) else text
+        encoded_tokens = list(map(self.cache.get, tokens))
+        if None in encoded_tokens:
+            encoded_tokens = [self.encode_token(token) if indexes is None else indexes
+                              for token, indexes in zip(tokens, encoded_tokens)]
+        return list(itertools.chain.from_iterable(encoded_tokens))
+
+    def texts_to_sequences(self, texts):
+        """
+        keras Tokenizer.texts_to_sequences compatible API (each text is a string)
+
+        :param texts: list of texts
+
+        :return: list of sequences (lists of integers)
+        """
+        return [self.encode(text) for text in texts]
+
+    def encode_batch(self, texts, maxlen=None, dtype='int32', padding='pre', truncating='pre', value=0):
+        """
+        Encode a batch of texts into a padded matrix (same output as pad_sequences(texts_to_sequences(texts)))
+
+        :param texts: list of texts (str) or of lists of normalized tokens
+        :param maxlen: padded sequences length (None : longest sequence length)
+        :param dtype: padded sequences type
+        :param padding: 'pre' or 'post', pad before or after each sequence
+        :param truncating: 'pre' or 'post', remove values from sequences larger than maxlen at the beginning or at the
+        end
+        :param value: padding value
+
+        :return: padded sequences (numpy array of shape (len(texts), maxlen))
+        """
+        if padding not in ['pre', 'post'] or truncating not in ['pre', 'post']:
+            raise Exception(f'{padding} padding or {truncating} truncating not implemented')
+        sequences = [self.encode(text) for text in texts]
+        lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+        if maxlen is None:
+            maxlen = int(lengths.max()) if len(lengths) > 0 else 0
+        padded_sequences = np.full((len(sequences), maxlen), value, dtype=dtype)
+        if maxlen == 0 or lengths.sum() == 0:
+            return padded_sequences
+        # Row & position of each index of concatenated sequences, kept indexes are written at once
+        indexes = np.fromiter(itertools.chain.from_iterable(sequences), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(sequences)), lengths)
+        positions = np.arange(len(indexes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        kept_lengths = np.minimum(lengths, maxlen)
+        first_positions = lengths - kept_lengths if truncating == 'pre' else np.zeros_like(lengths)
+        kept = (positions >= first_positions[rows]) & (positions < first_positions[rows] + kept_lengths[rows])
+        rows, positions = rows[kept], positions[kept] - first_positions[rows[kept]]
+        columns = positions + (maxlen - kept_lengths[rows]) if padding == 'pre' else positions
+        padded_sequences[rows, columns] = indexes[kept]
+        return padded_sequences
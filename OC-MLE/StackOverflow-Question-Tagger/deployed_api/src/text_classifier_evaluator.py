@@ -1,4 +1,3 @@
-import keras.backend as K
 import pickle
 
 
@@ -12,6 +11,8 @@ def keras_f1_score(y_true, y_pred):
 
     :return: F1-score
     """
+    # Keras is only imported when a keras model is loaded (lightweight runtimes don't need it)
+    import keras.backend as K
     true_positives = K.sum(K.round(K.clip(y_true * y_pred, 0, 1)))
     possible_positives = K.sum(K.round(K.clip(y_true, 0, 1)))
     predicted_positives = K.sum(K.round(K.clip(y_pred, 0, 1)))
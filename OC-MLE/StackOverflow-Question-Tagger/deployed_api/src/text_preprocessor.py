@@ -1,5 +1,9 @@
 import itertools
+import functools
+import os
+import json
 import string
+import sys
 import re
 import pandas as pd
 import spacy
@@ -7,7 +11,7 @@ import nltk
 from nltk.stem.snowball import SnowballStemmer
 from fuzzywuzzy import fuzz, process
 from bs4 import BeautifulSoup
-from requests import get
+from html.parser import HTMLParser
 
 
 ########################################################################################################################
@@ -17,8 +21,16 @@ from requests import get
 
 class SpacyConfigurator:
 
-    def __init__(self, language, tags_url='https://spacy.io/api/annotation'):
+    def __init__(self, language, tags_path='config/spacy_tags.json', tags_url='https://spacy.io/api/annotation'):
+        """
+        spaCy configuration (annotation tags are read from a bundled data file, no network call)
+
+        :param language: spaCy model name
+        :param tags_path: bundled spaCy annotation tags file (JSON)
+        :param tags_url: spaCy annotation page (only used to refresh bundled tags file, see scrape_tags)
+        """
         self.language = language
+        self.tags_path = tags_path
         self.tags_url = tags_url
         self.pipeline_tags = ['tagger',
                               'parser',
@@ -34,6 +46,24 @@ class SpacyConfigurator:
         # To do : add more tag types
 
     def get_tags(self):
+        """
+        Load spaCy annotation tags from bundled tags file
+
+        :return: tags by tagging type (dict)
+        """
+        with open(self.tags_path, 'r') as file:
+            spacy_tags = json.load(file)
+        return spacy_tags
+
+    def scrape_tags(self, save=False):
+        """
+        Scrape spaCy annotation tags from spaCy website (offline helper used to refresh bundled tags file)
+
+        :param save: boolean which enable/disable overwriting bundled tags file
+
+        :return: tags by tagging type (dict)
+        """
+        from requests import get
         html_soup = BeautifulSoup(get(self.tags_url).text, 'html.parser')
         # Tagging type titles
         title_parser = html_soup.find_all('a', {"class": "heading-text e80ba60d"})[4:-3]
@@ -59,9 +89,12 @@ class SpacyConfigurator:
                 spacy_tags[f'{title} Dependency Labels'] = tags
             else:
                 spacy_tags[title] = tags
+        if save:
+            with open(self.tags_path, 'w') as file:
+                json.dump(spacy_tags, file, indent=4)
         return spacy_tags
-    
-    
+
+
 # Language
 LANG = 'en_core_web_sm'  # en
 
@@ -71,20 +104,132 @@ SPACY_UNIVERSAL_POS_TAGS = spacy_conf.tags['Universal Part-of-speech Tags']
 
 SPACY_PIPELINE_TAGS = spacy_conf.pipeline_tags
 
-SPACY_DEFAULT_STOPWORDS = spacy.load(LANG).Defaults.stop_words
+# Default stopwords of model language (no model loading needed)
+SPACY_DEFAULT_STOPWORDS = spacy.util.get_lang_class(LANG.split('_')[0]).Defaults.stop_words
+
+# Pipeline components disabled by each text normalizer (all share the same loaded model, see get_nlp_instance)
+
+LEMMATIZER_DISABLED_PIPES = ['parser', 'ner']
+
+POS_TAGGER_DISABLED_PIPES = SPACY_PIPELINE_TAGS[1:]
+
+NER_DISABLED_PIPES = ['tagger',
+                      'parser',
+                      'textcat',
+                      'sentencizer',
+                      'merge_noun_chunks',
+                      'merge_subtokens']
+
+
+@functools.lru_cache(maxsize=None)
+def get_nlp_instance(language=LANG):
+    """
+    Load spaCy model on first use (a single instance is shared by lemmatizer, POS tagger & NER)
+
+    :param language: spaCy model name
+
+    :return: spacy loaded instance
+    """
+    return spacy.load(language)
+
+
+########################################################################################################################
+#                                          VOCABULARY FILTERS                                                          #
+########################################################################################################################
+
 
-# Text normalizer instances
+class VocabularyFilter:
+
+    def __init__(self, vocabulary, name=None):
+        """
+        Immutable vocabulary (frozenset) used for token membership tests, with lookup statistics
+        (lookup counters are not locked, they are approximate when shared by several threads)
+
+        :param vocabulary: iterable of words
+        :param name: vocabulary name (used in statistics)
+        """
+        self.vocabulary = frozenset(vocabulary)
+        self.name = name
+        self.lookups = 0
+        self.hits = 0
+
+    def __contains__(self, token):
+        self.lookups += 1
+        if token in self.vocabulary:
+            self.hits += 1
+            return True
+        return False
+
+    def __iter__(self):
+        return iter(self.vocabulary)
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def count_lookups(self, lookups, hits):
+        """
+        Record lookups made directly on vocabulary frozenset (used by hot paths)
+
+        :param lookups: number of lookups
+        :param hits: number of lookups which matched a vocabulary word
+        """
+        self.lookups += lookups
+        self.hits += hits
+
+    def get_stats(self):
+        """
+        Get vocabulary statistics (size, memory size & lookup counts)
+
+        :return: vocabulary statistics (dict)
+        """
+        memory_size = sys.getsizeof(self.vocabulary) + sum(sys.getsizeof(word) for word in self.vocabulary)
+        return {'name': self.name,
+                'size': len(self.vocabulary),
+                'memory_bytes': memory_size,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_ratio': round(self.hits / self.lookups, 4) if self.lookups > 0 else 0.0}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_stopwords_filter(lib, lang, other_stopwords):
+    if lib == 'nltk':
+        stopwords = nltk.corpus.stopwords.words(lang)
+    elif lib == 'spacy':
+        stopwords = SPACY_DEFAULT_STOPWORDS
+    else:
+        # TO DO : add gensim & sklearn lists
+        raise Exception(f'{lib} stopwords not implemented')
+    return VocabularyFilter(itertools.chain(stopwords, other_stopwords), name=f'{lib}_{lang}_stopwords')
+
+
+def get_stopwords_filter(lib='nltk', lang='english', other_stopwords=None):
+    """
+    Get stopwords vocabulary filter (loaded once for each parameters combination, never mutated)
+
+    :param lib: stopwords library ('nltk' or 'spacy')
+    :param lang: stopwords list language
+    :param other_stopwords: secondary list which contains other stopwords (merged with original stopwords list)
 
-LEMMATIZER_INSTANCE = spacy.load(LANG, disable=['parser', 'ner'])
+    :return: a VocabularyFilter instance
+    """
+    other_stopwords = tuple(sorted(set(other_stopwords))) if other_stopwords is not None else ()
+    return _load_stopwords_filter(lib, lang, other_stopwords)
+
+
+def load_stopwords_artifact(path):
+    """
+    Load a frozen stopwords artifact saved at training time (e.g. IDF based stopwords, see save_stopwords_artifact
+    of training text preprocessor), used as stopwords_params['other_stopwords']
 
-POS_TAGGER_INSTANCE = spacy.load(LANG, disable=SPACY_PIPELINE_TAGS[1:])
+    :param path: artifact path (JSON file)
 
-NER_INSTANCE = spacy.load(LANG, disable=['tagger',
-                                         'parser',
-                                         'textcat',
-                                         'sentencizer',
-                                         'merge_noun_chunks',
-                                         'merge_subtokens'])    
+    :return: stopwords (frozenset, empty if artifact does not exist)
+    """
+    if not os.path.exists(path):
+        return frozenset()
+    with open(path) as file:
+        return frozenset(json.load(file)['stopwords'])
 
 
 ########################################################################################################################
@@ -185,16 +330,145 @@ def filter_digits(text):
     return tokens_with_no_digits
 
 
-def filter_html_tags(text):
+class HTMLTextStripper(HTMLParser):
+
+    # Code blocks elements (dropped when keep_code_blocks is disabled)
+    code_tags = frozenset(['code', 'pre'])
+    # Elements which text is ignored (like BeautifulSoup get_text)
+    ignored_tags = frozenset(['script', 'style', 'template'])
+    # Elements which preserve whitespace strings (like BeautifulSoup)
+    preserve_whitespace_tags = frozenset(['pre', 'textarea'])
+    # Whitespace-only strings outside of preserve whitespace elements are replaced by a single space or newline
+    ascii_spaces = '\x20\x0a\x09\x0c\x0d'
+
+    def __init__(self, keep_code_blocks=True):
+        """
+        Streaming HTML tags stripper (no document tree is built, text is collected while HTML is parsed)
+
+        :param keep_code_blocks: boolean which enable/disable keeping text of code blocks (<pre> & <code> elements)
+        """
+        super().__init__(convert_charrefs=True)
+        self.keep_code_blocks = keep_code_blocks
+        self._chunks = []
+        self._pending_data = []
+        self._code_depth = 0
+        self._ignored_depth = 0
+        self._preserve_whitespace_depth = 0
+
+    def reset(self):
+        super().reset()
+        self._chunks = []
+        self._pending_data = []
+        self._code_depth = 0
+        self._ignored_depth = 0
+        self._preserve_whitespace_depth = 0
+
+    def _end_data(self):
+        """
+        Flush data collected since last tag (a string of the HTML document)
+        """
+        if len(self._pending_data) == 0:
+            return
+        data = ''.join(self._pending_data)
+        self._pending_data = []
+        if self._ignored_depth > 0 or (not self.keep_code_blocks and self._code_depth > 0):
+            return
+        if self._preserve_whitespace_depth == 0 and len(data.strip(self.ascii_spaces)) == 0:
+            data = '\n' if '\n' in data else ' '
+        self._chunks.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self._end_data()
+        if tag in self.code_tags:
+            self._code_depth += 1
+        if tag in self.ignored_tags:
+            self._ignored_depth += 1
+        if tag in self.preserve_whitespace_tags:
+            self._preserve_whitespace_depth += 1
+
+    def handle_endtag(self, tag):
+        self._end_data()
+        if tag in self.code_tags and self._code_depth > 0:
+            self._code_depth -= 1
+        if tag in self.ignored_tags and self._ignored_depth > 0:
+            self._ignored_depth -= 1
+        if tag in self.preserve_whitespace_tags and self._preserve_whitespace_depth > 0:
+            self._preserve_whitespace_depth -= 1
+
+    def handle_data(self, data):
+        self._pending_data.append(data)
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    def handle_decl(self, decl):
+        self._end_data()
+
+    def handle_pi(self, data):
+        self._end_data()
+
+    def unknown_decl(self, data):
+        self._end_data()
+        # CDATA sections are kept as text
+        if data.startswith('CDATA['):
+            self.handle_data(data[6:])
+            self._end_data()
+
+    def close(self):
+        super().close()
+        self._end_data()
+
+    def iter_text(self, html_chunks):
+        """
+        Strip HTML tags from a stream of HTML chunks
+
+        :param html_chunks: iterable of HTML strings (e.g. a file read by blocks)
+
+        :return: generator of text chunks
+        """
+        self.reset()
+        for html_chunk in html_chunks:
+            self.feed(html_chunk)
+            yield ''.join(self._chunks)
+            self._chunks = []
+        self.close()
+        yield ''.join(self._chunks)
+
+    def strip(self, text):
+        """
+        Strip HTML tags from text
+
+        :param text: a string with HTML tags
+
+        :return: a string without HTML tags
+        """
+        self.reset()
+        self.feed(text)
+        self.close()
+        return ''.join(self._chunks)
+
+
+def filter_html_tags(text, method='bs4', keep_code_blocks=True):
     """
     Filter HTML tags from text
 
     :param text: a string with HTML tags
+    :param method: HTML parsing method, could be :
+
+           - 'bs4': build a BeautifulSoup document tree (html.parser) and get its text
+           - 'stream': streaming tags stripper (same text on Stack Overflow questions, no document tree built)
+
+    :param keep_code_blocks: boolean which enable/disable keeping text of code blocks ('stream' method only)
 
     :return: a string without HTML tags
     """
-    text_with_no_html_tags = BeautifulSoup(text, 'html.parser').get_text()
-    return text_with_no_html_tags
+    if method == 'stream':
+        return HTMLTextStripper(keep_code_blocks=keep_code_blocks).strip(text)
+    elif method == 'bs4':
+        text_with_no_html_tags = BeautifulSoup(text, 'html.parser').get_text()
+        return text_with_no_html_tags
+    else:
+        raise Exception(f'{method} HTML parsing method not implemented')
 
 
 def filter_stopwords(text, other_stopwords=None, lang='english', min_token_length=0, lib='nltk'):
@@ -211,17 +485,11 @@ def filter_stopwords(text, other_stopwords=None, lang='english', min_token_lengt
 
     :return: a filtered list of tokens
     """
-    # Get stopwords list by language
-    if lib is 'nltk':
-        stopwords_list = nltk.corpus.stopwords.words(lang)
-    elif lib is 'spacy':
-        stopwords_list = SPACY_DEFAULT_STOPWORDS
-    # TO DO : add gensim & sklearn lists
-    if other_stopwords is not None:
-        stopwords_list.extend(other_stopwords)
+    # Get stopwords vocabulary by language (loaded once)
+    stopwords_filter = get_stopwords_filter(lib=lib, lang=lang, other_stopwords=other_stopwords)
     if type(text) is str:
         text = tokenize(text)
-    filtered_tokens = [token for token in text if (token not in stopwords_list) \
+    filtered_tokens = [token for token in text if (token not in stopwords_filter) \
                        & (len(token) > min_token_length)]
     # Manage text data type (a list of tokens or a sentence)
     return filtered_tokens if type(text) is list else ' '.join(filtered_tokens)  # .strip()
@@ -267,7 +535,7 @@ def filter_most_common_tokens(tokens, n=None):
     # Filter uniform distribution len(set(tokens_freqdist.values()))
     if len(tokens) > 10:
         n_most_common_tokens = int(round(n * len(tokens))) if type(n) is float else n
-        most_freq_tokens = list(list(zip(*tokens_freqdist.most_common(n_most_common_tokens)))[0])
+        most_freq_tokens = {token for token, _ in tokens_freqdist.most_common(n_most_common_tokens)}
         tokens_filtered = [token for token in tokens if token not in most_freq_tokens]
         return tokens_filtered
     return tokens
@@ -301,13 +569,17 @@ def get_domain_based_tokens(tokens, domain_based_words):
     Extract domain-based words from tokens
 
     :param tokens: list of tokens
-    :param domain_based_words: list of domain-based words
+    :param domain_based_words: list (or VocabularyFilter) of domain-based words
 
     :return: a filtered list of tokens & domain-based tokens
     """
-    domain_based_tokens = [token for token in tokens if token in domain_based_words]
-    tokens = [token for token in tokens if token not in domain_based_tokens]
-    return domain_based_tokens, tokens
+    if not isinstance(domain_based_words, (VocabularyFilter, set, frozenset)):
+        domain_based_words = frozenset(domain_based_words)
+    domain_based_tokens = []
+    other_tokens = []
+    for token in tokens:
+        (domain_based_tokens if token in domain_based_words else other_tokens).append(token)
+    return domain_based_tokens, other_tokens
 
 
 def tokenize(sentence, lowerize=False):
@@ -338,12 +610,12 @@ def stemmerize(data, lang='english'):
     return stemmerized_tokens
 
 
-def lemmatize(data, nlp_instance=LEMMATIZER_INSTANCE, pos_tags_kept=SPACY_UNIVERSAL_POS_TAGS, keep_original_text=False):
+def lemmatize(data, nlp_instance=None, pos_tags_kept=SPACY_UNIVERSAL_POS_TAGS, keep_original_text=False):
     """
     Lemmatize a list of tokens or a sentence
 
     :param data: list of tokens (or a string)
-    :param nlp_instance: spacy loaded instance
+    :param nlp_instance: spacy loaded instance (default is shared instance, see get_nlp_instance)
     :param pos_tags_kept: Spacy tags to filter
     :param keep_original_text: boolean which enable/disable adding original token/word to lemmatized list of tokens
 
@@ -351,8 +623,8 @@ def lemmatize(data, nlp_instance=LEMMATIZER_INSTANCE, pos_tags_kept=SPACY_UNIVER
     """
     data_type = type(data)
     data = [data] if data_type is str else data
-    lemmatizer = nlp_instance
-    results = list(lemmatizer.pipe(data))
+    lemmatizer = nlp_instance if nlp_instance is not None else get_nlp_instance()
+    results = list(lemmatizer.pipe(data, disable=LEMMATIZER_DISABLED_PIPES))
     lemmatized_tokens = []
     for document in results:
         for token in document:
@@ -379,12 +651,12 @@ def extract_n_grams(data, n=2):
     return ngrams
 
 
-def pos_tag(data, nlp_instance=POS_TAGGER_INSTANCE, filtered_tags=(), only_tokens=False, module_type='spacy'):
+def pos_tag(data, nlp_instance=None, filtered_tags=(), only_tokens=False, module_type='spacy'):
     """
     POS tag a list of tokens (or a sentence)
 
     :param data: list of tokens (or a string)
-    :param nlp_instance: spacy loaded instance
+    :param nlp_instance: spacy loaded instance (default is shared instance, see get_nlp_instance)
     :param filtered_tags: POS tags to filter
     :param only_tokens: boolean which enable/disable returning only filtered tokens
     :param module_type: module architecture type ('spacy' or 'nltk')
@@ -392,12 +664,12 @@ def pos_tag(data, nlp_instance=POS_TAGGER_INSTANCE, filtered_tags=(), only_token
     :return: tagged tokens
     """
     if module_type is 'spacy':
-        pos = nlp_instance
+        pos = nlp_instance if nlp_instance is not None else get_nlp_instance()
         if type(data) is list:
-            results = list(pos.pipe(data))
+            results = list(pos.pipe(data, disable=POS_TAGGER_DISABLED_PIPES))
             tagged_tokens = [(tk.text, tk.tag_) for doc in results for tk in doc if tk.tag_ not in filtered_tags]
         else:
-            results = pos(data)
+            results = pos(data, disable=POS_TAGGER_DISABLED_PIPES)
             tagged_tokens = [(doc.text, doc.tag_) for doc in results if doc.tag_ not in filtered_tags]
     else:
         tagged_tokens = nltk.pos_tag(data) if type(data) is list else nltk.pos_tag(tokenize(data))
@@ -406,24 +678,24 @@ def pos_tag(data, nlp_instance=POS_TAGGER_INSTANCE, filtered_tags=(), only_token
     return tagged_tokens
 
 
-def name_entity_recognize(data, nlp_instance=NER_INSTANCE, filtered_entities=(), only_tokens=False):
+def name_entity_recognize(data, nlp_instance=None, filtered_entities=(), only_tokens=False):
     """
     Extract name entities from a list of tokens (or a sentence)
 
     :param data: list of tokens (or a string)
-    :param nlp_instance: spacy loaded instance
+    :param nlp_instance: spacy loaded instance (default is shared instance, see get_nlp_instance)
     :param filtered_entities: entities to filter
     :param only_tokens: boolean which filter entities from NER results
 
     :return: tokens entities
     """
-    ner = nlp_instance
+    ner = nlp_instance if nlp_instance is not None else get_nlp_instance()
     if type(data) is list:
-        results = list(ner.pipe(data))
+        results = list(ner.pipe(data, disable=NER_DISABLED_PIPES))
         tokens_ents = [(ent.text, ent.label_) for doc in results
                        for ent in doc.ents if ent.label_ not in filtered_entities]
     else:
-        results = ner(data)
+        results = ner(data, disable=NER_DISABLED_PIPES)
         tokens_ents = [(ent.text, ent.label_) for ent in results.ents]
     if only_tokens:
         tokens_ents = [token for token, entity in tokens_ents]
@@ -553,3 +825,136 @@ def text_normalizer(text,
     tokens.extend(domain_based_tokens)
     return tokens
 
+
+########################################################################################################################
+#                                          COMPILED TEXT NORMALIZER                                                    #
+########################################################################################################################
+
+
+@functools.lru_cache(maxsize=None)
+def get_digits_translation_table():
+    """
+    Translation table which removes characters filtered by filter_digits (built once)
+
+    :return: a translation table removing every unicode character for which str.isdigit is true (dict)
+    """
+    return str.maketrans('', '', ''.join(chr(c) for c in range(sys.maxunicode + 1) if chr(c).isdigit()))
+
+
+class CompiledTextNormalizer:
+
+    def __init__(self,
+                 lowerizer=False,
+                 no_digits=False,
+                 no_punctuation=False,
+                 no_repeated_characters=False,
+                 no_single_letters=False,
+                 no_stopwords=False,
+                 stopwords_params=None,
+                 domain_words=(),
+                 punctuation_regex_pattern='[^0-9a-zA-Z]+',
+                 repeated_characters_thr=3,
+                 **other_normalizer_params):
+        """
+        Text normalizer built once from text_normalizer parameters (same output as text_normalizer) :
+        regexes are precompiled, stopwords & domain words are frozen and all token filters (digits, punctuation,
+        repeated characters, single letters & stopwords) are applied in one pass per token
+
+        :param lowerizer: boolean which enable/disable lowerizing text data
+        :param no_digits: boolean which enable/disable cleaning & filtering string which contains digits
+        :param no_punctuation: boolean which enable/disable filtering punctuation
+        :param no_repeated_characters: boolean which enable/disable filtering repeated characters in words
+        :param no_single_letters: boolean which enable/disable filtering words-letters
+        :param no_stopwords: boolean which enable/disable filtering stopwords in string
+        :param stopwords_params: stopwords parameters (dict, see filter_stopwords)
+        :param domain_words: list of domain based words need to be kept
+        :param punctuation_regex_pattern: regex pattern to filter punctuation (see filter_punctuation)
+        :param repeated_characters_thr: repeated characters threshold (see filter_repeated_characters)
+        :param other_normalizer_params: other text_normalizer parameters (applied after one pass filters)
+        """
+        self.lowerizer = lowerizer
+        self.no_digits = no_digits
+        self.digits_translation_table = get_digits_translation_table() if no_digits else None
+        self.no_punctuation = no_punctuation
+        self.no_repeated_characters = no_repeated_characters
+        self.no_single_letters = no_single_letters
+        self.no_stopwords = no_stopwords
+        self.domain_words = domain_words if isinstance(domain_words, VocabularyFilter) \
+            else VocabularyFilter(domain_words if domain_words is not None else (), name='domain_words')
+        self.punctuation_regex = re.compile(punctuation_regex_pattern)
+        self.repeated_characters_regex = re.compile(r'(.)\1{%d,}' % (repeated_characters_thr - 1), re.DOTALL)
+        # Stopwords (same defaults as filter_stopwords)
+        stopwords_params = dict(stopwords_params) if stopwords_params is not None else {}
+        self.stopwords = get_stopwords_filter(lib=stopwords_params.get('lib', 'nltk'),
+                                              lang=stopwords_params.get('lang', 'english'),
+                                              other_stopwords=stopwords_params.get('other_stopwords'))
+        self.min_token_length = stopwords_params.get('min_token_length', 0)
+        # Other text normalizer steps (duplicates, similar words, stemmerizer etc ...) are applied with text_normalizer
+        self.other_normalizer_params = {param: value for param, value in other_normalizer_params.items()
+                                        if param not in ['duplicates_type'] and value}
+        self.duplicates_type = other_normalizer_params.get('duplicates_type', 'token')
+        if len(self.other_normalizer_params) > 0:
+            self.other_normalizer_params['duplicates_type'] = self.duplicates_type
+
+    def normalize_token(self, token):
+        """
+        Apply all enabled one pass filters to a token
+
+        :param token: a token (str)
+
+        :return: list of normalized sub-tokens (a token can be split by punctuation filter)
+        """
+        if self.no_digits:
+            token = token.translate(self.digits_translation_table)
+            if len(token.strip(' ')) == 0:
+                return []
+        if self.no_punctuation:
+            if token in string.ascii_letters:
+                return []
+            subtokens = self.punctuation_regex.sub(' ', token).split()
+        else:
+            subtokens = [token]
+        normalized_tokens = []
+        for subtoken in subtokens:
+            if self.no_repeated_characters and self.repeated_characters_regex.search(subtoken) is not None:
+                continue
+            if self.no_single_letters and subtoken in string.ascii_letters:
+                continue
+            if self.no_stopwords and (subtoken in self.stopwords or len(subtoken) <= self.min_token_length):
+                continue
+            normalized_tokens.append(subtoken)
+        return normalized_tokens
+
+    def __call__(self, text):
+        """
+        Normalize a sentence (or a list of tokens)
+
+        :param text: text data
+
+        :return: a list of tokens
+        """
+        tokens = tokenize(text, lowerize=self.lowerizer) if type(text) is str else text
+        normalized_tokens = []
+        domain_based_tokens = []
+        domain_words = self.domain_words.vocabulary
+        for token in tokens:
+            if token in domain_words:
+                domain_based_tokens.append(token)
+            else:
+                normalized_tokens.extend(self.normalize_token(token))
+        self.domain_words.count_lookups(len(tokens), len(domain_based_tokens))
+        if len(self.other_normalizer_params) > 0:
+            normalized_tokens = text_normalizer(normalized_tokens, **self.other_normalizer_params)
+            if self.other_normalizer_params.get('no_duplicates') and self.duplicates_type in ['domain', 'all']:
+                domain_based_tokens = list(set(domain_based_tokens))
+        # Merge generic tokens and domain based tokens
+        normalized_tokens.extend(domain_based_tokens)
+        return normalized_tokens
+
+    def get_vocabulary_stats(self):
+        """
+        Get statistics of normalizer vocabularies (domain words & stopwords)
+
+        :return: vocabularies statistics (dict)
+        """
+        return {'domain_words': self.domain_words.get_stats(), 'stopwords': self.stopwords.get_stats()}
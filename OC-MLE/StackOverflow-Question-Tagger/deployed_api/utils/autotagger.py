@@ -1,28 +1,144 @@
+import time
 import numpy as np
-from googletrans import Translator
+from src.gru_runtime import pad_sequences
+from utils.translator import TextTranslator
 
 
-def words_translator(text, language='en'):
+# Default text translator (built on first translation)
+DEFAULT_TRANSLATOR = None
+
+# GRU inference modes (see vectorize_questions)
+INFERENCE_MODES = ('token', 'question')
+
+
+def words_translator(text, language='en', translator=None):
     """
-    Function which translate a word to another language (default translated language is english) by using
-    Google Translate API
+    Function which translate a word to another language (default translated language is english)
+    (english texts are detected locally and never sent to the translation backend, see utils.translator)
+
     :param text: a text (sentence(s) or word(s)) (str)
     :param language: destination language code
     (e.g. : https://py-googletrans.readthedocs.io/en/latest/#googletrans-languages)
+    :param translator: a TextTranslator instance (default uses Google Translate API backend)
 
     :return: a text translated
     """
-    filtered_text = ' '.join(filter(str.isalpha, text.split()))
-    try:
-        translated_text = Translator().translate(filtered_text, dest=language).text
-        if filtered_text == text:
-            return translated_text
-        return translated_text + ' ' + ''.join([w for w in text if w not in filtered_text])
-    except AttributeError:
-        return words_translator(text)
+    global DEFAULT_TRANSLATOR
+    if translator is None:
+        if DEFAULT_TRANSLATOR is None:
+            DEFAULT_TRANSLATOR = TextTranslator()
+        translator = DEFAULT_TRANSLATOR
+    return translator.translate(text, language=language)
+
+
+def get_tag_thresholds(classes, threshold=0.5):
+    """
+    Build decision threshold of each tag
+
+    :param classes: tags labels (numpy array, e.g. multilabel_encoder.classes_)
+    :param threshold: a threshold shared by all tags (float), a threshold per tag (array of len(classes) floats)
+    or thresholds of specific tags (dict {tag: threshold}, other tags use 0.5 threshold)
+
+    :return: threshold of each tag (numpy array)
+    """
+    if isinstance(threshold, dict):
+        thresholds = np.full(len(classes), 0.5)
+        tag_positions = {tag: position for position, tag in enumerate(classes)}
+        for tag, tag_threshold in threshold.items():
+            if tag not in tag_positions:
+                raise Exception(f'{tag} tag not implemented')
+            thresholds[tag_positions[tag]] = tag_threshold
+        return thresholds
+    return np.broadcast_to(np.asarray(threshold, dtype=float), (len(classes),))
+
+
+def merge_question_predictions(predictions, question_ids, n_questions, thresholds=None):
+    """
+    Merge predictions of all sequences of each question (one NumPy reduction per question block)
+
+    :param predictions: predicted probabilities (numpy array, shape (n_sequences, n_tags))
+    :param question_ids: question index of each sequence (sorted numpy array)
+    :param n_questions: number of questions
+    :param thresholds: threshold of each tag (numpy array), None merges probabilities instead of predicted tags
+
+    :return: predicted tags of each question (any sequence predicts tag, boolean numpy array) if thresholds
+    else max probability of each tag by question (numpy array), shape (n_questions, n_tags)
+    """
+    if thresholds is not None:
+        predictions, reducer, dtype = predictions > thresholds, np.logical_or, bool
+    else:
+        reducer, dtype = np.maximum, predictions.dtype
+    merged_predictions = np.zeros((n_questions, predictions.shape[1]), dtype=dtype)
+    if len(predictions) > 0:
+        starts = np.flatnonzero(np.diff(question_ids, prepend=-1))
+        merged_predictions[question_ids[starts]] = reducer.reduceat(predictions, starts, axis=0)
+    return merged_predictions
 
 
-def autotag_question(vectorized_question, model, multilabel_encoder, upperize=False):
+def decode_selected_tags(selected_tags, classes, confidences=None, top_k=None):
+    """
+    Decode selected tags matrix into tags labels (in classes order, like multilabel_encoder.inverse_transform)
+
+    :param selected_tags: selected tags of each question (boolean numpy array, shape (n_questions, n_tags))
+    :param classes: tags labels (numpy array, e.g. multilabel_encoder.classes_)
+    :param confidences: max probability of each tag by question (numpy array, same shape as selected_tags)
+    :param top_k: maximum number of tags kept by question (most confident tags, requires confidences)
+
+    :return: predicted tags labels for each question (list of lists of strings) & their confidences
+    (list of lists of floats) if confidences are given
+    """
+    if top_k is not None and top_k < len(classes):
+        # Only keep top_k most confident tags of each question
+        not_top_k = np.argpartition(-confidences, top_k, axis=1)[:, top_k:]
+        np.put_along_axis(selected_tags, not_top_k, False, axis=1)
+    rows, columns = np.nonzero(selected_tags)
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(selected_tags)))]).tolist()
+    tags = np.asarray(classes)[columns].tolist()
+    predicted_tags_labels = [tags[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    if confidences is None:
+        return predicted_tags_labels
+    tags_confidences = confidences[rows, columns].tolist()
+    return predicted_tags_labels, [tags_confidences[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def decode_multilabel_predictions(predictions, classes, question_ids=None, n_questions=None, threshold=0.5,
+                                  top_k=None, return_confidences=False):
+    """
+    Decode predicted probabilities into tags labels (NumPy-only decoding path, equivalent to rounding predictions
+    then calling multilabel_encoder.inverse_transform with a 0.5 threshold)
+
+    Each tag is predicted for a sequence if its probability is strictly above its threshold, predicted tags of all
+    sequences of a question are merged (a tag is predicted for a question if any of its sequences predicts it).
+
+    :param predictions: predicted probabilities (numpy array, shape (n_sequences, n_tags))
+    :param classes: tags labels (numpy array, e.g. multilabel_encoder.classes_)
+    :param question_ids: question index of each sequence (sorted numpy array, None means all sequences belong to a
+    single question)
+    :param n_questions: number of questions (default is max question index + 1)
+    :param threshold: decision threshold(s) (see get_tag_thresholds)
+    :param top_k: maximum number of tags kept by question (most confident tags, None keeps all tags)
+    :param return_confidences: return confidence (max probability) of each predicted tag (boolean)
+
+    :return: predicted tags labels for each question (list of lists of strings) & their confidences
+    (list of lists of floats) if return_confidences is True
+    """
+    if question_ids is None:
+        question_ids = np.zeros(len(predictions), dtype=int)
+        n_questions = 1
+    elif n_questions is None:
+        n_questions = int(question_ids[-1]) + 1 if len(question_ids) > 0 else 0
+    thresholds = get_tag_thresholds(classes, threshold)
+    if top_k is None and not return_confidences:
+        # Fast path : union of thresholded predictions
+        selected_tags = merge_question_predictions(predictions, question_ids, n_questions, thresholds=thresholds)
+        return decode_selected_tags(selected_tags, classes)
+    confidences = merge_question_predictions(predictions, question_ids, n_questions)
+    predicted_tags = decode_selected_tags(confidences > thresholds, classes, confidences=confidences, top_k=top_k)
+    return predicted_tags if return_confidences else predicted_tags[0]
+
+
+def autotag_question(vectorized_question, model, multilabel_encoder, upperize=False, threshold=0.5, top_k=None,
+                     return_confidences=False):
     """
     Predict a list of tags for a specific question
 
@@ -30,14 +146,201 @@ def autotag_question(vectorized_question, model, multilabel_encoder, upperize=Fa
     :param model: a trained text classifier model
     :param multilabel_encoder: a multi-label encoder instance
     :param upperize: apply uppercase function to predicted tags (boolean)
+    :param threshold: decision threshold(s) (see get_tag_thresholds)
+    :param top_k: maximum number of predicted tags (None keeps all tags)
+    :param return_confidences: return confidence of each predicted tag (boolean)
 
-    :return: predicted tags labels (list of strings)
+    :return: predicted tags labels (list of strings) & their confidences (list of floats) if return_confidences
     """
     # Predict tags
-    predicted_tags = np.round(model.predict(vectorized_question))
+    predictions = model.predict(vectorized_question)
     # Get tag labels
-    predicted_tags_labels = multilabel_encoder.inverse_transform(predicted_tags)
-    predicted_tags_labels = list(set([tag for tags in predicted_tags_labels for tag in tags if len(tags) > 0]))
+    predicted_tags_labels, predicted_tags_confidences = decode_multilabel_predictions(predictions,
+                                                                                      multilabel_encoder.classes_,
+                                                                                      threshold=threshold,
+                                                                                      top_k=top_k,
+                                                                                      return_confidences=True)
+    predicted_tags_labels, predicted_tags_confidences = predicted_tags_labels[0], predicted_tags_confidences[0]
     if upperize:
         predicted_tags_labels = [tag.upper() for tag in predicted_tags_labels]
+    if return_confidences:
+        return predicted_tags_labels, predicted_tags_confidences
     return predicted_tags_labels
+
+
+def vectorize_questions(normalized_questions, tokenizer, maxlen, mode='token'):
+    """
+    Vectorize a batch of normalized questions into a single padded matrix
+
+    :param normalized_questions: list of normalized questions (list of lists of tokens)
+    :param tokenizer: a fitted keras tokenizer (or a SequenceEncoder)
+    :param maxlen: padded sequences length
+    :param mode: inference mode, could be :
+
+           - 'token': each normalized token is converted to its own sequence (legacy mode)
+           - 'question': normalized tokens are joined into one sequence per question (like training sequences)
+
+    :return: padded sequences (numpy array) & question index of each padded sequence (numpy array)
+    """
+    if mode not in INFERENCE_MODES:
+        raise Exception(f'{mode} inference mode not implemented')
+    if hasattr(tokenizer, 'encode_batch'):
+        # Sequence encoder (memoized tokens encodings written in a preallocated padded matrix)
+        if mode == 'token':
+            texts = [token for normalized_tokens in normalized_questions for token in normalized_tokens]
+            question_ids = [question_id for question_id, normalized_tokens in enumerate(normalized_questions)
+                            for _ in normalized_tokens]
+        else:
+            texts = normalized_questions
+            question_ids = range(len(normalized_questions))
+        return tokenizer.encode_batch(texts, maxlen=maxlen), np.array(question_ids, dtype=int)
+    sequences = []
+    question_ids = []
+    for question_id, normalized_tokens in enumerate(normalized_questions):
+        if mode == 'token':
+            question_sequences = tokenizer.texts_to_sequences(normalized_tokens)
+        else:
+            question_sequences = tokenizer.texts_to_sequences([' '.join(normalized_tokens)])
+        sequences.extend(question_sequences)
+        question_ids.extend([question_id] * len(question_sequences))
+    padded_questions = pad_sequences(sequences, maxlen=maxlen)
+    return padded_questions, np.array(question_ids, dtype=int)
+
+
+def autotag_questions(padded_questions, question_ids, n_questions, model, multilabel_encoder, chunk_size=4096,
+                      upperize=False, threshold=0.5, top_k=None, return_confidences=False):
+    """
+    Predict a list of tags for each question of a batch (predictions are computed chunk by chunk)
+
+    :param padded_questions: padded sequences of all questions (numpy array)
+    :param question_ids: question index of each padded sequence (numpy array, sorted by question)
+    :param n_questions: number of questions in batch
+    :param model: a trained text classifier model
+    :param multilabel_encoder: a multi-label encoder instance
+    :param chunk_size: maximum number of padded sequences predicted at once
+    :param upperize: apply uppercase function to predicted tags (boolean)
+    :param threshold: decision threshold(s) (see get_tag_thresholds)
+    :param top_k: maximum number of predicted tags by question (None keeps all tags)
+    :param return_confidences: return confidence of each predicted tag (boolean)
+
+    :return: predicted tags labels for each question (list of lists of strings) & their confidences
+    (list of lists of floats) if return_confidences
+    """
+    thresholds = get_tag_thresholds(multilabel_encoder.classes_, threshold)
+    with_confidences = top_k is not None or return_confidences
+    question_predictions = None
+    for start in range(0, len(padded_questions), chunk_size):
+        # Predict tags of current chunk
+        chunk_predictions = model.predict(padded_questions[start:start + chunk_size])
+        # Merge predictions of each sequence into its question predictions
+        chunk_question_predictions = merge_question_predictions(chunk_predictions,
+                                                                question_ids[start:start + chunk_size],
+                                                                n_questions,
+                                                                thresholds=None if with_confidences else thresholds)
+        if question_predictions is None:
+            question_predictions = chunk_question_predictions
+        else:
+            np.maximum(question_predictions, chunk_question_predictions, out=question_predictions)
+    if question_predictions is None:
+        question_predictions = np.zeros((n_questions, len(thresholds)), dtype=float if with_confidences else bool)
+    # Get tag labels
+    classes = np.char.upper(multilabel_encoder.classes_.astype(str)) if upperize else multilabel_encoder.classes_
+    if not with_confidences:
+        return decode_selected_tags(question_predictions, classes)
+    predicted_tags = decode_selected_tags(question_predictions > thresholds,
+                                          classes,
+                                          confidences=question_predictions,
+                                          top_k=top_k)
+    return predicted_tags if return_confidences else predicted_tags[0]
+
+
+def cached_autotag_questions(padded_questions, question_ids, n_questions, model, multilabel_encoder,
+                             prediction_cache=None, chunk_size=4096, upperize=False, threshold=0.5, top_k=None):
+    """
+    Predict a list of tags for each question of a batch, only questions missing from prediction cache are predicted
+
+    :param padded_questions: padded sequences of all questions (numpy array)
+    :param question_ids: question index of each padded sequence (numpy array, sorted by question)
+    :param n_questions: number of questions in batch
+    :param model: a trained text classifier model
+    :param multilabel_encoder: a multi-label encoder instance
+    :param prediction_cache: a PredictionCache instance (None disables caching)
+    :param chunk_size: maximum number of padded sequences predicted at once
+    :param upperize: apply uppercase function to predicted tags (boolean)
+    :param threshold: decision threshold(s) (see get_tag_thresholds, must not change for a same prediction cache)
+    :param top_k: maximum number of predicted tags by question (must not change for a same prediction cache)
+
+    :return: predicted tags labels for each question (list of lists of strings)
+    """
+    if prediction_cache is None:
+        return autotag_questions(padded_questions, question_ids, n_questions, model, multilabel_encoder,
+                                 chunk_size=chunk_size, upperize=upperize, threshold=threshold, top_k=top_k)
+    # Padded sequences bounds of each question
+    bounds = np.searchsorted(question_ids, np.arange(n_questions + 1))
+    predicted_tags_labels = [None] * n_questions
+    missing_keys = {}
+    for question_id in range(n_questions):
+        key = prediction_cache.make_key(padded_questions[bounds[question_id]:bounds[question_id + 1]])
+        cached_tags = prediction_cache.get(key)
+        if cached_tags is not None:
+            predicted_tags_labels[question_id] = cached_tags
+        else:
+            missing_keys.setdefault(key, []).append(question_id)
+    if len(missing_keys) > 0:
+        # Predict each missing question once (duplicated questions of the batch share the same key)
+        missing_ids = [question_ids_by_key[0] for question_ids_by_key in missing_keys.values()]
+        missing_padded_questions = np.concatenate([padded_questions[bounds[question_id]:bounds[question_id + 1]]
+                                                   for question_id in missing_ids])
+        missing_question_ids = np.repeat(np.arange(len(missing_ids)),
+                                         [bounds[question_id + 1] - bounds[question_id] for question_id in missing_ids])
+        missing_predicted_tags = autotag_questions(missing_padded_questions,
+                                                   missing_question_ids,
+                                                   len(missing_ids),
+                                                   model,
+                                                   multilabel_encoder,
+                                                   chunk_size=chunk_size,
+                                                   threshold=threshold,
+                                                   top_k=top_k)
+        for (key, question_ids_by_key), tags in zip(missing_keys.items(), missing_predicted_tags):
+            prediction_cache.set(key, list(tags))
+            for question_id in question_ids_by_key:
+                predicted_tags_labels[question_id] = list(tags)
+    return [[tag.upper() if upperize else tag for tag in tags] for tags in predicted_tags_labels]
+
+
+def compare_inference_modes(normalized_questions, tokenizer, maxlen, model, multilabel_encoder, chunk_size=4096):
+    """
+    Compare 'token' (legacy) & 'question' inference modes on a batch of normalized questions
+
+    :param normalized_questions: list of normalized questions (list of lists of tokens)
+    :param tokenizer: a fitted keras tokenizer
+    :param maxlen: padded sequences length
+    :param model: a trained text classifier model
+    :param multilabel_encoder: a multi-label encoder instance
+    :param chunk_size: maximum number of padded sequences predicted at once
+
+    :return: latency & predicted rows of each mode, tag agreement between modes (dict)
+    """
+    predicted_tags_by_mode = {}
+    report = {}
+    for mode in ['token', 'question']:
+        start_time = time.perf_counter()
+        padded_questions, question_ids = vectorize_questions(normalized_questions, tokenizer, maxlen, mode=mode)
+        predicted_tags_by_mode[mode] = autotag_questions(padded_questions,
+                                                         question_ids,
+                                                         len(normalized_questions),
+                                                         model,
+                                                         multilabel_encoder,
+                                                         chunk_size=chunk_size)
+        report[mode] = {'latency_ms': round((time.perf_counter() - start_time) * 1000, 3),
+                        'predicted_rows': len(padded_questions)}
+    # Tag agreement between modes (jaccard similarity & exact match of predicted tags)
+    jaccard_scores = []
+    for token_tags, question_tags in zip(predicted_tags_by_mode['token'], predicted_tags_by_mode['question']):
+        token_tags, question_tags = set(token_tags), set(question_tags)
+        union = token_tags | question_tags
+        jaccard_scores.append(len(token_tags & question_tags) / len(union) if len(union) > 0 else 1.0)
+    report['agreement'] = {'jaccard': round(float(np.mean(jaccard_scores)), 4) if len(jaccard_scores) > 0 else 1.0,
+                           'exact_match': round(float(np.mean([score == 1.0 for score in jaccard_scores])), 4)
+                           if len(jaccard_scores) > 0 else 1.0}
+    return report
@@ -0,0 +1,290 @@
+import sys
+import json
+import time
+import subprocess
+import numpy as np
+
+
+########################################################################################################################
+#                                              BENCHMARK HELPERS                                                       #
+########################################################################################################################
+
+
+def time_function(function, inputs, n_runs=5):
+    """
+    Time a function applied to each input (best run is kept to reduce noise)
+
+    :param function: function to benchmark
+    :param inputs: list of inputs (each input is passed as single argument)
+    :param n_runs: number of runs
+
+    :return: timing results (dict)
+    """
+    run_times = []
+    for _ in range(n_runs):
+        start_time = time.perf_counter()
+        for function_input in inputs:
+            function(function_input)
+        run_times.append(time.perf_counter() - start_time)
+    best_run_time = min(run_times)
+    return {'best_run_s': round(best_run_time, 6),
+            'mean_run_s': round(float(np.mean(run_times)), 6),
+            'per_item_us': round(best_run_time / max(len(inputs), 1) * 1e6, 3),
+            'items_per_s': round(len(inputs) / best_run_time, 1) if best_run_time > 0 else float('inf')}
+
+
+# Startup measurement script (run in a fresh interpreter)
+STARTUP_SCRIPT = """
+import importlib, json, resource, time
+start_time = time.perf_counter()
+importlib.import_module({module!r})
+import_time = time.perf_counter() - start_time
+exec({warmup!r})
+warmup_time = time.perf_counter() - start_time - import_time
+try:
+    # Peak RSS of current process image (ru_maxrss also counts the parent process peak RSS on linux)
+    with open('/proc/self/status') as status:
+        max_rss = [int(line.split()[1]) for line in status if line.startswith('VmHWM')][0]
+except OSError:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'import_s': import_time,
+                  'warmup_s': warmup_time,
+                  'max_rss_mb': max_rss / 1024}}))
+"""
+
+
+def benchmark_startup(module='config.app_config', warmup='', n_runs=3):
+    """
+    Measure cold start (import time) & peak RSS of a module in fresh python interpreters
+    (must be run from deployed_api folder)
+
+    :param module: module to import (e.g. 'config.app_config' or 'src.text_preprocessor')
+    :param warmup: python statement run after import (e.g. first lazy spaCy model loading)
+    :param n_runs: number of fresh interpreters
+
+    :return: startup results (dict)
+    """
+    runs = []
+    for _ in range(n_runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT.format(module=module, warmup=warmup)],
+                                capture_output=True,
+                                text=True,
+                                check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {metric: round(float(np.median([run[metric] for run in runs])), 3) for metric in runs[0]}
+
+
+########################################################################################################################
+#                                             TEXT PREPROCESSING                                                       #
+########################################################################################################################
+
+
+def benchmark_text_normalizer(tokenized_questions, normalizer_params, n_runs=5):
+    """
+    Compare text_normalizer & CompiledTextNormalizer (speed & identical outputs)
+
+    :param tokenized_questions: list of tokenized questions (list of lists of tokens)
+    :param normalizer_params: text normalizer parameters (dict, e.g. TEXT_NORMALIZER_PARAMS)
+    :param n_runs: number of runs
+
+    :return: benchmark results (dict)
+    """
+    from src.text_preprocessor import text_normalizer, CompiledTextNormalizer
+    compiled_text_normalizer = CompiledTextNormalizer(**normalizer_params)
+    identical_outputs = all(text_normalizer(list(tokens), **normalizer_params) == compiled_text_normalizer(tokens)
+                            for tokens in tokenized_questions)
+    reference_results = time_function(lambda tokens: text_normalizer(list(tokens), **normalizer_params),
+                                      tokenized_questions,
+                                      n_runs=n_runs)
+    compiled_results = time_function(compiled_text_normalizer, tokenized_questions, n_runs=n_runs)
+    return {'text_normalizer': reference_results,
+            'compiled_text_normalizer': compiled_results,
+            'speedup': round(reference_results['best_run_s'] / compiled_results['best_run_s'], 2),
+            'identical_outputs': identical_outputs}
+
+
+def benchmark_html_filter(html_corpus, keep_code_blocks=True, n_runs=3):
+    """
+    Compare BeautifulSoup & streaming HTML tags filters (throughput & identical texts)
+
+    :param html_corpus: list of HTML question bodies (list of strings)
+    :param keep_code_blocks: boolean which enable/disable keeping text of code blocks (streaming filter)
+    :param n_runs: number of runs
+
+    :return: benchmark results (dict)
+    """
+    from src.text_preprocessor import filter_html_tags
+    corpus_size_mb = sum(len(html.encode('utf-8')) for html in html_corpus) / 1e6
+    results = {}
+    for method in ['bs4', 'stream']:
+        method_results = time_function(lambda html: filter_html_tags(html,
+                                                                     method=method,
+                                                                     keep_code_blocks=keep_code_blocks),
+                                       html_corpus,
+                                       n_runs=n_runs)
+        method_results['mb_per_s'] = round(corpus_size_mb / method_results['best_run_s'], 3)
+        results[method] = method_results
+    results['speedup'] = round(results['bs4']['best_run_s'] / results['stream']['best_run_s'], 2)
+    if keep_code_blocks:
+        identical_texts = [filter_html_tags(html, method='bs4') == filter_html_tags(html, method='stream')
+                           for html in html_corpus]
+        results['identical_ratio'] = round(float(np.mean(identical_texts)), 4)
+    return results
+
+
+########################################################################################################################
+#                                               MODEL RUNTIMES                                                         #
+########################################################################################################################
+
+# Model loading statement run after import in fresh interpreters (see benchmark_startup)
+MODEL_LOADING_SCRIPT = """
+from src.text_classifier_evaluator import keras_f1_score
+model, input_length = load_gru_model({runtime!r}, {model_path!r}, custom_objects={{'f1_score': keras_f1_score}})
+model.predict(np.zeros((1, input_length), dtype='int32'))
+"""
+
+
+def benchmark_model_runtimes(model_paths, padded_questions, n_runs=3):
+    """
+    Compare GRU inference runtimes : cold start (import + model loading + first prediction), peak RSS,
+    p50/p99 latency of single question predictions & parity with keras predictions (must be run from deployed_api
+    folder)
+
+    :param model_paths: model artifact path by runtime (dict, e.g. GRU_MODEL_PATHS)
+    :param padded_questions: padded sequences predicted one by one (numpy array)
+    :param n_runs: number of fresh interpreters used to measure cold start
+
+    :return: benchmark results by runtime (dict)
+    """
+    from src.gru_runtime import load_gru_model, check_runtime_parity
+    from src.text_classifier_evaluator import keras_f1_score
+    results = {}
+    models = {}
+    for runtime, model_path in model_paths.items():
+        results[runtime] = benchmark_startup(module='src.gru_runtime',
+                                             warmup='from src.gru_runtime import np, load_gru_model\n' +
+                                                    MODEL_LOADING_SCRIPT.format(runtime=runtime,
+                                                                                model_path=model_path),
+                                             n_runs=n_runs)
+        models[runtime], _ = load_gru_model(runtime, model_path, custom_objects={'f1_score': keras_f1_score})
+        latencies_ms = []
+        for i in range(len(padded_questions)):
+            start_time = time.perf_counter()
+            models[runtime].predict(padded_questions[i:i + 1])
+            latencies_ms.append((time.perf_counter() - start_time) * 1000)
+        results[runtime]['p50_ms'] = round(float(np.percentile(latencies_ms, 50)), 3)
+        results[runtime]['p99_ms'] = round(float(np.percentile(latencies_ms, 99)), 3)
+    if 'keras' in models:
+        for runtime in models:
+            if runtime != 'keras':
+                results[runtime]['parity'] = check_runtime_parity(models['keras'], models[runtime], padded_questions)
+    return results
+
+
+def benchmark_length_bucketing(model, padded_questions, bucket_params=None, batch_size=256, n_runs=3):
+    """
+    Compare fully padded & length bucketed predictions of a model masking padding zeros : tokens (non padding words)
+    by second & parity of predictions
+
+    :param model: a model loaded by load_gru_model (embedding layer with mask_zero)
+    :param padded_questions: padded sequences (numpy array, 'pre' padding)
+    :param bucket_params: BucketedModel parameters (dict, e.g. LENGTH_BUCKETING_PARAMS)
+    :param batch_size: number of sequences predicted at once by the fully padded model
+    :param n_runs: number of runs (best run is kept)
+
+    :return: benchmark results by mode (dict)
+    """
+    from src.gru_runtime import BucketedModel, check_runtime_parity
+    bucketed_model = BucketedModel(model, **dict({'batch_size': batch_size}, **(bucket_params or {})))
+    n_tokens = int(np.count_nonzero(padded_questions))
+    predictors = {'padded': lambda inputs: np.concatenate([model.predict(inputs[start:start + batch_size])
+                                                           for start in range(0, len(inputs), batch_size)]),
+                  'bucketed': bucketed_model.predict}
+    results = {}
+    for mode, predict in predictors.items():
+        timing = time_function(predict, [padded_questions], n_runs=n_runs)
+        results[mode] = {'best_run_s': timing['best_run_s'],
+                         'tokens_per_s': round(n_tokens / timing['best_run_s'], 1),
+                         'sequences_per_s': round(len(padded_questions) / timing['best_run_s'], 1)}
+    results['bucketed']['parity'] = check_runtime_parity(model, bucketed_model, padded_questions)
+    return results
+
+
+########################################################################################################################
+#                                            PREPROCESSING ARTIFACTS                                                   #
+########################################################################################################################
+
+# Artifacts loading & forked workers measurement script (run in a fresh interpreter)
+ARTIFACTS_SCRIPT = """
+import json, os, pickle, time
+from src.artifact_store import load_artifact
+
+
+def get_memory_mb():
+    # Rss, Pss (shared pages divided by number of processes sharing them) & private (unshared) memory
+    with open('/proc/self/smaps_rollup') as smaps:
+        memory = {{line.split(':')[0]: int(line.split()[1]) / 1024 for line in smaps if line.split()[-1] == 'kB'}}
+    return {{'rss_mb': memory['Rss'], 'pss_mb': memory['Pss'],
+             'private_mb': memory['Private_Clean'] + memory['Private_Dirty']}}
+
+
+start_time = time.perf_counter()
+if {artifact_format!r} == 'pickle':
+    artifacts = {{}}
+    for name in {names!r}:
+        with open(os.path.join({folder!r}, name + '.pkl'), 'rb') as file:
+            artifacts[name] = pickle.load(file)
+else:
+    artifacts = {{name: load_artifact(name, {folder!r}) for name in {names!r}}}
+load_time = time.perf_counter() - start_time
+results = {{'load_s': load_time, 'parent': get_memory_mb(), 'workers': []}}
+tokenizers = [artifact for artifact in artifacts.values() if hasattr(artifact, 'texts_to_sequences')]
+pipes = []
+for _ in range({n_workers}):
+    read_fd, write_fd = os.pipe()
+    if os.fork() == 0:
+        # Worker : tokenize the whole vocabulary (every word is looked up) then report its memory
+        os.close(read_fd)
+        for tokenizer in tokenizers:
+            words = list(tokenizer.word_index.keys())
+            for start in range(0, len(words), 1000):
+                tokenizer.texts_to_sequences([' '.join(words[start:start + 1000])])
+        with os.fdopen(write_fd, 'w') as pipe:
+            pipe.write(json.dumps(get_memory_mb()))
+        os._exit(0)
+    os.close(write_fd)
+    pipes.append(read_fd)
+for read_fd in pipes:
+    with os.fdopen(read_fd) as pipe:
+        results['workers'].append(json.loads(pipe.read()))
+    os.wait()
+print(json.dumps(results))
+"""
+
+
+def benchmark_artifacts(names=('GRU_tokenizer', 'multilabel_encoder', 'tags'), folder='data/preprocessing',
+                        n_workers=4):
+    """
+    Compare pickled & memory mapped preprocessing artifacts (see src.artifact_store) : load time & memory of forked
+    workers tokenizing the whole vocabulary (linux only, must be run from deployed_api folder)
+
+    :param names: artifact names (.pkl files & converted .mmap artifacts must exist)
+    :param folder: artifacts folder
+    :param n_workers: number of forked workers (like preloaded gunicorn workers)
+
+    :return: benchmark results by artifact format (dict)
+    """
+    results = {}
+    for artifact_format in ['pickle', 'mmap']:
+        script = ARTIFACTS_SCRIPT.format(artifact_format=artifact_format,
+                                         names=list(names),
+                                         folder=folder,
+                                         n_workers=n_workers)
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        results[artifact_format] = {'load_s': round(run['load_s'], 4),
+                                    'parent_rss_mb': round(run['parent']['rss_mb'], 1),
+                                    **{f'worker_{metric}': round(float(np.mean([worker[metric]
+                                                                                for worker in run['workers']])), 1)
+                                       for metric in ['rss_mb', 'pss_mb', 'private_mb']}}
+    return results
@@ -0,0 +1,123 @@
+import json
+import time
+import argparse
+import urllib.parse
+import urllib.request
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Default questions sent by load tests (english & non english questions with HTML tags)
+DEFAULT_QUESTIONS = ['<p>How do I merge two dictionaries in a single expression in Python?</p>',
+                     '<p>What is the difference between <code>let</code> and <code>var</code> in JavaScript?</p>',
+                     '<p>How to iterate over rows in a pandas DataFrame?</p><pre><code>df.iterrows()</code></pre>',
+                     '<p>Comment trier une liste de dictionnaires par valeur en Python ?</p>',
+                     '<p>Why is processing a sorted array faster than processing an unsorted array in C++?</p>',
+                     '<p>How can I make a SQL query with a join between three tables in MySQL?</p>']
+
+
+def send_request(url, route, question, timeout=30):
+    """
+    Send a question to a tagging route
+
+    :param url: server url (e.g. http://127.0.0.1:5000)
+    :param route: tagging route ('/_tag_question' (form request) or '/_tag_questions' (JSON request))
+    :param question: a raw question (str)
+    :param timeout: request timeout (in seconds)
+
+    :return: request latency (in seconds, None if request failed)
+    """
+    if route == '/_tag_questions':
+        data, content_type = json.dumps([question]).encode('utf-8'), 'application/json'
+    else:
+        data, content_type = urllib.parse.urlencode({'text': question}).encode('utf-8'), \
+                             'application/x-www-form-urlencoded'
+    http_request = urllib.request.Request(url + route, data=data, headers={'Content-Type': content_type})
+    start_time = time.perf_counter()
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            response.read()
+    except Exception:
+        return None
+    return time.perf_counter() - start_time
+
+
+def run_load_test(url, route='/_tag_question', questions=DEFAULT_QUESTIONS, concurrency=8, n_requests=200,
+                  timeout=30):
+    """
+    Send n_requests questions to a server with concurrency parallel clients
+
+    :param url: server url (e.g. http://127.0.0.1:5000)
+    :param route: tagging route ('/_tag_question' or '/_tag_questions')
+    :param questions: questions sent in turn (list of strings)
+    :param concurrency: number of parallel clients
+    :param n_requests: total number of requests
+    :param timeout: request timeout (in seconds)
+
+    :return: load test results (throughput, p50/p99 latency & errors) (dict)
+    """
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(lambda i: send_request(url, route, questions[i % len(questions)], timeout),
+                                      range(n_requests)))
+    total_time = time.perf_counter() - start_time
+    successful_latencies_ms = [latency * 1000 for latency in latencies if latency is not None]
+    return {'concurrency': concurrency,
+            'requests_per_s': round(len(successful_latencies_ms) / total_time, 2),
+            'p50_ms': round(float(np.percentile(successful_latencies_ms, 50)), 2) if successful_latencies_ms else None,
+            'p99_ms': round(float(np.percentile(successful_latencies_ms, 99)), 2) if successful_latencies_ms else None,
+            'errors': n_requests - len(successful_latencies_ms)}
+
+
+def compare_servers(urls, route='/_tag_question', questions=DEFAULT_QUESTIONS, concurrency_levels=(1, 2, 4, 8, 16, 32),
+                    n_requests=200, timeout=30):
+    """
+    Compare concurrency scaling of servers (e.g. Flask app & ASGI app)
+
+    :param urls: server url by name (dict, e.g. {'flask': 'http://127.0.0.1:5000', 'asgi': 'http://127.0.0.1:8000'})
+    :param route: tagging route ('/_tag_question' or '/_tag_questions')
+    :param questions: questions sent in turn (list of strings)
+    :param concurrency_levels: numbers of parallel clients
+    :param n_requests: number of requests by concurrency level
+    :param timeout: request timeout (in seconds)
+
+    :return: load test results of each server by concurrency level (dict)
+    """
+    results = {}
+    for name, url in urls.items():
+        # Warm up server (model loading, caches ...)
+        send_request(url, route, questions[0], timeout)
+        results[name] = [run_load_test(url, route, questions, concurrency, n_requests, timeout)
+                         for concurrency in concurrency_levels]
+    return results
+
+
+if __name__ == '__main__':
+    # e.g. python -m utils.load_test --url flask=http://127.0.0.1:5000 --url asgi=http://127.0.0.1:8000
+    parser = argparse.ArgumentParser(description='Load test of Stack Overflow Question Tagger servers')
+    parser.add_argument('--url', action='append', required=True, help='server as name=url (repeatable)')
+    parser.add_argument('--route', default='/_tag_question', choices=['/_tag_question', '/_tag_questions'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--requests', type=int, default=200, help='number of requests by concurrency level')
+    parser.add_argument('--questions', default=None, help='JSON file with a list of questions')
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+    if args.questions is not None:
+        with open(args.questions) as file:
+            load_test_questions = json.load(file)
+    else:
+        load_test_questions = DEFAULT_QUESTIONS
+    load_test_results = compare_servers(dict(url.split('=', 1) for url in args.url),
+                                        route=args.route,
+                                        questions=load_test_questions,
+                                        concurrency_levels=args.concurrency,
+                                        n_requests=args.requests,
+                                        timeout=args.timeout)
+    print(f"{'server':<10}{'concurrency':>12}{'requests/s':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'errors':>8}")
+    for server_name, server_results in load_test_results.items():
+        for result in server_results:
+            # Percentiles are missing when every request failed
+            p50_ms = result['p50_ms'] if result['p50_ms'] is not None else '-'
+            p99_ms = result['p99_ms'] if result['p99_ms'] is not None else '-'
+            print(f"{server_name:<10}{result['concurrency']:>12}{result['requests_per_s']:>12}{p50_ms:>10}"
+                  f"{p99_ms:>10}{result['errors']:>8}")
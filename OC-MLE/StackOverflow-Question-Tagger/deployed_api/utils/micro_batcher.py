@@ -0,0 +1,162 @@
+import os
+import time
+import queue
+import threading
+import numpy as np
+
+
+class _PredictionRequest:
+
+    def __init__(self, inputs):
+        """
+        Pending prediction request (a slice of the next coalesced batch)
+
+        :param inputs: padded sequences to predict (numpy array)
+        """
+        self.inputs = inputs
+        self.enqueue_time = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+
+    def __init__(self, model, max_batch_size=512, max_wait_ms=5):
+        """
+        Coalesce concurrent predictions into one batched model prediction
+
+        Each caller puts its padded sequences in a queue, a background worker waits up to max_wait_ms (or until
+        max_batch_size rows are queued), runs a single prediction and sends each caller its own slice of results.
+
+        :param model: a trained text classifier model (with a predict method)
+        :param max_batch_size: maximum number of rows predicted at once (a bigger single request is not split)
+        :param max_wait_ms: maximum time (in milliseconds) the first queued request waits for other requests
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._worker_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {'batches': 0,
+                         'requests': 0,
+                         'rows': 0,
+                         'max_batch_size': 0,
+                         'max_queue_depth': 0,
+                         'total_wait_ms': 0.0,
+                         'max_wait_ms': 0.0}
+
+    def _ensure_worker(self):
+        """
+        Start background worker (lazily, once per process : forked workers don't inherit threads)
+        """
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                if self._worker_pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def predict(self, inputs):
+        """
+        Predict padded sequences through the next coalesced batch (blocks until results are available)
+
+        :param inputs: padded sequences (numpy array)
+
+        :return: model predictions of inputs (numpy array)
+        """
+        if len(inputs) == 0:
+            return self.model.predict(inputs)
+        self._ensure_worker()
+        request = _PredictionRequest(inputs)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self):
+        """
+        Wait for a first request, then collect queued requests until batch is full or waiting time is over
+
+        :return: list of prediction requests
+        """
+        first_request = self._queue.get()
+        batch = [first_request]
+        n_rows = len(first_request.inputs)
+        deadline = first_request.enqueue_time + self.max_wait
+        while n_rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            n_rows += len(request.inputs)
+        return batch
+
+    def _run(self):
+        """
+        Background worker loop (one batched prediction per collected batch)
+        """
+        while True:
+            batch = self._collect_batch()
+            queue_depth = self._queue.qsize()
+            start_time = time.perf_counter()
+            try:
+                predictions = self.model.predict(np.concatenate([request.inputs for request in batch]))
+                # Send each caller its own slice of predictions
+                offset = 0
+                for request in batch:
+                    request.result = predictions[offset:offset + len(request.inputs)]
+                    offset += len(request.inputs)
+            except Exception as error:
+                for request in batch:
+                    request.error = error
+            self._update_metrics(batch, queue_depth, start_time)
+            for request in batch:
+                request.done.set()
+
+    def _update_metrics(self, batch, queue_depth, start_time):
+        """
+        Update batching metrics
+
+        :param batch: list of prediction requests
+        :param queue_depth: number of requests still queued when batch was collected
+        :param start_time: batch prediction start time
+        """
+        wait_times_ms = [(start_time - request.enqueue_time) * 1000 for request in batch]
+        n_rows = sum(len(request.inputs) for request in batch)
+        with self._metrics_lock:
+            self._metrics['batches'] += 1
+            self._metrics['requests'] += len(batch)
+            self._metrics['rows'] += n_rows
+            self._metrics['max_batch_size'] = max(self._metrics['max_batch_size'], n_rows)
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], queue_depth)
+            self._metrics['total_wait_ms'] += sum(wait_times_ms)
+            self._metrics['max_wait_ms'] = max(self._metrics['max_wait_ms'], max(wait_times_ms))
+
+    def get_metrics(self):
+        """
+        Get batching metrics (queue depth, batch size & wait time)
+
+        :return: metrics (dict)
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        total_wait_ms = metrics.pop('total_wait_ms')
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['mean_batch_size'] = round(metrics['rows'] / metrics['batches'], 3) if metrics['batches'] else 0.0
+        metrics['mean_requests_per_batch'] = round(metrics['requests'] / metrics['batches'], 3) \
+            if metrics['batches'] else 0.0
+        metrics['mean_wait_ms'] = round(total_wait_ms / metrics['requests'], 3) if metrics['requests'] else 0.0
+        metrics['max_wait_ms'] = round(metrics['max_wait_ms'], 3)
+        return metrics
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def get_model_version(model_path, chunk_size=1 << 20):
+    """
+    Model version computed from model file content (cached predictions expire when model file changes)
+
+    :param model_path: model file path (e.g. .h5 file)
+    :param chunk_size: file read chunk size (in bytes)
+
+    :return: model version (md5 hex digest)
+    """
+    file_hash = hashlib.md5()
+    with open(model_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+########################################################################################################################
+#                                              CACHE BACKENDS                                                          #
+########################################################################################################################
+
+
+class LRUCacheBackend:
+
+    def __init__(self, max_size=100000):
+        """
+        In-process LRU cache backend (one cache per worker)
+
+        :param max_size: maximum number of cached predictions
+        """
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedMemoryCacheBackend:
+
+    def __init__(self, path='/dev/shm/stackoverflow_tagger_cache.sqlite', max_size=100000, model_version=None,
+                 eviction_interval=100):
+        """
+        Cache backend shared by all workers of a host (SQLite database stored in shared memory filesystem)
+
+        :param path: SQLite database path (/dev/shm is a memory-backed filesystem on linux)
+        :param max_size: maximum number of cached predictions (least recently used are evicted)
+        :param model_version: current model version (predictions of other model versions are deleted)
+        :param eviction_interval: number of inserts between two evictions
+        """
+        self.path = path
+        self.max_size = max_size
+        self.eviction_interval = eviction_interval
+        self._local = threading.local()
+        self._inserts = 0
+        connection = self._get_connection()
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS predictions '
+                               '(key TEXT PRIMARY KEY, model_version TEXT, value TEXT, last_access REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS predictions_last_access ON predictions (last_access)')
+            if model_version is not None:
+                connection.execute('DELETE FROM predictions WHERE model_version != ?', (model_version,))
+        self.model_version = model_version
+
+    def _get_connection(self):
+        """
+        Get a SQLite connection for current thread & process (connections are not shared after fork)
+
+        :return: SQLite connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        connection = self._get_connection()
+        row = connection.execute('SELECT value FROM predictions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute('UPDATE predictions SET last_access = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        connection = self._get_connection()
+        connection.execute('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)',
+                           (key, self.model_version, json.dumps(value), time.time()))
+        self._inserts += 1
+        if self._inserts % self.eviction_interval == 0:
+            connection.execute('DELETE FROM predictions WHERE key IN (SELECT key FROM predictions '
+                               'ORDER BY last_access DESC LIMIT -1 OFFSET ?)', (self.max_size,))
+
+    def __len__(self):
+        return self._get_connection().execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+
+########################################################################################################################
+#                                             PREDICTION CACHE                                                         #
+########################################################################################################################
+
+
+class PredictionCache:
+
+    def __init__(self, backend=None, model_version=''):
+        """
+        Cache of predicted tags keyed by a hash of the padded GRU input of a question & the model version
+
+        :param backend: cache backend (LRUCacheBackend or SharedMemoryCacheBackend, default is LRUCacheBackend)
+        :param model_version: model version (see get_model_version)
+        """
+        self.backend = backend if backend is not None else LRUCacheBackend()
+        self.model_version = model_version
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, padded_question):
+        """
+        Build cache key of a question
+
+        :param padded_question: padded sequences of a question (numpy array)
+
+        :return: cache key (str)
+        """
+        key_hash = hashlib.sha1(self.model_version.encode('utf-8'))
+        key_hash.update(f'{padded_question.dtype.str}{padded_question.shape}'.encode('utf-8'))
+        key_hash.update(padded_question.tobytes())
+        return key_hash.hexdigest()
+
+    def get(self, key):
+        """
+        Get cached predicted tags
+
+        :param key: cache key
+
+        :return: predicted tags (or None if missing)
+        """
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Cache predicted tags
+
+        :param key: cache key
+        :param value: predicted tags (list of strings)
+        """
+        self.backend.set(key, value)
+
+    def get_stats(self):
+        """
+        Get cache statistics (hit/miss counters of current worker)
+
+        :return: cache statistics (dict)
+        """
+        lookups = self.hits + self.misses
+        return {'backend': type(self.backend).__name__,
+                'model_version': self.model_version,
+                'size': len(self.backend),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups > 0 else 0.0,
+                'pid': os.getpid()}
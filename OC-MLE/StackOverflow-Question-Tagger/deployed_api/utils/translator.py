@@ -0,0 +1,235 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+########################################################################################################################
+#                                          LANGUAGE DETECTION                                                          #
+########################################################################################################################
+
+# Most frequent function words by language (a question is considered english unless another language wins)
+LANGUAGE_FUNCTION_WORDS = {
+    'en': frozenset(['the', 'and', 'is', 'are', 'was', 'to', 'of', 'in', 'it', 'that', 'this', 'with', 'for', 'on',
+                     'not', 'be', 'have', 'has', 'but', 'what', 'how', 'why', 'when', 'which', 'can', 'do', 'does',
+                     'my', 'i', 'you', 'we', 'if', 'from', 'there', 'an', 'or', 'by', 'at', 'as', 'so', 'get', 'use',
+                     'using', 'want', 'would', 'should', 'could', 'will', 'me', 'some', 'any', 'all', 'no', 'way']),
+    'fr': frozenset(['le', 'la', 'les', 'des', 'est', 'et', 'un', 'une', 'du', 'dans', 'que', 'qui', 'pour', 'pas',
+                     'sur', 'au', 'avec', 'ce', 'cette', 'je', 'mon', 'ma', 'mes', 'comment', 'pourquoi', 'fichier',
+                     'avoir', 'faire', 'sont', 'ne', 'il', 'elle', 'nous', 'vous', 'mais', 'ou', 'donc', 'quand']),
+    'es': frozenset(['el', 'la', 'los', 'las', 'es', 'y', 'un', 'una', 'del', 'en', 'que', 'por', 'para', 'con',
+                     'no', 'como', 'pero', 'mi', 'yo', 'esta', 'este', 'cuando', 'porque', 'archivo', 'hacer',
+                     'tengo', 'puedo', 'sin', 'sobre', 'se', 'lo', 'al', 'son', 'muy', 'donde', 'cual']),
+    'de': frozenset(['der', 'die', 'das', 'und', 'ist', 'nicht', 'ein', 'eine', 'mit', 'ich', 'wie', 'auf', 'zu',
+                     'den', 'dem', 'von', 'für', 'es', 'sich', 'auch', 'wird', 'kann', 'habe', 'warum', 'wenn',
+                     'oder', 'aber', 'mein', 'meine', 'datei', 'werden', 'noch', 'nur', 'bei', 'nach', 'was']),
+    'pt': frozenset(['o', 'os', 'as', 'um', 'uma', 'do', 'da', 'dos', 'das', 'em', 'que', 'para', 'com', 'não',
+                     'como', 'mas', 'eu', 'meu', 'minha', 'está', 'esse', 'essa', 'quando', 'porque', 'arquivo',
+                     'fazer', 'tenho', 'posso', 'sem', 'sobre', 'se', 'ao', 'são', 'muito', 'onde', 'qual'])
+}
+
+
+def detect_language(text, default_language='en', min_ascii_ratio=0.9, function_words=LANGUAGE_FUNCTION_WORDS):
+    """
+    Fast local language detection based on function words & non-ASCII letters ratio
+    (no network call, mostly used to skip translation of english questions)
+
+    :param text: a text (str)
+    :param default_language: language returned when no other language is detected
+    :param min_ascii_ratio: minimal ratio of ASCII letters for a text to be detected as default language
+    :param function_words: function words by language code (dict)
+
+    :return: detected language code (or 'unknown' for mostly non-ASCII texts without known function words)
+    """
+    words = [word for word in text.lower().split() if word.isalpha()]
+    if len(words) == 0:
+        return default_language
+    # Score each language by its function words occurrences
+    scores = {language: sum(word in language_words for word in words)
+              for language, language_words in function_words.items()}
+    best_language = max(scores, key=scores.get)
+    if scores[best_language] > 0 and scores[best_language] > scores.get(default_language, 0):
+        return best_language
+    # Texts written in non-latin alphabets (without known function words)
+    letters = [char for word in words for char in word]
+    ascii_ratio = sum(char.isascii() for char in letters) / len(letters)
+    return default_language if ascii_ratio >= min_ascii_ratio else 'unknown'
+
+
+########################################################################################################################
+#                                          TRANSLATION CACHE                                                           #
+########################################################################################################################
+
+
+class TranslationCache:
+
+    def __init__(self, max_size=10000, ttl=86400):
+        """
+        Bounded LRU cache of translated texts with time-to-live expiration
+
+        :param max_size: maximum number of cached translations
+        :param ttl: time-to-live of cached translations (in seconds, None means no expiration)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Get a cached translation
+
+        :param key: cache key
+
+        :return: cached translation (or None if missing or expired)
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expiration_time = item
+                if expiration_time is None or expiration_time > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """
+        Cache a translation (least recently used translations are evicted when cache is full)
+
+        :param key: cache key
+        :param value: translation
+        """
+        expiration_time = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expiration_time)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+########################################################################################################################
+#                                          TRANSLATION BACKENDS                                                        #
+########################################################################################################################
+
+
+class PassThroughBackend:
+    """
+    Translation backend which returns texts unchanged (offline fallback)
+    """
+
+    def translate(self, text, dest='en'):
+        return text
+
+
+class GoogleTranslateBackend:
+
+    def __init__(self, timeout=2.0, max_workers=4):
+        """
+        Google Translate API backend (googletrans) with strict timeout
+
+        :param timeout: maximum translation time (in seconds)
+        :param max_workers: maximum number of concurrent translation calls
+        """
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='translator')
+
+    def _translate(self, text, dest):
+        # googletrans is only imported when a translation is really needed
+        from googletrans import Translator
+        return Translator(timeout=self.timeout).translate(text, dest=dest).text
+
+    def translate(self, text, dest='en'):
+        """
+        Translate a text
+
+        :param text: a text (str)
+        :param dest: destination language code
+
+        :return: a text translated (raise TimeoutError if translation takes more than timeout seconds)
+        """
+        future = self._executor.submit(self._translate, text, dest)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f'translation took more than {self.timeout}s')
+
+
+########################################################################################################################
+#                                             TRANSLATOR                                                               #
+########################################################################################################################
+
+
+class TextTranslator:
+
+    def __init__(self, backend=None, detector=detect_language, cache=None, max_retries=1):
+        """
+        Translate texts to a destination language : local language detection first (texts already written in
+        destination language are never translated), then cached translations, then translation backend with
+        pass-through fallback (original text is returned when backend fails)
+
+        :param backend: translation backend (with a translate(text, dest) method, default is Google Translate)
+        :param detector: language detection function (text -> language code)
+        :param cache: translation cache (default is a TranslationCache with default parameters)
+        :param max_retries: number of backend retries on failure
+        """
+        self.backend = backend if backend is not None else GoogleTranslateBackend()
+        self.detector = detector
+        self.cache = cache if cache is not None else TranslationCache()
+        self.max_retries = max_retries
+        self.fallback = PassThroughBackend()
+        self.stats = {'skipped': 0, 'cached': 0, 'translated': 0, 'failed': 0}
+
+    def _backend_translate(self, text, language):
+        """
+        Translate a text with backend (bounded retries)
+
+        :param text: a text (str)
+        :param language: destination language code
+
+        :return: a text translated (or None if backend failed)
+        """
+        for _ in range(self.max_retries + 1):
+            try:
+                return self.backend.translate(text, dest=language)
+            except Exception:
+                continue
+        return None
+
+    def translate(self, text, language='en'):
+        """
+        Translate a text to another language (only words are translated, other parts are appended)
+
+        :param text: a text (sentence(s) or word(s)) (str)
+        :param language: destination language code
+
+        :return: a text translated
+        """
+        filtered_text = ' '.join(filter(str.isalpha, text.split()))
+        # Skip texts without words & texts already written in destination language
+        if len(filtered_text) == 0 or self.detector(filtered_text) == language:
+            self.stats['skipped'] += 1
+            return text
+        translated_text = self.cache.get((filtered_text, language))
+        if translated_text is not None:
+            self.stats['cached'] += 1
+        else:
+            translated_text = self._backend_translate(filtered_text, language)
+            if translated_text is not None:
+                self.cache.set((filtered_text, language), translated_text)
+                self.stats['translated'] += 1
+            else:
+                # Pass-through fallback (failed translations are not cached)
+                self.stats['failed'] += 1
+                return self.fallback.translate(text, dest=language)
+        if filtered_text == text:
+            return translated_text
+        return translated_text + ' ' + ''.join([w for w in text if w not in filtered_text])
@@ -0,0 +1,230 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from src.nlp.text_preprocessor import pd, tokenize, text_normalizer, get_domain_based_tokens, lemmatize_corpus, \
+                                      pos_tag, pos_tag_corpus
+
+
+########################################################################################################################
+#                                           NORMALIZER PARAMETERS HASHING                                              #
+########################################################################################################################
+
+
+def _to_hashable(value):
+    """
+    Convert a normalizer parameter to a stable JSON serializable value (same value across python sessions)
+
+    :param value: a normalizer parameter
+
+    :return: JSON serializable value
+    """
+    if isinstance(value, dict):
+        return {str(key): _to_hashable(item) for key, item in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted(str(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return [_to_hashable(item) for item in value]
+    if hasattr(value, 'meta') and hasattr(value, 'pipe_names'):
+        # spaCy loaded instance
+        return f"spacy:{value.meta.get('lang')}_{value.meta.get('name')}-{value.meta.get('version')}:{value.pipe_names}"
+    if callable(value):
+        return f'{getattr(value, "__module__", "")}.{getattr(value, "__qualname__", repr(value))}'
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def get_normalizer_params_hash(normalizer_params):
+    """
+    Hash of text normalizer parameters (used as cache key)
+
+    :param normalizer_params: text normalizer parameters (dict, e.g. TEXT_NORMALIZER_PARAMS)
+
+    :return: parameters hash (str)
+    """
+    return hashlib.sha1(json.dumps(_to_hashable(normalizer_params), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+########################################################################################################################
+#                                             SHARD NORMALIZATION                                                      #
+########################################################################################################################
+
+# Normalizer steps (& their parameters) run at corpus level with spaCy (after shard normalization)
+SPACY_STEPS = ['lemmatizer', 'pos_tagger', 'lemmatizer_params', 'pos_tagger_params']
+
+
+def normalize_shard(texts, normalizer_params):
+    """
+    Normalize a shard of texts with text_normalizer, spaCy steps excepted (run in worker processes)
+
+    Domain based tokens are kept apart so that following corpus level steps only concern non domain tokens, like in
+    text_normalizer.
+
+    :param texts: shard texts (list of strings or lists of tokens)
+    :param normalizer_params: text normalizer parameters (dict, without spaCy steps)
+
+    :return: normalized tokens & domain based tokens of each text (list of tuples)
+    """
+    normalizer_params = dict(normalizer_params)
+    domain_words = normalizer_params.pop('domain_words', ())
+    results = []
+    for text in texts:
+        if type(text) is str:
+            tokens = tokenize(text, lowerize=normalizer_params.get('lowerizer', False))
+        else:
+            tokens = list(text)
+        domain_based_tokens = []
+        if len(domain_words) > 0:
+            domain_based_tokens, tokens = get_domain_based_tokens(tokens, domain_words)
+        if normalizer_params.get('no_duplicates', False) and \
+                normalizer_params.get('duplicates_type', 'token') in ['domain', 'all']:
+            domain_based_tokens = list(set(domain_based_tokens))
+        results.append((text_normalizer(tokens, **normalizer_params), domain_based_tokens))
+    return results
+
+
+def pipe_unique_tokens(tokens_lists, corpus_function, step_params, batch_size=1000, n_process=1):
+    """
+    Apply a spaCy step to each token of a corpus (lemmatize & pos_tag process each token of a list of tokens as its
+    own document, so each distinct token is processed once by a single nlp.pipe call)
+
+    :param tokens_lists: list of lists of tokens
+    :param corpus_function: corpus step function (lemmatize_corpus or pos_tag_corpus)
+    :param step_params: step parameters (dict, e.g. lemmatizer_params)
+    :param batch_size: spaCy pipe batch size
+    :param n_process: number of spaCy processes
+
+    :return: processed tokens of each list of tokens (list of lists)
+    """
+    unique_tokens = list(dict.fromkeys(token for tokens in tokens_lists for token in tokens))
+    outputs = corpus_function(([token] for token in unique_tokens),
+                              batch_size=batch_size,
+                              n_process=n_process,
+                              **(step_params or {}))
+    outputs_by_token = dict(zip(unique_tokens, outputs))
+    return [[output for token in tokens for output in outputs_by_token[token]] for tokens in tokens_lists]
+
+
+########################################################################################################################
+#                                             CORPUS PREPROCESSOR                                                      #
+########################################################################################################################
+
+
+class CorpusPreprocessor:
+
+    def __init__(self, normalizer_params, shard_size=10000, n_workers=None, spacy_batch_size=1000, spacy_n_process=1,
+                 cache_folder='data/cache/text_normalizer'):
+        """
+        Corpus level text normalization : the corpus is split in shards normalized in a process pool, spaCy steps
+        (lemmatizer, POS tagger) run with one nlp.pipe call over distinct tokens of all normalized shards, shard
+        outputs are cached on disk (a second run with same parameters & texts only loads cached shards)
+
+        Outputs are the same as text_normalizer applied row by row (row order is kept).
+
+        :param normalizer_params: text normalizer parameters (dict, e.g. TEXT_NORMALIZER_PARAMS)
+        :param shard_size: number of texts by shard
+        :param n_workers: number of normalization processes (default is number of CPUs)
+        :param spacy_batch_size: spaCy pipe batch size
+        :param spacy_n_process: number of spaCy pipe processes
+        :param cache_folder: shard outputs cache folder (None disables cache)
+        """
+        self.normalizer_params = normalizer_params
+        self.shard_size = shard_size
+        self.n_workers = n_workers
+        self.spacy_batch_size = spacy_batch_size
+        self.spacy_n_process = spacy_n_process
+        self.cache_folder = cache_folder
+        self.params_hash = get_normalizer_params_hash(normalizer_params)
+        self.cache_stats = {'hits': 0, 'misses': 0}
+
+    def _get_shard_path(self, shard_texts):
+        """
+        Cache path of a shard (keyed by normalizer parameters hash & shard content hash)
+
+        :param shard_texts: shard texts (list)
+
+        :return: shard cache path (str, None if cache is disabled)
+        """
+        if self.cache_folder is None:
+            return None
+        shard_hash = hashlib.sha1(json.dumps(shard_texts, default=str).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_folder, self.params_hash, f'{shard_hash}.pkl')
+
+    def _normalize_shards(self, shards):
+        """
+        Normalize shards in a process pool (cached shards are loaded from disk)
+
+        :param shards: list of shards (lists of texts)
+
+        :return: normalized tokens of all texts (list of lists of tokens, in corpus order)
+        """
+        shard_paths = [self._get_shard_path(shard) for shard in shards]
+        shard_outputs = [None] * len(shards)
+        for i, shard_path in enumerate(shard_paths):
+            if shard_path is not None and os.path.exists(shard_path):
+                shard_outputs[i] = pd.read_pickle(shard_path)
+                self.cache_stats['hits'] += 1
+        missing_shards = [i for i, shard_output in enumerate(shard_outputs) if shard_output is None]
+        self.cache_stats['misses'] += len(missing_shards)
+        if len(missing_shards) > 0:
+            normalizer_params = {param: value for param, value in self.normalizer_params.items()
+                                 if param not in SPACY_STEPS}
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                normalized_shards = list(executor.map(normalize_shard,
+                                                      [shards[i] for i in missing_shards],
+                                                      [normalizer_params] * len(missing_shards)))
+            # spaCy steps over all normalized shards at once (one nlp.pipe call by step)
+            shard_lengths = [len(shard_output) for shard_output in normalized_shards]
+            normalized_texts = self._apply_spacy_steps([output for shard in normalized_shards for output in shard])
+            start = 0
+            for i, shard_length in zip(missing_shards, shard_lengths):
+                shard_outputs[i] = normalized_texts[start:start + shard_length]
+                start += shard_length
+                if shard_paths[i] is not None:
+                    os.makedirs(os.path.dirname(shard_paths[i]), exist_ok=True)
+                    pd.to_pickle(shard_outputs[i], shard_paths[i] + '.tmp')
+                    os.replace(shard_paths[i] + '.tmp', shard_paths[i])
+        return [tokens for shard_output in shard_outputs for tokens in shard_output]
+
+    def _apply_spacy_steps(self, normalized_texts):
+        """
+        Apply corpus level steps (lemmatizer & POS tagger) & merge domain based tokens (like text_normalizer)
+
+        :param normalized_texts: normalized tokens & domain based tokens of each text (list of tuples)
+
+        :return: normalized tokens of each text (list of lists of tokens)
+        """
+        tokens_lists = [tokens for tokens, _ in normalized_texts]
+        if self.normalizer_params.get('lemmatizer', False):
+            tokens_lists = pipe_unique_tokens(tokens_lists,
+                                              lemmatize_corpus,
+                                              self.normalizer_params.get('lemmatizer_params'),
+                                              batch_size=self.spacy_batch_size,
+                                              n_process=self.spacy_n_process)
+        if self.normalizer_params.get('pos_tagger', False):
+            pos_tagger_params = self.normalizer_params.get('pos_tagger_params') or {}
+            if pos_tagger_params.get('module_type', 'spacy') == 'spacy':
+                tokens_lists = pipe_unique_tokens(tokens_lists,
+                                                  pos_tag_corpus,
+                                                  pos_tagger_params,
+                                                  batch_size=self.spacy_batch_size,
+                                                  n_process=self.spacy_n_process)
+            else:
+                # NLTK POS tagger depends on tokens context (list of tokens tagged at once)
+                tokens_lists = [pos_tag(tokens, **pos_tagger_params) for tokens in tokens_lists]
+        return [tokens + domain_based_tokens
+                for tokens, (_, domain_based_tokens) in zip(tokens_lists, normalized_texts)]
+
+    def transform(self, texts):
+        """
+        Normalize a corpus
+
+        :param texts: corpus texts (pandas series or list of strings / lists of tokens, e.g. df['Body'])
+
+        :return: normalized tokens of each text (pandas series, same index as texts if texts is a series)
+        """
+        index = texts.index if isinstance(texts, pd.Series) else None
+        texts = list(texts)
+        shards = [texts[start:start + self.shard_size] for start in range(0, len(texts), self.shard_size)]
+        return pd.Series(self._normalize_shards(shards), index=index, dtype='object')
@@ -1,6 +1,78 @@
+import time
+import resource
+import tensorflow as tf
 from tensorflow import keras
 import keras.backend as K
-from src.nlp.text_preprocessor import np, plt, gensim
+from src.nlp.text_preprocessor import np, pd, plt, gensim
+
+
+########################################################################################################################
+#                                               EMBEDDING MATRIX                                                       #
+########################################################################################################################
+
+
+def load_word_vectors(path, mmap='r'):
+    """
+    Load pre-trained word vectors saved by gensim (Word2Vec model or KeyedVectors), vectors are memory mapped so that
+    only looked up rows are read from disk (vectors must be saved in a separate .npy file : arrays above gensim
+    sep_limit or saved with sep_limit=0)
+
+    :param path: gensim model or KeyedVectors path (saved with model.save or model.wv.save, e.g. wv.save(path,
+    sep_limit=0))
+    :param mmap: numpy memory map mode (None loads vectors in memory)
+
+    :return: gensim KeyedVectors
+    """
+    model = gensim.utils.SaveLoad.load(path, mmap=mmap)
+    return getattr(model, 'wv', model)
+
+
+def get_index_to_key(keyed_vectors):
+    """
+    Words of KeyedVectors in vectors rows order (gensim 4 index_to_key, gensim 3 index2word)
+
+    :param keyed_vectors: gensim KeyedVectors
+
+    :return: list of words
+    """
+    if hasattr(keyed_vectors, 'index_to_key'):
+        return keyed_vectors.index_to_key
+    return keyed_vectors.index2word
+
+
+def build_embedding_matrix(word_index, keyed_vectors, n_rows=None, dtype='float32', chunk_size=100000):
+    """
+    Build the embedding matrix of a tokenizer vocabulary from pre-trained word vectors : all words are mapped to
+    KeyedVectors rows at once (hash join) & vectors are gathered by chunks of sorted rows (memory mapped vectors are
+    only read for vocabulary words, see load_word_vectors)
+
+    :param word_index: tokenizer word index (dict of word & index)
+    :param keyed_vectors: gensim KeyedVectors (gensim 3 or 4, e.g. Word2Vec model wv)
+    :param n_rows: number of matrix rows (None : largest word index + 1)
+    :param dtype: embedding matrix type (e.g. 'float16' halves embedding memory)
+    :param chunk_size: number of vectors gathered at once (bounds temporary memory)
+
+    :return: embedding matrix (numpy array, row i is the vector of word index i, zeros for words without vector)
+    """
+    words = list(word_index.keys())
+    word_indexes = np.fromiter(word_index.values(), dtype=np.int64, count=len(words))
+    if n_rows is None:
+        n_rows = int(word_indexes.max()) + 1 if len(words) > 0 else 1
+    embedding_matrix = np.zeros((n_rows, keyed_vectors.vector_size), dtype=dtype)
+    vector_rows = pd.Index(get_index_to_key(keyed_vectors)).get_indexer(words)
+    found = vector_rows >= 0
+    # Sorted vectors rows : sequential reads of memory mapped vectors
+    order = np.argsort(vector_rows[found], kind='stable')
+    vector_rows, word_indexes = vector_rows[found][order], word_indexes[found][order]
+    for start in range(0, len(vector_rows), chunk_size):
+        embedding_matrix[word_indexes[start:start + chunk_size]] = \
+            keyed_vectors.vectors[vector_rows[start:start + chunk_size]]
+    return embedding_matrix
+
+
+########################################################################################################################
+#                                                    MODELS                                                            #
+########################################################################################################################
 
 
 class DNN:
@@ -12,35 +84,44 @@ class DNN:
         self.embedding_model = embedding_model
         # Get embedding model parameters by embedding type (To do: add more models)
         if self.embedding_model is not None:
-            if isinstance(self.embedding_model, gensim.models.word2vec.Word2Vec):
-                # Trained word vectors
-                self.trained_word_vectors = self.embedding_model.wv
+            if isinstance(self.embedding_model, (gensim.models.word2vec.Word2Vec, gensim.models.KeyedVectors)):
+                # Trained word vectors (Word2Vec model or KeyedVectors, e.g. memory mapped by load_word_vectors)
+                self.trained_word_vectors = getattr(self.embedding_model, 'wv', self.embedding_model)
                 # Word2Vec vocabulary size
-                self.vocab_size = len(self.trained_word_vectors.vocab.keys())
+                self.vocab_size = len(get_index_to_key(self.trained_word_vectors))
                 # The size of the Word2Vec dense vector
-                self.embedding_dim = self.embedding_model.vector_size
+                self.embedding_dim = self.trained_word_vectors.vector_size
                 # Max number of words in each complaint.
-                self.max_sequence_length = self.embedding_model.vector_size
+                self.max_sequence_length = self.trained_word_vectors.vector_size
         # Keras main model
         self.model = keras.models.Sequential()
         self.print_summary = print_summary
         self.history = None
+        self.training_monitor = None
+        self.training_report = None
 
-    def add_embedding_layer(self, **kwargs):
+    def add_embedding_layer(self, variable_length=False, embedding_dtype='float32', **kwargs):
         """
         https://blog.keras.io/using-pre-trained-word-embeddings-in-a-keras-model.html
+
+        :param variable_length: no fixed input length & padding zeros are masked (mask_zero), so that batches only run
+        to their longest sequence (e.g. load_sequence_dataset bucket_boundaries) with unchanged predictions
+        :param embedding_dtype: embedding matrix & layer type (e.g. 'float16')
+        :param kwargs: other keras Embedding layer parameters
         """
-        # Embedding matrix for the embedding layer
-        embedding_matrix = np.zeros((self.vocab_size + 1, self.embedding_dim))
-        # Fill embedding matrix with pre-trained Word2Vec
-        for word, i in self.tokenizer.word_index.items():
-            if word in self.trained_word_vectors:
-                embedding_matrix[i] = self.trained_word_vectors[word]
+        if variable_length:
+            kwargs['mask_zero'] = True
+        kwargs.setdefault('dtype', embedding_dtype)
+        # Embedding matrix filled with pre-trained Word2Vec (rows of all tokenizer indexes, even above vocabulary size)
+        word_index = self.tokenizer.word_index
+        input_dim = max(self.vocab_size, max(word_index.values(), default=0)) + 1
+        embedding_matrix = build_embedding_matrix(word_index, self.trained_word_vectors, n_rows=input_dim,
+                                                  dtype=embedding_dtype)
         # Build embedding layer
-        self.model.add(keras.layers.Embedding(input_dim=self.vocab_size + 1,
+        self.model.add(keras.layers.Embedding(input_dim=input_dim,
                                               output_dim=self.embedding_dim,
                                               weights=[embedding_matrix],
-                                              input_length=self.max_sequence_length,
+                                              input_length=None if variable_length else self.max_sequence_length,
                                               trainable=False,
                                               **kwargs))
 
@@ -64,8 +145,28 @@ class DNN:
             self.model.summary()
         self.model.compile(**kwargs)
 
-    def fit(self, x_train, y_train, **kwargs):
+    def fit(self, x_train, y_train=None, monitor=False, monitor_params=None, **kwargs):
+        """
+        Train model on in memory arrays or on a streamed dataset
+
+        :param x_train: padded sequences (numpy array) or a tf.data.Dataset of (sequences, labels) batches (e.g.
+        load_sequence_dataset), y_train is then None
+        :param y_train: label indicator matrix (None for datasets)
+        :param monitor: report training throughput & peak memory by epoch (see TrainingMonitor, self.training_report)
+        :param monitor_params: TrainingMonitor parameters (n_examples & batch_size of datasets, e.g.
+        {'n_examples': get_shards_meta(folder)['n_examples'], 'batch_size': 256})
+        :param kwargs: keras model.fit parameters
+        """
+        if monitor:
+            monitor_params = dict(monitor_params or {})
+            if not isinstance(x_train, tf.data.Dataset):
+                monitor_params.setdefault('n_examples', len(x_train))
+                monitor_params.setdefault('batch_size', kwargs.get('batch_size') or 32)
+            self.training_monitor = TrainingMonitor(**monitor_params)
+            kwargs['callbacks'] = list(kwargs.get('callbacks') or []) + [self.training_monitor]
         self.history = self.model.fit(x_train, y_train, **kwargs)
+        if monitor:
+            self.training_report = self.training_monitor.report
 
     def evaluate(self, x_test, y_test, **kwargs):
         results = self.model.evaluate(x_test, y_test, **kwargs)
@@ -84,6 +185,79 @@ class DNN:
         plt.show()
 
 
+def get_memory_usage():
+    """
+    Current & peak resident memory of the process (current memory is read from /proc on Linux)
+
+    :return: current & peak resident memory in MB (current is None if unavailable)
+    """
+    # ru_maxrss is in KB on Linux
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open('/proc/self/statm') as file:
+            current_memory = int(file.read().split()[1]) * resource.getpagesize() / 1024 ** 2
+    except OSError:
+        current_memory = None
+    return current_memory, peak_memory
+
+
+class TrainingMonitor(keras.callbacks.Callback):
+
+    def __init__(self, n_examples=None, batch_size=None, memory_sampling=10, verbose=True):
+        """
+        Keras callback reporting training throughput & peak memory by epoch
+
+        :param n_examples: number of training examples by epoch (None : throughput in batches only)
+        :param batch_size: number of examples by batch (counts examples of epochs limited by steps_per_epoch)
+        :param memory_sampling: resident memory is sampled every memory_sampling batches
+        :param verbose: print epoch reports
+        """
+        super(TrainingMonitor, self).__init__()
+        self.n_examples = n_examples
+        self.batch_size = batch_size
+        self.memory_sampling = memory_sampling
+        self.verbose = verbose
+        self.report = []
+        self.epoch_start_time = None
+        self.n_batches = 0
+        self.peak_memory = 0
+
+    def _sample_memory(self):
+        current_memory, peak_memory = get_memory_usage()
+        self.peak_memory = max(self.peak_memory, current_memory if current_memory is not None else peak_memory)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start_time = time.perf_counter()
+        self.n_batches = 0
+        self.peak_memory = 0
+        self._sample_memory()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.n_batches += 1
+        if self.n_batches % self.memory_sampling == 0:
+            self._sample_memory()
+
+    def on_epoch_end(self, epoch, logs=None):
+        run_time = time.perf_counter() - self.epoch_start_time
+        self._sample_memory()
+        if self.batch_size is not None:
+            n_examples = self.n_batches * self.batch_size
+            n_examples = min(n_examples, self.n_examples) if self.n_examples is not None else n_examples
+        else:
+            n_examples = self.n_examples
+        epoch_report = {'epoch': epoch + 1,
+                        'run_time_s': round(run_time, 3),
+                        'batches_per_s': round(self.n_batches / run_time, 2),
+                        'examples_per_s': round(n_examples / run_time, 1) if n_examples is not None else None,
+                        'peak_memory_mb': round(self.peak_memory, 1),
+                        'max_memory_mb': round(get_memory_usage()[1], 1)}
+        self.report.append(epoch_report)
+        if self.verbose:
+            print(f"Epoch {epoch_report['epoch']} : {epoch_report['run_time_s']}s, "
+                  f"{epoch_report['batches_per_s']} batches/s, {epoch_report['examples_per_s']} examples/s, "
+                  f"peak memory {epoch_report['peak_memory_mb']} MB (process max {epoch_report['max_memory_mb']} MB)")
+
+
 class Attention(keras.layers.Layer):
 
     def __init__(self, return_sequences=True):
@@ -0,0 +1,230 @@
+import os
+import json
+from src.nlp.dnn import keras
+from src.nlp.text_preprocessor import np, pd
+from src.nlp.text_classifier_evaluator import evaluate_text_classifier
+from config.main_config import TEXT_CLS_METRICS
+
+
+########################################################################################################################
+#                                               WEIGHTS QUANTIZATION                                                   #
+########################################################################################################################
+
+
+def quantize_weights(weights, dtype='int8', axis=0):
+    """
+    Post-training quantization of a weights matrix
+
+    :param weights: a weights matrix (numpy array)
+    :param dtype: quantized type, could be :
+
+           - 'int8': symmetric linear quantization with one float32 scale by slice (see axis)
+           - 'float16': half precision (no scale)
+
+    :param axis: axis reduced to compute scales (0 : one scale by column, e.g. kernels output units,
+    1 : one scale by row, e.g. embedding vectors)
+
+    :return: quantized weights (numpy array) & scales (numpy array, None for float16)
+    """
+    if dtype == 'float16':
+        return weights.astype(np.float16), None
+    elif dtype == 'int8':
+        scales = np.max(np.abs(weights), axis=axis, keepdims=True) / 127
+        scales[scales == 0] = 1
+        quantized_weights = np.clip(np.round(weights / scales), -127, 127).astype(np.int8)
+        return quantized_weights, scales.astype(np.float32)
+    raise Exception(f'{dtype} quantization not implemented')
+
+
+def dequantize_weights(quantized_weights, scales=None):
+    """
+    Dequantize a quantized weights matrix to float32
+
+    :param quantized_weights: quantized weights (numpy array)
+    :param scales: quantization scales (numpy array, None for float16 weights)
+
+    :return: dequantized weights (numpy array)
+    """
+    weights = quantized_weights.astype(np.float32)
+    return weights * scales if scales is not None else weights
+
+
+def get_emitted_embedding_rows(tokenizer):
+    """
+    Number of embedding rows a fitted keras tokenizer can emit (texts_to_sequences only emits indexes lower than
+    num_words, next rows are never looked up)
+
+    :param tokenizer: a fitted keras tokenizer
+
+    :return: number of embedding rows (max emitted index + 1)
+    """
+    max_index = max(tokenizer.word_index.values()) if len(tokenizer.word_index) > 0 else 0
+    if tokenizer.num_words is not None:
+        return min(max_index + 1, tokenizer.num_words)
+    return max_index + 1
+
+
+########################################################################################################################
+#                                                MODEL COMPRESSOR                                                      #
+########################################################################################################################
+
+
+class ModelCompressor:
+
+    def __init__(self, model, dtype='int8', quantized_layers=('Embedding', 'GRU'), tokenizer=None):
+        """
+        Compress a trained embedding + GRU + dense layers keras model : quantize weights of some layers & prune
+        embedding rows never emitted by the tokenizer
+
+        :param model: a trained keras sequential model (e.g. DNN.model)
+        :param dtype: quantized type ('int8' or 'float16', see quantize_weights)
+        :param quantized_layers: types of quantized layers (e.g. ('Embedding', 'GRU', 'Dense'))
+        :param tokenizer: fitted keras tokenizer used to prune embedding rows (None disables pruning)
+        """
+        self.model = model
+        self.dtype = dtype
+        self.quantized_layers = quantized_layers
+        self.tokenizer = tokenizer
+        self.layers_config = []
+        self.weights = {}
+        self.embedding_rows = None
+
+    def compress(self):
+        """
+        Compress model weights (dropout layers are removed, artifact format is read by deployed_api NumPy runtime)
+
+        :return: the compressor instance
+        """
+        self.layers_config, self.weights = [], {}
+        for layer in self.model.layers:
+            layer_type = type(layer).__name__
+            config = layer.get_config()
+            layer_weights = [weight.astype(np.float32) for weight in layer.get_weights()]
+            if layer_type == 'Dropout':
+                continue
+            elif layer_type == 'Embedding':
+                if self.tokenizer is not None:
+                    self.embedding_rows = get_emitted_embedding_rows(self.tokenizer)
+                    layer_weights[0] = layer_weights[0][:self.embedding_rows]
+                self.layers_config.append({'type': layer_type, 'mask_zero': bool(config.get('mask_zero', False))})
+            elif layer_type == 'GRU':
+                self.layers_config.append({'type': layer_type,
+                                           'units': config['units'],
+                                           'activation': config['activation'],
+                                           'recurrent_activation': config['recurrent_activation'],
+                                           'reset_after': bool(config.get('reset_after', False))})
+            elif layer_type == 'Dense':
+                self.layers_config.append({'type': layer_type, 'activation': config['activation']})
+            else:
+                raise Exception(f'{layer_type} layer compression not implemented')
+            layer_index = len(self.layers_config) - 1
+            for i, weight in enumerate(layer_weights):
+                if layer_type in self.quantized_layers and weight.ndim == 2:
+                    # One scale by embedding vector, one scale by output unit for kernels
+                    quantized_weight, scales = quantize_weights(weight,
+                                                                dtype=self.dtype,
+                                                                axis=1 if layer_type == 'Embedding' else 0)
+                    self.weights[f'{layer_index}_{i}'] = quantized_weight
+                    if scales is not None:
+                        self.weights[f'{layer_index}_{i}_scale'] = scales
+                else:
+                    self.weights[f'{layer_index}_{i}'] = weight
+        return self
+
+    def save(self, path):
+        """
+        Save compressed model as a NumPy artifact (.npz file, see deployed_api/src/gru_runtime.py)
+
+        :param path: artifact path
+        """
+        input_length = self.model.layers[0].get_config().get('input_length') or self.model.input_shape[1]
+        config = {'input_length': int(input_length), 'layers': self.layers_config}
+        np.savez(path, config=np.array(json.dumps(config)), **self.weights)
+
+    def get_dequantized_weights(self):
+        """
+        Get dequantized weights of each compressed layer
+
+        :return: list of layers weights (list of lists of float32 numpy arrays)
+        """
+        layers_weights = []
+        for layer_index in range(len(self.layers_config)):
+            layer_weights = []
+            i = 0
+            while f'{layer_index}_{i}' in self.weights:
+                layer_weights.append(dequantize_weights(self.weights[f'{layer_index}_{i}'],
+                                                        self.weights.get(f'{layer_index}_{i}_scale')))
+                i += 1
+            layers_weights.append(layer_weights)
+        return layers_weights
+
+    def get_dequantized_model(self):
+        """
+        Build a keras model with dequantized (& pruned) weights (to evaluate compression errors)
+
+        :return: a keras sequential model (without dropout layers)
+        """
+        layers = []
+        for layer in self.model.layers:
+            if type(layer).__name__ == 'Dropout':
+                continue
+            config = layer.get_config()
+            if type(layer).__name__ == 'Embedding' and self.embedding_rows is not None:
+                config['input_dim'] = self.embedding_rows
+            layers.append(type(layer).from_config(config))
+        dequantized_model = keras.models.Sequential(layers)
+        dequantized_model.build(self.model.input_shape)
+        for layer, layer_weights in zip(dequantized_model.layers, self.get_dequantized_weights()):
+            layer.set_weights(layer_weights)
+        return dequantized_model
+
+    def get_memory_usage(self):
+        """
+        Compare weights memory of original & compressed models
+
+        :return: memory usage (dict, in MB)
+        """
+        original_size = sum(weight.nbytes for weight in self.model.get_weights())
+        compressed_size = sum(weight.nbytes for weight in self.weights.values())
+        return {'original_mb': round(original_size / 1e6, 3),
+                'compressed_mb': round(compressed_size / 1e6, 3),
+                'compression_ratio': round(original_size / compressed_size, 2)}
+
+
+def evaluate_model_compression(model, x_test, y_test, dtypes=('float16', 'int8'), quantized_layers=('Embedding', 'GRU'),
+                               tokenizer=None, metrics_dict=TEXT_CLS_METRICS, save_folder=None):
+    """
+    Evaluation harness of model compression : metrics of each compressed model (see evaluate_text_classifier),
+    metrics deltas against original model & memory savings
+
+    :param model: a trained keras sequential model
+    :param x_test: padded test sequences (numpy array)
+    :param y_test: binarized test tags (numpy array)
+    :param dtypes: evaluated quantized types
+    :param quantized_layers: types of quantized layers
+    :param tokenizer: fitted keras tokenizer used to prune embedding rows (None disables pruning)
+    :param metrics_dict: metrics dictionary with metric labels as keys and metric functions as values
+    :param save_folder: folder where compressed models are saved (as {dtype}_model.npz files, None doesn't save)
+
+    :return: a dataframe with metrics, metrics deltas & memory usage of each model
+    """
+    original_results = evaluate_text_classifier(np.round(model.predict(x_test)), y_test, metrics_dict=metrics_dict)
+    original_results.index = ['original']
+    results = [original_results.assign(weights_mb=round(sum(w.nbytes for w in model.get_weights()) / 1e6, 3))]
+    for dtype in dtypes:
+        compressor = ModelCompressor(model, dtype=dtype, quantized_layers=quantized_layers, tokenizer=tokenizer)
+        compressor.compress()
+        y_pred = np.round(compressor.get_dequantized_model().predict(x_test))
+        dtype_results = evaluate_text_classifier(y_pred, y_test, metrics_dict=metrics_dict)
+        dtype_results.index = [dtype]
+        # Metrics deltas against original model (in points)
+        for metric_label in metrics_dict:
+            dtype_results[f'{metric_label} delta'] = round(dtype_results[metric_label] -
+                                                           original_results[metric_label].values[0], 2)
+        memory_usage = compressor.get_memory_usage()
+        dtype_results['weights_mb'] = memory_usage['compressed_mb']
+        dtype_results['compression_ratio'] = memory_usage['compression_ratio']
+        if save_folder is not None:
+            compressor.save(os.path.join(save_folder, f'{dtype}_model.npz'))
+        results.append(dtype_results)
+    return pd.concat(results)
@@ -0,0 +1,206 @@
+import os
+import json
+import numpy as np
+import tensorflow as tf
+
+# Sharded sequences dataset metadata filename
+SHARDS_META_FILENAME = 'meta.json'
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+
+########################################################################################################################
+#                                                 SHARDS WRITER                                                        #
+########################################################################################################################
+
+
+def get_label_indices(labels):
+    """
+    Label indices of each example of a labels chunk
+
+    :param labels: label indicator matrix (scipy sparse matrix or numpy array, e.g. MultiLabelBinarizer output) or list
+    of label indices lists
+
+    :return: generator of label indices (numpy arrays)
+    """
+    if hasattr(labels, 'tocsr'):
+        labels = labels.tocsr()
+        return (labels.indices[start:end] for start, end in zip(labels.indptr[:-1], labels.indptr[1:]))
+    elif isinstance(labels, np.ndarray) and labels.ndim == 2:
+        return (np.flatnonzero(row) for row in labels)
+    return (np.asarray(indices, dtype=np.int64) for indices in labels)
+
+
+def serialize_example(sequence, label_indices):
+    """
+    Serialize an example as a tf.train.Example (variable length sequence & sparse label indices)
+
+    :param sequence: words indexes (list or numpy array)
+    :param label_indices: label indices (list or numpy array)
+
+    :return: serialized example (bytes)
+    """
+    features = {'sequence': tf.train.Feature(int64_list=tf.train.Int64List(value=sequence)),
+                'labels': tf.train.Feature(int64_list=tf.train.Int64List(value=label_indices))}
+    return tf.train.Example(features=tf.train.Features(feature=features)).SerializeToString()
+
+
+def write_sequence_shards(chunks, folder, n_classes, shard_size=100000, strip_padding=True, compression='GZIP',
+                          prefix='shard'):
+    """
+    Write preprocessed examples as TFRecord shards (sequences are stored without padding & labels as sparse indices, so
+    shards are much smaller than padded & dense label matrices)
+
+    :param chunks: iterable of (sequences, labels) chunks, e.g. [(x_train, y_train)] or padded sequences & label
+    indicator matrices computed chunk by chunk (see get_label_indices for labels formats)
+    :param folder: shards folder
+    :param n_classes: number of labels (e.g. len(multilabel_binarizer.classes_))
+    :param shard_size: number of examples by shard
+    :param strip_padding: remove padding values (0) from sequences
+    :param compression: TFRecord compression type ('GZIP', 'ZLIB' or None)
+    :param prefix: shards filenames prefix
+
+    :return: shards metadata (dict)
+    """
+    os.makedirs(folder, exist_ok=True)
+    options = tf.io.TFRecordOptions(compression_type=compression or '')
+    shards, writer, max_length, n_tokens = [], None, 0, 0
+    for sequences, labels in chunks:
+        for sequence, label_indices in zip(sequences, get_label_indices(labels)):
+            if writer is None or shards[-1]['n_examples'] == shard_size:
+                if writer is not None:
+                    writer.close()
+                shards.append({'file': f'{prefix}-{len(shards):05d}.tfrecord', 'n_examples': 0})
+                writer = tf.io.TFRecordWriter(os.path.join(folder, shards[-1]['file']), options=options)
+            sequence = np.asarray(sequence, dtype=np.int64)
+            if strip_padding:
+                sequence = sequence[sequence != 0]
+            writer.write(serialize_example(sequence, label_indices))
+            shards[-1]['n_examples'] += 1
+            max_length = max(max_length, len(sequence))
+            n_tokens += len(sequence)
+    if writer is not None:
+        writer.close()
+    meta = {'n_examples': sum(shard['n_examples'] for shard in shards),
+            'n_classes': int(n_classes),
+            'max_length': max_length,
+            'n_tokens': n_tokens,
+            'compression': compression,
+            'shards': shards}
+    with open(os.path.join(folder, SHARDS_META_FILENAME), 'w') as file:
+        json.dump(meta, file)
+    return meta
+
+
+def get_shards_meta(folder):
+    """
+    Read shards metadata (see write_sequence_shards)
+
+    :param folder: shards folder
+
+    :return: shards metadata (dict)
+    """
+    with open(os.path.join(folder, SHARDS_META_FILENAME)) as file:
+        return json.load(file)
+
+
+########################################################################################################################
+#                                                STREAMED DATASET                                                      #
+########################################################################################################################
+
+
+def pad_sparse_sequences(sequences, maxlen=None, padding='pre', truncating='pre', value=0, trim_batch=False):
+    """
+    Pad a batch of variable length sequences (same output as keras pad_sequences)
+
+    :param sequences: batch of sequences (tf.SparseTensor of shape (batch_size, None))
+    :param maxlen: padded sequences length (None : longest sequence length of batch)
+    :param padding: 'pre' or 'post', pad before or after each sequence
+    :param truncating: 'pre' or 'post', remove values from sequences larger than maxlen at the beginning or at the end
+    :param value: padding value
+    :param trim_batch: pad batch to its longest sequence length if shorter than maxlen (variable length batches)
+
+    :return: padded sequences (int32 tensor of shape (batch_size, maxlen))
+    """
+    sequences = tf.RaggedTensor.from_sparse(sequences)
+    rows = sequences.value_rowids()
+    lengths = sequences.row_lengths()
+    if maxlen is None or trim_batch:
+        # At least one timestep (batches of empty sequences)
+        batch_maxlen = tf.maximum(tf.reduce_max(lengths), 1)
+        maxlen = batch_maxlen if maxlen is None else tf.minimum(batch_maxlen, maxlen)
+    maxlen = tf.cast(maxlen, tf.int64)
+    # Position of each index in its sequence, kept indexes are scattered at once in the padded matrix
+    positions = tf.range(tf.size(sequences.flat_values, out_type=tf.int64)) - tf.gather(sequences.row_starts(), rows)
+    kept_lengths = tf.minimum(lengths, maxlen)
+    first_positions = lengths - kept_lengths if truncating == 'pre' else tf.zeros_like(lengths)
+    first_positions = tf.gather(first_positions, rows)
+    kept = (positions >= first_positions) & (positions < first_positions + tf.gather(kept_lengths, rows))
+    rows, positions = tf.boolean_mask(rows, kept), tf.boolean_mask(positions - first_positions, kept)
+    columns = positions + (maxlen - tf.gather(kept_lengths, rows)) if padding == 'pre' else positions
+    indexes = tf.cast(tf.boolean_mask(sequences.flat_values, kept), tf.int32) - value
+    shape = tf.stack([tf.cast(sequences.nrows(), tf.int64), maxlen])
+    return tf.scatter_nd(tf.stack([rows, columns], axis=1), indexes, shape) + value
+
+
+def load_sequence_dataset(folder, batch_size=256, maxlen=None, padding='pre', truncating='pre',
+                          shuffle_buffer_size=10000, cycle_length=4, repeat=False, seed=None, label_dtype='float32',
+                          bucket_boundaries=None):
+    """
+    Stream shards as a tf.data dataset of (padded sequences, dense labels) batches : shards are interleaved, examples
+    are parsed by batch and dense label matrices are built on the fly from sparse label indices
+
+    With bucket_boundaries, examples are batched with examples of similar lengths and each batch is only padded to its
+    longest sequence (model embedding layer must mask zeros, see DNN.add_embedding_layer variable_length)
+
+    :param folder: shards folder (see write_sequence_shards)
+    :param batch_size: number of examples by batch
+    :param maxlen: padded sequences length (None : longest sequence length of shards)
+    :param padding: 'pre' or 'post', pad before or after each sequence
+    :param truncating: 'pre' or 'post', remove values from sequences larger than maxlen at the beginning or at the end
+    :param shuffle_buffer_size: examples shuffle buffer size (0 : no shuffling, shards are still interleaved)
+    :param cycle_length: number of shards read concurrently
+    :param repeat: repeat dataset indefinitely (model.fit steps_per_epoch is then required)
+    :param seed: shuffle random seed
+    :param label_dtype: dense labels type
+    :param bucket_boundaries: upper length boundaries of length buckets (e.g. (16, 32, 64, 128), None : every batch is
+    padded to maxlen)
+
+    :return: a tf.data.Dataset
+    """
+    if padding not in ['pre', 'post'] or truncating not in ['pre', 'post']:
+        raise Exception(f'{padding} padding or {truncating} truncating not implemented')
+    meta = get_shards_meta(folder)
+    maxlen = maxlen or meta['max_length']
+    files = [os.path.join(folder, shard['file']) for shard in meta['shards']]
+    features = {'sequence': tf.io.VarLenFeature(tf.int64), 'labels': tf.io.VarLenFeature(tf.int64)}
+
+    def parse_batch(serialized_examples):
+        examples = tf.io.parse_example(serialized_examples, features)
+        sequences = pad_sparse_sequences(examples['sequence'], maxlen, padding=padding, truncating=truncating,
+                                         trim_batch=bucket_boundaries is not None)
+        labels = tf.cast(tf.sparse.to_indicator(examples['labels'], meta['n_classes']), label_dtype)
+        return sequences, labels
+
+    dataset = tf.data.Dataset.from_tensor_slices(files)
+    if shuffle_buffer_size:
+        dataset = dataset.shuffle(len(files), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.interleave(lambda file: tf.data.TFRecordDataset(file, compression_type=meta['compression'] or ''),
+                                 cycle_length=max(min(cycle_length, len(files)), 1), num_parallel_calls=AUTOTUNE)
+    if shuffle_buffer_size:
+        dataset = dataset.shuffle(shuffle_buffer_size, seed=seed, reshuffle_each_iteration=True)
+    if repeat:
+        dataset = dataset.repeat()
+    if bucket_boundaries is not None:
+        boundaries = tf.constant(sorted(bucket_boundaries), tf.int64)
+
+        def get_bucket_id(serialized_example):
+            sequence = tf.io.parse_single_example(serialized_example, {'sequence': features['sequence']})['sequence']
+            return tf.reduce_sum(tf.cast(tf.size(sequence.values, out_type=tf.int64) > boundaries, tf.int64))
+
+        dataset = dataset.apply(tf.data.experimental.group_by_window(get_bucket_id,
+                                                                     lambda bucket_id, bucket: bucket.batch(batch_size),
+                                                                     window_size=batch_size))
+    else:
+        dataset = dataset.batch(batch_size)
+    dataset = dataset.map(parse_batch, num_parallel_calls=AUTOTUNE)
+    return dataset.prefetch(AUTOTUNE)
@@ -0,0 +1,351 @@
+import os
+import json
+import numpy as np
+import scipy.sparse as sp
+from collections import Counter
+from sklearn.preprocessing import normalize
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+
+# Corpus level parameters (& their sklearn defaults) handled by StreamingVectorizer, other parameters are sklearn
+# analysis parameters (tokenizer, lowercase, ngram_range, ...)
+CORPUS_PARAMS = {'min_df': 1,
+                 'max_df': 1.0,
+                 'max_features': None,
+                 'binary': False,
+                 'norm': 'l2',
+                 'use_idf': True,
+                 'smooth_idf': True,
+                 'sublinear_tf': False,
+                 'dtype': None}
+
+# Count-min sketch universal hashing modulus (Mersenne prime 2^31 - 1)
+SKETCH_PRIME = 2 ** 31 - 1
+
+
+########################################################################################################################
+#                                               CHUNKS READERS                                                         #
+########################################################################################################################
+
+
+def get_chunks_reader(text_data, chunk_size=10000):
+    """
+    Re-iterable chunks reader of an in-memory corpus (each call returns a new chunks iterator)
+
+    :param text_data: corpus (pandas series or list of strings / lists of tokens)
+    :param chunk_size: number of documents by chunk
+
+    :return: chunks reader (callable returning a chunks generator)
+    """
+    return lambda: (text_data[start:start + chunk_size] for start in range(0, len(text_data), chunk_size))
+
+
+def iter_chunks(chunks):
+    """
+    Iterate over chunks of documents
+
+    :param chunks: chunks reader (callable returning a chunks iterator, e.g. get_chunks_reader or a pandas read_csv
+    chunks reader) or re-iterable chunks (e.g. list of chunks)
+
+    :return: chunks iterator
+    """
+    if callable(chunks):
+        return iter(chunks())
+    if iter(chunks) is chunks:
+        raise Exception('one pass chunks iterator not implemented (use a chunks reader)')
+    return iter(chunks)
+
+
+########################################################################################################################
+#                                              COUNT-MIN SKETCH                                                        #
+########################################################################################################################
+
+
+class CountMinSketch:
+
+    def __init__(self, width=2 ** 18, depth=4, seed=0):
+        """
+        Count-min sketch of integer keys counts (counts are over-estimated, never under-estimated)
+
+        :param width: number of counters by row
+        :param depth: number of rows (independent hash functions)
+        :param seed: hash functions random seed
+        """
+        random_state = np.random.RandomState(seed)
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        # Universal hash functions ((a * key + b) mod prime) mod width
+        self.a = random_state.randint(1, SKETCH_PRIME, size=depth).astype(np.int64)
+        self.b = random_state.randint(0, SKETCH_PRIME, size=depth).astype(np.int64)
+
+    def _get_columns(self, keys):
+        """
+        Counters columns of keys in each row
+
+        :param keys: integer keys lower than 2^31 (numpy array)
+
+        :return: columns (numpy array of shape (depth, len(keys)))
+        """
+        keys = np.asarray(keys, dtype=np.int64) % SKETCH_PRIME
+        return (self.a[:, None] * keys[None, :] + self.b[:, None]) % SKETCH_PRIME % self.width
+
+    def update(self, keys, counts=None):
+        """
+        Add counts of keys
+
+        :param keys: integer keys (numpy array)
+        :param counts: counts of keys (numpy array, default is 1 by key)
+        """
+        for row, columns in enumerate(self._get_columns(keys)):
+            self.table[row] += np.bincount(columns, weights=counts, minlength=self.width).astype(np.int64)
+
+    def query(self, keys):
+        """
+        Estimated counts of keys
+
+        :param keys: integer keys (numpy array)
+
+        :return: estimated counts (numpy array)
+        """
+        return self.table[np.arange(self.depth)[:, None], self._get_columns(keys)].min(axis=0)
+
+
+########################################################################################################################
+#                                           MEMORY MAPPED CSR MATRICES                                                 #
+########################################################################################################################
+
+
+def save_memmap_matrix(matrices, folder):
+    """
+    Write CSR chunks as one memory mapped CSR matrix (data, indices & indptr raw files, only one chunk in memory)
+
+    :param matrices: CSR chunks with the same number of columns (iterable)
+    :param folder: matrix folder
+
+    :return: memory mapped matrix (see load_memmap_matrix)
+    """
+    os.makedirs(folder, exist_ok=True)
+    indptr, nnz, n_columns, dtype = [np.zeros(1, dtype=np.int64)], 0, 0, np.float64
+    with open(os.path.join(folder, 'data.bin'), 'wb') as data_file, \
+            open(os.path.join(folder, 'indices.bin'), 'wb') as indices_file:
+        for matrix in matrices:
+            matrix = sp.csr_matrix(matrix)
+            matrix.sort_indices()
+            data_file.write(matrix.data.tobytes())
+            indices_file.write(matrix.indices.astype(np.int32).tobytes())
+            indptr.append(nnz + matrix.indptr[1:].astype(np.int64))
+            nnz += matrix.nnz
+            n_columns, dtype = matrix.shape[1], matrix.dtype
+    # scipy keeps int32 indices (no copy of memory mapped indices) if indptr also fits in int32
+    indptr_dtype = np.int32 if nnz <= np.iinfo(np.int32).max else np.int64
+    indptr = np.concatenate(indptr).astype(indptr_dtype)
+    indptr.tofile(os.path.join(folder, 'indptr.bin'))
+    with open(os.path.join(folder, 'meta.json'), 'w') as file:
+        json.dump({'shape': [len(indptr) - 1, n_columns],
+                   'nnz': nnz,
+                   'dtype': np.dtype(dtype).str,
+                   'indptr_dtype': np.dtype(indptr_dtype).str}, file)
+    return load_memmap_matrix(folder)
+
+
+def load_memmap_matrix(folder):
+    """
+    Load a memory mapped CSR matrix (see save_memmap_matrix)
+
+    :param folder: matrix folder
+
+    :return: CSR matrix (data & indices are read only memory maps)
+    """
+    with open(os.path.join(folder, 'meta.json')) as file:
+        meta = json.load(file)
+    if meta['nnz'] == 0:
+        return sp.csr_matrix(tuple(meta['shape']), dtype=np.dtype(meta['dtype']))
+    data = np.memmap(os.path.join(folder, 'data.bin'), dtype=np.dtype(meta['dtype']), mode='r')
+    indices = np.memmap(os.path.join(folder, 'indices.bin'), dtype=np.int32, mode='r')
+    indptr = np.fromfile(os.path.join(folder, 'indptr.bin'), dtype=np.dtype(meta['indptr_dtype']))
+    return sp.csr_matrix((data, indices, indptr), shape=tuple(meta['shape']), copy=False)
+
+
+########################################################################################################################
+#                                            STREAMING VECTORIZER                                                      #
+########################################################################################################################
+
+
+class StreamingVectorizer:
+
+    def __init__(self, vectorizer_type='tfidf', mode='vocabulary', n_features=2 ** 20, sketch_params=None,
+                 **vectorizer_params):
+        """
+        Out-of-core bag of words / TF-IDF vectorizer : vocabulary & document frequencies are built in one pass over
+        chunks of documents, documents are then vectorized chunk by chunk (CSR matrices)
+
+        'vocabulary' mode has the same outputs as sklearn CountVectorizer / TfidfVectorizer, 'hashing' mode uses
+        sklearn HashingVectorizer columns (no vocabulary in memory), their document frequencies can be estimated with a
+        count-min sketch.
+
+        :param vectorizer_type: 'bow' or 'tfidf'
+        :param mode: 'vocabulary' or 'hashing'
+        :param n_features: number of hashing columns ('hashing' mode)
+        :param sketch_params: CountMinSketch parameters of document frequencies ('hashing' mode, dict, None counts
+        document frequency of each column)
+        :param vectorizer_params: sklearn vectorizer parameters (corpus level parameters min_df, max_df & max_features
+        only apply in 'vocabulary' mode)
+        """
+        if vectorizer_type not in ['bow', 'tfidf']:
+            raise Exception(f'{vectorizer_type} streaming vectorizer not implemented')
+        if mode not in ['vocabulary', 'hashing']:
+            raise Exception(f'{mode} streaming vectorizer mode not implemented')
+        self.vectorizer_type = vectorizer_type
+        self.mode = mode
+        self.n_features = n_features
+        self.corpus_params = {param: vectorizer_params.pop(param, default) for param, default in CORPUS_PARAMS.items()}
+        self.corpus_params['dtype'] = self.corpus_params['dtype'] or (np.int64 if vectorizer_type == 'bow'
+                                                                      else np.float64)
+        self.vectorizer_params = vectorizer_params
+        self.sketch = CountMinSketch(**sketch_params) if sketch_params is not None and mode == 'hashing' else None
+        self.n_documents = 0
+        self.document_frequencies = None
+        self.vocabulary_ = None
+        self.idf_ = None
+        self._vectorizer = None
+        if mode == 'hashing':
+            self._vectorizer = HashingVectorizer(n_features=n_features,
+                                                 alternate_sign=False,
+                                                 norm=None,
+                                                 dtype=np.float64,
+                                                 **vectorizer_params)
+
+    def _fit_vocabulary(self, chunks):
+        """
+        Build vocabulary & document frequencies of each term in one pass (same term filters as sklearn)
+
+        :param chunks: chunks reader (see iter_chunks)
+        """
+        analyzer = CountVectorizer(**self.vectorizer_params).build_analyzer()
+        document_frequencies, term_frequencies = Counter(), Counter()
+        for chunk in iter_chunks(chunks):
+            for document in chunk:
+                terms = analyzer(document)
+                document_frequencies.update(set(terms))
+                if self.corpus_params['max_features'] is not None and not self.corpus_params['binary']:
+                    term_frequencies.update(terms)
+                self.n_documents += 1
+        min_df, max_df = self.corpus_params['min_df'], self.corpus_params['max_df']
+        min_count = min_df if isinstance(min_df, (int, np.integer)) else min_df * self.n_documents
+        max_count = max_df if isinstance(max_df, (int, np.integer)) else max_df * self.n_documents
+        terms = [term for term, count in document_frequencies.items() if min_count <= count <= max_count]
+        if self.corpus_params['max_features'] is not None:
+            # Most frequent terms (sklearn counts documents if binary), ties broken by term
+            frequencies = document_frequencies if self.corpus_params['binary'] else term_frequencies
+            terms = sorted(terms, key=lambda term: (-frequencies[term], term))[:self.corpus_params['max_features']]
+        if len(terms) == 0:
+            raise Exception('empty vocabulary not implemented (no term kept by document frequency filters)')
+        terms = sorted(terms)
+        self.vocabulary_ = {term: i for i, term in enumerate(terms)}
+        self.document_frequencies = np.array([document_frequencies[term] for term in terms], dtype=np.int64)
+        self._vectorizer = CountVectorizer(vocabulary=self.vocabulary_, **self.vectorizer_params)
+
+    def _fit_hashing(self, chunks):
+        """
+        Count document frequencies of hashing columns in one pass (exact or count-min sketch estimates)
+
+        :param chunks: chunks reader (see iter_chunks)
+        """
+        document_frequencies = np.zeros(self.n_features, dtype=np.int64) if self.sketch is None else None
+        for chunk in iter_chunks(chunks):
+            counts = self._vectorizer.transform(chunk)
+            self.n_documents += counts.shape[0]
+            columns, column_frequencies = np.unique(counts.indices, return_counts=True)
+            if self.sketch is None:
+                document_frequencies[columns] += column_frequencies
+            else:
+                self.sketch.update(columns, column_frequencies)
+        if self.sketch is not None:
+            document_frequencies = self.sketch.query(np.arange(self.n_features))
+        self.document_frequencies = document_frequencies
+
+    def fit(self, chunks):
+        """
+        Fit vectorizer on a corpus streamed by chunks
+
+        :param chunks: chunks reader (see iter_chunks)
+
+        :return: fitted vectorizer
+        """
+        self.n_documents = 0
+        if self.mode == 'vocabulary':
+            self._fit_vocabulary(chunks)
+        else:
+            self._fit_hashing(chunks)
+        # sklearn TfidfTransformer IDF (smooth_idf adds one document containing every term)
+        smoothing = int(self.corpus_params['smooth_idf'])
+        self.idf_ = np.log((self.n_documents + smoothing) / (self.document_frequencies + smoothing)) + 1
+        return self
+
+    def transform_chunk(self, chunk):
+        """
+        Vectorize a chunk of documents
+
+        :param chunk: chunk of documents (list of strings / lists of tokens)
+
+        :return: vectorized chunk (CSR matrix)
+        """
+        if self._vectorizer is None or self.idf_ is None:
+            raise Exception('unfitted streaming vectorizer transform not implemented')
+        matrix = sp.csr_matrix(self._vectorizer.transform(chunk), dtype=np.float64)
+        if self.corpus_params['binary']:
+            matrix.data[:] = 1
+        if self.vectorizer_type == 'tfidf':
+            if self.corpus_params['sublinear_tf']:
+                np.log(matrix.data, matrix.data)
+                matrix.data += 1
+            if self.corpus_params['use_idf']:
+                matrix.data *= self.idf_[matrix.indices]
+            if self.corpus_params['norm'] is not None:
+                matrix = normalize(matrix, norm=self.corpus_params['norm'], copy=False)
+        return matrix.astype(self.corpus_params['dtype'])
+
+    def transform(self, chunks):
+        """
+        Vectorize a corpus streamed by chunks
+
+        :param chunks: chunks reader or iterator of chunks (one pass)
+
+        :return: vectorized chunks (generator of CSR matrices)
+        """
+        for chunk in (chunks() if callable(chunks) else chunks):
+            yield self.transform_chunk(chunk)
+
+    def transform_to_matrix(self, chunks, memmap_folder=None):
+        """
+        Vectorize a corpus streamed by chunks into one matrix
+
+        :param chunks: chunks reader or iterator of chunks (one pass)
+        :param memmap_folder: matrix folder (memory mapped matrix, None stacks chunks in memory)
+
+        :return: vectorized corpus (CSR matrix)
+        """
+        if memmap_folder is not None:
+            return save_memmap_matrix(self.transform(chunks), memmap_folder)
+        matrices = list(self.transform(chunks))
+        if len(matrices) == 0:
+            return sp.csr_matrix((0, len(self.idf_)), dtype=self.corpus_params['dtype'])
+        return sp.vstack(matrices, format='csr')
+
+    def get_feature_names(self):
+        """
+        Vocabulary terms ordered by column ('vocabulary' mode)
+
+        :return: list of terms
+        """
+        if self.mode == 'hashing':
+            raise Exception('hashing streaming vectorizer feature names not implemented')
+        return sorted(self.vocabulary_, key=self.vocabulary_.get)
+
+    def get_feature_names_out(self):
+        """
+        Vocabulary terms ordered by column ('vocabulary' mode, sklearn >= 1.0 name)
+
+        :return: numpy array of terms
+        """
+        return np.array(self.get_feature_names(), dtype=object)
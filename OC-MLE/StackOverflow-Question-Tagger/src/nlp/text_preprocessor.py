@@ -1,5 +1,10 @@
+import os
+import json
+import heapq
 import string
+import hashlib
 import itertools
+from operator import itemgetter
 from collections import Counter
 from bs4 import BeautifulSoup
 # NLP modules
@@ -13,9 +18,11 @@ from nltk.corpus import stopwords
 from nltk.stem.snowball import SnowballStemmer
 from fuzzywuzzy import fuzz, process
 from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from src.nlp.word_similarity import SimilarWordsFilter
+from src.nlp.streaming_vectorizer import StreamingVectorizer, get_chunks_reader
+from src.nlp.sequence_encoder import SequenceEncoder
 # Config
-from config.main_config import LANG, SPACY_DEFAULT_STOPWORDS, SPACY_UNIVERSAL_POS_TAGS,\
-                               LEMMATIZER_INSTANCE, POS_TAGGER_INSTANCE, NER_INSTANCE
+from config.main_config import LANG, SPACY_DEFAULT_STOPWORDS, SPACY_UNIVERSAL_POS_TAGS, SPACY_DISABLED_PIPES
 # Personal package named src
 from src.datacleaner import *
 # Data preprocessing
@@ -149,9 +156,9 @@ def filter_stopwords(text, other_stopwords=None, lang='english', min_token_lengt
     :return: a filtered list of tokens
     """
     # Get stopwords list by language
-    if lib is 'nltk':
+    if lib == 'nltk':
         stopwords_list = stopwords.words(lang)
-    elif lib is 'spacy':
+    elif lib == 'spacy':
         stopwords_list = SPACY_DEFAULT_STOPWORDS
     # TO DO : add gensim & sklearn lists
     if other_stopwords is not None:
@@ -174,42 +181,131 @@ def filter_words_by_levenshtein_similarity(words, threshold=0.50, metric=fuzz.to
 
     :return: list of words filtered by levenshtein similarity
     """
-    similar_words = []
-    # First iteration over words list
-    for outer_index, word in enumerate(words):
-        # Second iteration over words list
-        for inner_index in range(len(words)):
-            # Compute levenshtein similarity ratio (which depends on used metric)
-            levenshtein_similarity = metric(word, words[inner_index]) * 0.01
-            # Find similar pair of words based on levenshtein similarity threshold ratio
-            if (inner_index != outer_index) and (levenshtein_similarity > threshold):
-                similar_pair_of_words = [word, words[inner_index]]
-                # Check if similar pair of words are not already in words list
-                if all(s for s in similar_pair_of_words if s not in words):
-                    similar_words.extend(similar_pair_of_words)
-    # Filter similar words from origin words list
-    return [w for w in words if w not in similar_words]
-
-
-def filter_most_common_tokens(tokens, n=None):
+    # Candidate pairs blocking & verification (see SimilarWordsFilter, same result as comparing every pair of words)
+    return SimilarWordsFilter(threshold=threshold, metric=metric).filter(words)
+
+
+class TokenFrequencyIndex:
+
+    def __init__(self, corpus=None):
+        """
+        Tokens frequency index : global tokens counts built in one pass over a corpus, most common tokens are selected
+        with a heap & filtered with a set (shared by all documents of a corpus)
+
+        :param corpus: iterable of lists of tokens (e.g. df['Tokens'], None builds an empty index)
+        """
+        self.counts = Counter()
+        self.n_tokens = 0
+        self._most_common_tokens = {}
+        if corpus is not None:
+            self.update(corpus)
+
+    def __repr__(self):
+        # Stable representation (used in normalizer parameters hash, see corpus_preprocessor)
+        counts_hash = hashlib.sha1(repr(sorted(self.counts.items())).encode('utf-8')).hexdigest()[:16]
+        return f'TokenFrequencyIndex(n_tokens={self.n_tokens}, vocabulary_size={len(self.counts)}, ' \
+               f'counts_hash={counts_hash})'
+
+    def update(self, corpus):
+        """
+        Count tokens of a corpus
+
+        :param corpus: iterable of lists of tokens
+
+        :return: updated index
+        """
+        for tokens in corpus:
+            self.counts.update(tokens)
+            self.n_tokens += len(tokens)
+        self._most_common_tokens = {}
+        return self
+
+    def get_n_most_common(self, n=None):
+        """
+        Number of most common tokens
+
+        :param n: number (int) or ratio of vocabulary size (float) of most common tokens (None : all tokens)
+
+        :return: number of most common tokens (int)
+        """
+        if n is None:
+            return len(self.counts)
+        return int(round(n * len(self.counts))) if type(n) is float else n
+
+    def most_common(self, n=None):
+        """
+        n most common tokens & their counts (heap selection, same order as Counter.most_common)
+
+        :param n: number (int) or ratio of vocabulary size (float) of most common tokens (None : all tokens)
+
+        :return: list of (token, count) tuples
+        """
+        return heapq.nlargest(self.get_n_most_common(n), self.counts.items(), key=itemgetter(1))
+
+    def get_most_common_tokens(self, n=None):
+        """
+        Set of n most common tokens (cached by n)
+
+        :param n: number (int) or ratio of vocabulary size (float) of most common tokens (None : all tokens)
+
+        :return: set of tokens
+        """
+        n_most_common = self.get_n_most_common(n)
+        if n_most_common not in self._most_common_tokens:
+            self._most_common_tokens[n_most_common] = {token for token, _ in self.most_common(n_most_common)}
+        return self._most_common_tokens[n_most_common]
+
+    def filter(self, tokens, n=None):
+        """
+        Filter n most common tokens of index from a list of tokens
+
+        :param tokens: list of tokens
+        :param n: number (int) or ratio of vocabulary size (float) of most common tokens (None : all tokens)
+
+        :return: a filtered list of tokens
+        """
+        most_common_tokens = self.get_most_common_tokens(n)
+        return [token for token in tokens if token not in most_common_tokens]
+
+
+def filter_most_common_tokens(tokens, n=None, token_frequency_index=None):
     """
     Filter n most common tokens
 
     :param tokens: list of tokens
-    :param n: n most common selected tokens (float or int value)
+    :param n: n most common selected tokens (float or int value, float is a ratio of number of tokens if tokens are
+    counted by document or a ratio of index vocabulary size otherwise)
+    :param token_frequency_index: corpus tokens frequency index (TokenFrequencyIndex, None counts tokens by document)
 
     :return: a filtered list of tokens
     """
-    tokens_freqdist = nltk.FreqDist(tokens)
+    if token_frequency_index is not None:
+        return token_frequency_index.filter(tokens, n)
     # Filter uniform distribution len(set(tokens_freqdist.values()))
     if len(tokens) > 10:
         n_most_common_tokens = int(round(n * len(tokens))) if type(n) is float else n
-        most_freq_tokens = list(list(zip(*tokens_freqdist.most_common(n_most_common_tokens)))[0])
-        tokens_filtered = [token for token in tokens if token not in most_freq_tokens]
-        return tokens_filtered
+        return TokenFrequencyIndex([tokens]).filter(tokens, n_most_common_tokens)
     return tokens
 
 
+def filter_corpus_most_common_tokens(corpus, n=None, token_frequency_index=None):
+    """
+    Filter n most common tokens of a corpus (most common tokens are computed once over the whole corpus)
+
+    :param corpus: list of lists of tokens (e.g. df['Tokens'])
+    :param n: number (int) or ratio of vocabulary size (float) of most common tokens
+    :param token_frequency_index: tokens frequency index (None builds the index of corpus)
+
+    :return: filtered lists of tokens (list of lists, pandas series if corpus is a series)
+    """
+    if token_frequency_index is None:
+        token_frequency_index = TokenFrequencyIndex(corpus)
+    filtered_corpus = [token_frequency_index.filter(tokens, n) for tokens in corpus]
+    if isinstance(corpus, pd.Series):
+        return pd.Series(filtered_corpus, index=corpus.index, dtype='object')
+    return filtered_corpus
+
+
 def filter_tokens_by_length(tokens, min_cond, max_cond, keep_domain_based_words=False, domain_based_words=None):
     """
 
@@ -275,34 +371,106 @@ def stemmerize(data, lang='english'):
     return stemmerized_tokens
 
 
+# spaCy instances shared by text normalizer steps (by language, loaded at first use)
+_spacy_instances = {}
+
+
+def get_spacy_instance(lang=LANG):
+    """
+    Get the shared spaCy instance of a language (a single model is loaded, each step disables the pipeline
+    components it doesn't need, see SPACY_DISABLED_PIPES)
+
+    :param lang: spaCy model name (e.g. 'en_core_web_sm')
+
+    :return: spacy loaded instance
+    """
+    if lang not in _spacy_instances:
+        _spacy_instances[lang] = spacy.load(lang)
+    return _spacy_instances[lang]
+
+
+def pipe_corpus(corpus, nlp_instance=None, disable=(), batch_size=1000, n_process=1):
+    """
+    Stream a corpus through a single nlp.pipe call : a sentence is processed as one spaCy document & each token of a
+    list of tokens as its own spaCy document (like lemmatize, pos_tag & name_entity_recognize)
+
+    :param corpus: iterable of lists of tokens (or strings)
+    :param nlp_instance: spacy loaded instance (default is shared instance, see get_spacy_instance)
+    :param disable: disabled pipeline components
+    :param batch_size: spaCy pipe batch size
+    :param n_process: number of spaCy processes
+
+    :return: data type & spaCy documents of each corpus element (generator of tuples, in corpus order)
+    """
+    nlp_instance = nlp_instance if nlp_instance is not None else get_spacy_instance()
+    data_types = []
+
+    def iter_texts():
+        for i, data in enumerate(corpus):
+            data_types.append(type(data))
+            for text in ([data] if type(data) is str else data):
+                yield text, i
+
+    documents = nlp_instance.pipe(iter_texts(), as_tuples=True, disable=disable, batch_size=batch_size,
+                                  n_process=n_process)
+    next_index = 0
+    for i, group in itertools.groupby(documents, key=lambda document: document[1]):
+        # Empty lists of tokens have no spaCy document
+        for empty_index in range(next_index, i):
+            yield data_types[empty_index], []
+        yield data_types[i], [document for document, _ in group]
+        next_index = i + 1
+    for empty_index in range(next_index, len(data_types)):
+        yield data_types[empty_index], []
+
+
+def lemmatize_corpus(corpus,
+                     nlp_instance=None,
+                     pos_tags_kept=SPACY_UNIVERSAL_POS_TAGS,
+                     keep_original_text=False,
+                     batch_size=1000,
+                     n_process=1):
+    """
+    Lemmatize a corpus of lists of tokens or sentences (see lemmatize)
+
+    :param corpus: iterable of lists of tokens (or strings)
+    :param nlp_instance: spacy loaded instance (default is shared instance)
+    :param pos_tags_kept: Spacy tags to filter
+    :param keep_original_text: boolean which enable/disable adding original token/word to lemmatized list of tokens
+    :param batch_size: spaCy pipe batch size
+    :param n_process: number of spaCy processes
+
+    :return: lemmatized list of tokens (or string) of each corpus element (generator, in corpus order)
+    """
+    for data_type, documents in pipe_corpus(corpus, nlp_instance, SPACY_DISABLED_PIPES['lemmatizer'], batch_size,
+                                            n_process):
+        lemmatized_tokens = []
+        for document in documents:
+            for token in document:
+                # Try to extract token's lemma based on specific POS tags kept
+                if token.pos_ in pos_tags_kept:
+                    lemmatized_tokens.append(token.lemma_)
+                # Otherwise keep original token text or ignore token (which is filtered from lemmatized tokens)
+                elif keep_original_text:
+                    lemmatized_tokens.append(token.text)
+        yield lemmatized_tokens if data_type is list else ' '.join(lemmatized_tokens)
+
+
 def lemmatize(data,
-              nlp_instance=LEMMATIZER_INSTANCE,
+              nlp_instance=None,
               pos_tags_kept=SPACY_UNIVERSAL_POS_TAGS,
               keep_original_text=False):
     """
     Lemmatize a list of tokens or a sentence
 
     :param data: list of tokens (or a string)
-    :param nlp_instance: spacy loaded instance
+    :param nlp_instance: spacy loaded instance (default is shared instance)
     :param pos_tags_kept: Spacy tags to filter
     :param keep_original_text: boolean which enable/disable adding original token/word to lemmatized list of tokens
 
     :return: a lemmatized list of tokens (or a string)
     """
-    data_type = type(data)
-    data = [data] if data_type is str else data
-    lemmatizer = nlp_instance
-    results = list(lemmatizer.pipe(data))
-    lemmatized_tokens = []
-    for document in results:
-        for token in document:
-            # Try to extract token's lemma based on specific POS tags kept
-            if token.pos_ in pos_tags_kept:
-                lemmatized_tokens.append(token.lemma_)
-            # Otherwise keep original token text or ignore token (which is filtered from lemmatized tokens)
-            elif keep_original_text:
-                lemmatized_tokens.append(token.text)
-    return lemmatized_tokens if data_type is list else ' '.join(lemmatized_tokens)
+    return next(lemmatize_corpus([data], nlp_instance, pos_tags_kept, keep_original_text))
 
 
 def extract_n_grams(data, n=2):
@@ -319,56 +487,82 @@ def extract_n_grams(data, n=2):
     return ngrams
 
 
-def pos_tag(data, nlp_instance=POS_TAGGER_INSTANCE, filtered_tags=(), only_tokens=False,
-            module_type='spacy'):  # TODO manage list input
+def pos_tag_corpus(corpus, nlp_instance=None, filtered_tags=(), only_tokens=False, module_type='spacy',
+                   batch_size=1000, n_process=1):
+    """
+    POS tag a corpus of lists of tokens or sentences (see pos_tag)
+
+    :param corpus: iterable of lists of tokens (or strings)
+    :param nlp_instance: spacy loaded instance (default is shared instance)
+    :param filtered_tags: POS tags to filter
+    :param only_tokens: boolean which enable/disable returning only filtered tokens
+    :param module_type: module architecture type ('spacy' or 'nltk')
+    :param batch_size: spaCy pipe batch size
+    :param n_process: number of spaCy processes
+
+    :return: tagged tokens of each corpus element (generator, in corpus order)
+    """
+    if module_type == 'spacy':
+        tagged_corpus = ([(tk.text, tk.tag_) for doc in documents for tk in doc if tk.tag_ not in filtered_tags]
+                         for _, documents in pipe_corpus(corpus, nlp_instance, SPACY_DISABLED_PIPES['pos_tagger'],
+                                                         batch_size, n_process))
+    else:
+        tagged_corpus = (nltk.pos_tag(data) if type(data) is list else nltk.pos_tag(tokenize(data)) for data in corpus)
+    for tagged_tokens in tagged_corpus:
+        if only_tokens:
+            tagged_tokens = [token for token, tag in tagged_tokens if tag not in filtered_tags]
+        yield tagged_tokens
+
+
+def pos_tag(data, nlp_instance=None, filtered_tags=(), only_tokens=False, module_type='spacy'):
     """
     POS tag a list of tokens (or a sentence)
 
     :param data: list of tokens (or a string)
-    :param nlp_instance: spacy loaded instance
+    :param nlp_instance: spacy loaded instance (default is shared instance)
     :param filtered_tags: POS tags to filter
     :param only_tokens: boolean which enable/disable returning only filtered tokens
     :param module_type: module architecture type ('spacy' or 'nltk')
 
     :return: tagged tokens
     """
-    if module_type is 'spacy':
-        pos = nlp_instance
-        if type(data) is list:
-            results = list(pos.pipe(data))
-            tagged_tokens = [(tk.text, tk.tag_) for doc in results for tk in doc if tk.tag_ not in filtered_tags]
-        else:
-            results = pos(data)
-            tagged_tokens = [(doc.text, doc.tag_) for doc in results if doc.tag_ not in filtered_tags]
-    else:
-        tagged_tokens = nltk.pos_tag(data) if type(data) is list else nltk.pos_tag(tokenize(data))
-    if only_tokens:
-        tagged_tokens = [token for token, tag in tagged_tokens if tag not in filtered_tags]
-    return tagged_tokens
+    return next(pos_tag_corpus([data], nlp_instance, filtered_tags, only_tokens, module_type))
+
+
+def name_entity_recognize_corpus(corpus, nlp_instance=None, filtered_entities=(), only_tokens=False, batch_size=1000,
+                                 n_process=1):
+    """
+    Extract name entities from a corpus of lists of tokens or sentences (see name_entity_recognize)
 
+    :param corpus: iterable of lists of tokens (or strings)
+    :param nlp_instance: spacy loaded instance (default is shared instance)
+    :param filtered_entities: entities to filter (only for lists of tokens)
+    :param only_tokens: boolean which filter entities from NER results
+    :param batch_size: spaCy pipe batch size
+    :param n_process: number of spaCy processes
+
+    :return: tokens entities of each corpus element (generator, in corpus order)
+    """
+    for data_type, documents in pipe_corpus(corpus, nlp_instance, SPACY_DISABLED_PIPES['ner'], batch_size, n_process):
+        tokens_ents = [(ent.text, ent.label_) for doc in documents for ent in doc.ents
+                       if data_type is not list or ent.label_ not in filtered_entities]
+        if only_tokens:
+            tokens_ents = [token for token, entity in tokens_ents]
+        yield tokens_ents
 
-def name_entity_recognize(data, nlp_instance=NER_INSTANCE, filtered_entities=(), only_tokens=False):
+
+def name_entity_recognize(data, nlp_instance=None, filtered_entities=(), only_tokens=False):
     """
     Extract name entities from a list of tokens (or a sentence)
 
     :param data: list of tokens (or a string)
-    :param nlp_instance: spacy loaded instance
-    :param filtered_entities: entities to filter
+    :param nlp_instance: spacy loaded instance (default is shared instance)
+    :param filtered_entities: entities to filter (only for lists of tokens)
     :param only_tokens: boolean which filter entities from NER results
 
     :return: tokens entities
     """
-    ner = nlp_instance
-    if type(data) is list:
-        results = list(ner.pipe(data))
-        tokens_ents = [(ent.text, ent.label_) for doc in results
-                       for ent in doc.ents if ent.label_ not in filtered_entities]
-    else:
-        results = ner(data)
-        tokens_ents = [(ent.text, ent.label_) for ent in results.ents]
-    if only_tokens:
-        tokens_ents = [token for token, entity in tokens_ents]
-    return tokens_ents
+    return next(name_entity_recognize_corpus([data], nlp_instance, filtered_entities, only_tokens))
 
 
 def text_normalizer(text,
@@ -414,7 +608,8 @@ def text_normalizer(text,
 
     :param stopwords_params: stopwords parameters (dict)
     :param levenshtein_params: levenshtein similarity parameters (dict)
-    :param most_common_tokens_filter_params: filter most common tokens parameters (dict)
+    :param most_common_tokens_filter_params: filter most common tokens parameters (dict, a corpus
+                                             TokenFrequencyIndex can be shared with 'token_frequency_index')
     :param stemmerizer_params: stemmerizer parameters (dict)
     :param lemmatizer_params: lemmatizer parameters (dict)
     :param pos_tagger_params: POS tagger parameters (dict)
@@ -626,7 +821,7 @@ def plot_questions_tokens_frequency(df,
 
 
 class KerasTextPreprocessor:
-    def __init__(self, corpus, tokenized=False):
+    def __init__(self, corpus, tokenized=False, sequence_encoder=False):
         # If text data is already tokenized & cleaned, untokenize corpus, training & testing data
         self.tokenized = tokenized
         self.corpus = corpus
@@ -634,15 +829,22 @@ class KerasTextPreprocessor:
             self.corpus = [' '.join(tokens) for tokens in self.corpus]
         # Keras tokenizer
         self.tokenizer = None
+        # Encode texts with a SequenceEncoder built from fitted tokenizer (same padded sequences, faster)
+        self.sequence_encoder = sequence_encoder
+        self.encoder = None
 
     def tokenize_corpus(self, **kwargs):
         self.tokenizer = keras.preprocessing.text.Tokenizer(**kwargs)
         self.tokenizer.fit_on_texts(self.corpus)
+        self.encoder = SequenceEncoder.from_tokenizer(self.tokenizer) if self.sequence_encoder else None
 
     def text_to_sequences(self, text, **kwargs):
         """
         list of word indexes, where the word of rank i in the dataset (starting at 1) has index i)
         """
+        if self.encoder is not None:
+            # Texts (or lists of normalized tokens) encoded in a preallocated padded matrix
+            return self.encoder.encode_batch(text, **kwargs)
         sequences = self.tokenizer.texts_to_sequences(text)
         padded_text = keras.preprocessing.sequence.pad_sequences(sequences, **kwargs)
         return padded_text
@@ -653,7 +855,8 @@ class KerasTextPreprocessor:
 ########################################################################################################################
 
 
-def text_vectorizer(text_data, vectorizer_params, vectorizer_type='tfidf', return_model=False):  # Class ! (MODEL)
+def text_vectorizer(text_data, vectorizer_params, vectorizer_type='tfidf', return_model=False,
+                    streaming_params=None):  # Class ! (MODEL)
     """
     Vectorize a list of tokens or a sentence
 
@@ -661,9 +864,14 @@ def text_vectorizer(text_data, vectorizer_params, vectorizer_type='tfidf', retur
     :param vectorizer_params: lemmatizer language
     :param vectorizer_type: tags which filter processing pipeline
     :param return_model: Spacy tags to filter
+    :param streaming_params: out-of-core 'bow' / 'tfidf' vectorization parameters (dict, see StreamingVectorizer,
+                             with 'chunk_size' & 'memmap_folder', text data can also be chunks readers)
 
     :return: a vectorized list of tokens (or a string)
     """
+    if streaming_params is not None:
+        return streaming_text_vectorizer(text_data, vectorizer_params, vectorizer_type, return_model,
+                                         **streaming_params)
     if vectorizer_type is 'bow':
         # https://scikit-learn.org/stable/modules/generated/sklearn.feature_extraction.text.CountVectorizer.html
         model = CountVectorizer(**vectorizer_params)
@@ -683,18 +891,75 @@ def text_vectorizer(text_data, vectorizer_params, vectorizer_type='tfidf', retur
         return (text_data_vectorized,) + ((model,) if return_model is True else tuple())
 
 
+def streaming_text_vectorizer(text_data, vectorizer_params, vectorizer_type='tfidf', return_model=False,
+                              chunk_size=10000, memmap_folder=None, **streaming_params):
+    """
+    Out-of-core text vectorizer : vocabulary (or hashing columns) & document frequencies are built in one pass over
+    chunks of train data, data is then vectorized chunk by chunk
+
+    :param text_data: corpus (list, pandas series or chunks reader) or dict of train & test corpora
+    :param vectorizer_params: sklearn vectorizer parameters
+    :param vectorizer_type: 'bow' or 'tfidf'
+    :param return_model: return fitted StreamingVectorizer
+    :param chunk_size: number of documents by chunk (in-memory corpora)
+    :param memmap_folder: memory mapped matrices folder (None stacks chunks in memory)
+    :param streaming_params: StreamingVectorizer parameters (mode, n_features, sketch_params)
+
+    :return: vectorized corpus (CSR matrices)
+    """
+    model = StreamingVectorizer(vectorizer_type, **streaming_params, **vectorizer_params)
+    data_types = ['train', 'test'] if type(text_data) is dict else ['train']
+    corpora = text_data if type(text_data) is dict else {'train': text_data}
+    chunks_readers = {data_type: corpora[data_type] if callable(corpora[data_type])
+                      else get_chunks_reader(corpora[data_type], chunk_size) for data_type in data_types}
+    model.fit(chunks_readers['train'])
+    vectorized_data = tuple(model.transform_to_matrix(chunks_readers[data_type],
+                                                      None if memmap_folder is None
+                                                      else os.path.join(memmap_folder, data_type))
+                            for data_type in data_types)
+    return vectorized_data + ((model,) if return_model is True else tuple())
+
+
 def get_stopwords_from_idf(tfidf, thr=0.95, domain_based_words=()):
     """
+    Get stopwords of a fitted TF-IDF vectorizer : features with the lowest IDF (most frequent features in documents)
+
+    :param tfidf: fitted vectorizer with idf_ & feature names (TfidfVectorizer or StreamingVectorizer)
+    :param thr: IDF quantile threshold (features with an IDF rank lower than (1 - thr) * number of features)
+    :param domain_based_words: domain based words never selected as stopwords
+
+    :return: stopwords & their IDF sorted by IDF (dict)
+    """
+    idf = np.asarray(tfidf.idf_)
+    n = min(max(int(round(len(idf) - (len(idf) * thr))), 0), len(idf))
+    if n == 0:
+        return {}
+    # Bottom n IDF features (partition, then only n features are sorted)
+    indices = np.argpartition(idf, n - 1)[:n] if n < len(idf) else np.arange(len(idf))
+    indices = indices[np.argsort(idf[indices], kind='stable')]
+    feature_names = tfidf.get_feature_names_out() if hasattr(tfidf, 'get_feature_names_out') \
+        else tfidf.get_feature_names()
+    domain_based_words = set(domain_based_words)
+    return {feature_names[i]: idf[i] for i in indices if feature_names[i] not in domain_based_words}
+
+
+def save_stopwords_artifact(stopwords, filename='idf_stopwords', folder='data/preprocessing', **metadata):
+    """
+    Save a frozen stopwords artifact (JSON file loaded by the deployed API normalizer, see load_stopwords_artifact)
+
+    :param stopwords: stopwords (dict of stopwords & their IDF, e.g. get_stopwords_from_idf output, or list)
+    :param filename: artifact filename (without extension)
+    :param folder: artifact folder
+    :param metadata: artifact metadata (e.g. thr, vectorizer parameters)
 
-    :param tfidf:
-    :param thr:
-    :param domain_based_words:
-    :return:
+    :return: artifact path
     """
-    feature_array = np.array(tfidf.get_feature_names())
-    indices = np.argsort(tfidf.idf_)
-    n = round(len(indices) - (len(indices) * thr))
-    n_top_scores = tfidf.idf_[indices][:n]
-    n_top_features = feature_array[indices][:n]
-    top_n = {f: idf for f, idf in zip(n_top_features, n_top_scores) if f not in domain_based_words}
-    return top_n
\ No newline at end of file
+    scores = stopwords if isinstance(stopwords, dict) else {}
+    artifact = {'stopwords': sorted(set(stopwords)),
+                'scores': {word: float(scores[word]) for word in sorted(scores)},
+                'metadata': metadata}
+    path = f'{folder}/{filename}.json'
+    with open(path + '.tmp', 'w') as file:
+        json.dump(artifact, file, default=str)
+    os.replace(path + '.tmp', path)
+    return path
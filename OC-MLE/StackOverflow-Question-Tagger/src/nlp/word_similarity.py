@@ -0,0 +1,408 @@
+import math
+import zlib
+import itertools
+import numpy as np
+from collections import Counter, defaultdict
+from fuzzywuzzy import fuzz, utils
+from sklearn.feature_extraction.text import CountVectorizer
+
+
+########################################################################################################################
+#                                              SIMILARITY KEYS                                                         #
+########################################################################################################################
+
+
+def get_processed_key(word):
+    """
+    fuzzywuzzy processed string (token based scorers only depend on it)
+
+    :param word: a word (str)
+
+    :return: processed word (lowerized alphanumeric tokens separated by spaces)
+    """
+    return utils.full_process(word, force_ascii=True)
+
+
+def get_sorted_tokens_string(key):
+    """
+    Sorted tokens string compared by token_sort_ratio
+
+    :param key: processed word
+
+    :return: sorted tokens joined by spaces
+    """
+    return ' '.join(sorted(key.split()))
+
+
+def get_sorted_token_set_string(key):
+    """
+    Sorted distinct tokens string compared by token_set_ratio (when words have no common token)
+
+    :param key: processed word
+
+    :return: sorted distinct tokens joined by spaces
+    """
+    return ' '.join(sorted(set(key.split())))
+
+
+# Supported metrics : word key function (metric only depends on keys) & compared string function (ratio between
+# compared strings is bounded by their q-grams overlaps, see get_prefix_candidate_pairs)
+BLOCKING_METRICS = {fuzz.ratio: (None, None),
+                    fuzz.token_sort_ratio: (get_processed_key, get_sorted_tokens_string),
+                    fuzz.token_set_ratio: (get_processed_key, get_sorted_token_set_string)}
+
+# fuzzywuzzy ratio is symmetric with python-Levenshtein (difflib SequenceMatcher ratio may depend on strings order)
+SYMMETRIC_RATIO = fuzz.SequenceMatcher.__module__ != 'difflib'
+
+
+def get_strings_ratio(string_1, string_2):
+    """
+    fuzz.ratio without input checks (compared strings of distinct keys)
+
+    :param string_1: a string
+    :param string_2: another string
+
+    :return: ratio (int between 0 & 100)
+    """
+    return utils.intr(100 * fuzz.SequenceMatcher(None, string_1, string_2).ratio())
+
+
+########################################################################################################################
+#                                             SIMILARITY UPPER BOUNDS                                                  #
+########################################################################################################################
+
+
+def get_q_grams(string, q=1):
+    """
+    q-grams of a string padded by q - 1 characters
+
+    :param string: a string
+    :param q: q-grams size (1 : characters)
+
+    :return: list of q-grams
+    """
+    padded_string = '\x00' * (q - 1) + string + '\x00' * (q - 1)
+    return [padded_string[i:i + q] for i in range(len(padded_string) - q + 1)]
+
+
+def get_q_grams_counts(strings, q=1):
+    """
+    q-grams counts of strings
+
+    :param strings: compared strings (list)
+    :param q: q-grams size
+
+    :return: q-grams counts (sparse matrix of shape (len(strings), number of distinct q-grams))
+    """
+    return CountVectorizer(analyzer=lambda string: get_q_grams(string, q)).fit_transform(strings).tocsr()
+
+
+def get_q_grams_overlaps(q_grams_counts, pairs):
+    """
+    Number of common q-grams of pairs of strings (multiset intersection)
+
+    :param q_grams_counts: q-grams counts of strings (see get_q_grams_counts)
+    :param pairs: pairs of strings indexes (numpy array of shape (n_pairs, 2))
+
+    :return: q-grams overlap of each pair (numpy array)
+    """
+    return np.asarray(q_grams_counts[pairs[:, 0]].minimum(q_grams_counts[pairs[:, 1]]).sum(axis=1)).ravel()
+
+
+def get_min_q_grams_overlap(lengths, min_ratio, q=1):
+    """
+    Minimal number of common padded q-grams of strings with a ratio >= min_ratio : each unmatched character of an
+    alignment removes at most q common q-grams (q = 1 : ratio <= 2 * characters overlap / (len_1 + len_2))
+
+    :param lengths: sum of lengths of pairs of strings (numpy array or float)
+    :param min_ratio: minimal ratio (float between 0 & 1)
+    :param q: q-grams size
+
+    :return: minimal q-grams overlap (q - 1 + (len_1 + len_2) / 2 * (1 - (2 * q - 1) * (1 - min_ratio)))
+    """
+    return q - 1 + lengths / 2 * (1 - (2 * q - 1) * (1 - min_ratio))
+
+
+def get_token_set_upper_bound(key_1, key_2):
+    """
+    Upper bound of token_set_ratio of 2 processed words with common tokens, maximum of bounds of compared strings
+    ratios (intersection vs intersection + remainders & both intersection + remainder strings)
+
+    :param key_1: a processed word
+    :param key_2: another processed word
+
+    :return: upper bound ratio (float between 0 & 1)
+    """
+    tokens_1, tokens_2 = set(key_1.split()), set(key_2.split())
+    if tokens_1 <= tokens_2 or tokens_2 <= tokens_1:
+        return 1
+    intersection_length = len(' '.join(tokens_1 & tokens_2))
+    remainder_1, remainder_2 = ' '.join(sorted(tokens_1 - tokens_2)), ' '.join(sorted(tokens_2 - tokens_1))
+    remainders_overlap = sum((Counter(remainder_1) & Counter(remainder_2)).values())
+    return max(2 * intersection_length / (2 * intersection_length + 1 + len(remainder_1)),
+               2 * intersection_length / (2 * intersection_length + 1 + len(remainder_2)),
+               2 * (intersection_length + 1 + remainders_overlap) /
+               (2 * intersection_length + 2 + len(remainder_1) + len(remainder_2)))
+
+
+########################################################################################################################
+#                                             CANDIDATE PAIRS BLOCKING                                                 #
+########################################################################################################################
+
+
+def get_prefix_candidate_pairs(strings, min_ratio, q=None, chunk_size=1000000):
+    """
+    Exact blocking with q-grams prefix filtering : q-grams of each string are sorted from rarest to most common, two
+    strings with a ratio >= min_ratio share at least one q-gram in their prefixes (prefix length depends on minimal
+    q-grams overlap allowed by min_ratio & length bounds, see get_min_q_grams_overlap)
+
+    :param strings: compared strings (list)
+    :param min_ratio: minimal ratio (float between 0 & 1)
+    :param q: q-grams size (default is 2 (bigrams) if min_ratio > 0.7 (selective prefixes) else 1 (characters))
+    :param chunk_size: number of candidate pairs by chunk
+
+    :return: chunks of candidate pairs of strings indexes (generator of numpy arrays of shape (n_pairs, 2))
+    """
+    q = q or (2 if min_ratio > 0.7 else 1)
+    if (2 * q - 1) * (1 - min_ratio) >= 1:
+        raise Exception(f'{q}-grams prefix filtering not implemented for min_ratio {min_ratio}')
+    # Repeated q-grams are distinct elements (('ab', 0), ('ab', 1), ...) to bound multiset overlap
+    elements = []
+    for string in strings:
+        counts = Counter()
+        string_elements = []
+        for q_gram in get_q_grams(string, q):
+            string_elements.append((q_gram, counts[q_gram]))
+            counts[q_gram] += 1
+        elements.append(string_elements)
+    frequencies = Counter(element for string_elements in elements for element in string_elements)
+    index = defaultdict(list)
+    candidate_pairs = []
+    for i in sorted(range(len(strings)), key=lambda i: len(strings[i])):
+        length = len(strings[i])
+        if length == 0:
+            continue
+        # Shorter strings are indexed first, their minimal length is bounded by ratio <= 2 * len_2 / (len_1 + len_2)
+        min_length = min_ratio * length / (2 - min_ratio)
+        min_overlap = max(1, math.ceil(get_min_q_grams_overlap(length + min_length, min_ratio, q) - 1e-9))
+        prefix = sorted(elements[i], key=lambda element: (frequencies[element], element))
+        candidates = set()
+        for element in prefix[:max(1, len(prefix) - min_overlap + 1)]:
+            candidates.update(j for j in index[element] if len(strings[j]) >= min_length)
+            index[element].append(i)
+        candidate_pairs.extend((j, i) for j in candidates)
+        if len(candidate_pairs) >= chunk_size:
+            yield np.array(candidate_pairs, dtype=np.int64)
+            candidate_pairs = []
+    yield np.array(candidate_pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def get_minhash_signatures(strings, num_perm=64, shingle_size=2, seed=0, chunk_size=10000):
+    """
+    MinHash signatures of padded characters n-grams of strings
+
+    :param strings: compared strings (list)
+    :param num_perm: number of hash functions
+    :param shingle_size: characters n-grams size
+    :param seed: random seed of hash functions
+    :param chunk_size: number of strings hashed at once
+
+    :return: signatures (numpy array of shape (len(strings), num_perm))
+    """
+    prime = (1 << 31) - 1
+    random_state = np.random.RandomState(seed)
+    a = random_state.randint(1, prime, size=(num_perm, 1)).astype(np.int64)
+    b = random_state.randint(0, prime, size=(num_perm, 1)).astype(np.int64)
+    signatures = np.empty((len(strings), num_perm), dtype=np.int64)
+    for start in range(0, len(strings), chunk_size):
+        shingles_hashes, offsets = [], []
+        for string in strings[start:start + chunk_size]:
+            offsets.append(len(shingles_hashes))
+            shingles_hashes.extend(zlib.crc32(shingle.encode('utf-8')) & prime
+                                   for shingle in get_q_grams(string, shingle_size) or [''])
+        hashes = (a * np.array(shingles_hashes, dtype=np.int64) + b) % prime
+        signatures[start:start + len(offsets)] = np.minimum.reduceat(hashes, offsets, axis=1).T
+    return signatures
+
+
+def get_minhash_candidate_pairs(strings, num_perm=64, bands=16, shingle_size=2, seed=0, max_bucket_size=1000):
+    """
+    Approximate blocking with MinHash LSH : strings sharing a band of their signatures are candidates (pairs of
+    strings with low characters n-grams Jaccard similarity may be missed, used for large vocabularies)
+
+    :param strings: compared strings (list)
+    :param num_perm: number of hash functions
+    :param bands: number of LSH bands (num_perm / bands rows by band)
+    :param shingle_size: characters n-grams size
+    :param seed: random seed of hash functions
+    :param max_bucket_size: maximal number of strings of a band bucket (larger buckets are skipped)
+
+    :return: chunks of candidate pairs of strings indexes (generator of numpy arrays of shape (n_pairs, 2), a pair
+    may be in several chunks)
+    """
+    signatures = get_minhash_signatures(strings, num_perm, shingle_size, seed)
+    rows = num_perm // bands
+    for band in range(bands):
+        band_signatures = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        _, bucket_ids = np.unique(band_signatures.view([('', band_signatures.dtype)] * rows), return_inverse=True)
+        bucket_ids = bucket_ids.ravel()
+        order = np.argsort(bucket_ids, kind='stable')
+        boundaries = np.flatnonzero(np.diff(bucket_ids[order])) + 1
+        candidate_pairs = [pair for bucket in np.split(order, boundaries) if 1 < len(bucket) <= max_bucket_size
+                           for pair in itertools.combinations(bucket.tolist(), 2)]
+        yield np.array(candidate_pairs, dtype=np.int64).reshape(-1, 2)
+
+
+########################################################################################################################
+#                                              SIMILAR WORDS FILTER                                                    #
+########################################################################################################################
+
+
+class SimilarWordsFilter:
+
+    def __init__(self, threshold=0.50, metric=fuzz.token_set_ratio, blocking='prefix', minhash_params=None):
+        """
+        Find & filter similar words : distinct words are grouped by metric key, candidate pairs come from a blocking
+        step, are pruned with similarity upper bounds & are verified with the metric (same result as comparing every
+        pair of words with exact blocking)
+
+        :param threshold: similarity threshold ratio (words with metric * 0.01 > threshold are similar)
+        :param metric: fuzzywuzzy scorer (blocking is used for ratio, token_sort_ratio & token_set_ratio, other
+        metrics are computed on every pair of distinct words)
+        :param blocking: candidate pairs blocking, could be :
+
+               - 'prefix': exact q-grams prefix filtering
+               - 'minhash': approximate MinHash LSH on characters n-grams (for 100k+ words vocabularies)
+
+        :param minhash_params: get_minhash_candidate_pairs parameters (dict, e.g. {'num_perm': 64, 'bands': 16})
+        """
+        self.threshold = threshold
+        self.metric = metric
+        self.blocking = blocking
+        self.minhash_params = minhash_params or {}
+        self.stats = {}
+
+    def is_similar_pair(self, word_1, word_2, metric=None):
+        """
+        Check if a pair of words is similar (in both comparison orders, like filter_words_by_levenshtein_similarity)
+
+        :param word_1: a word
+        :param word_2: another word
+        :param metric: metric used instead of filter metric (e.g. get_strings_ratio on compared strings)
+
+        :return: boolean
+        """
+        metric = metric or self.metric
+        if metric(word_1, word_2) * 0.01 > self.threshold:
+            return True
+        return not (SYMMETRIC_RATIO and metric in list(BLOCKING_METRICS) + [get_strings_ratio]) and \
+            metric(word_2, word_1) * 0.01 > self.threshold
+
+    def get_candidate_pairs(self, keys, strings):
+        """
+        Candidate pairs of distinct keys, sorted by decreasing similarity upper bound (most likely similar pairs are
+        verified first, so that pairs of already similar keys are skipped)
+
+        :param keys: distinct word keys (list)
+        :param strings: compared strings of keys (list)
+
+        :return: candidate pairs of keys indexes (list of tuples)
+        """
+        if self.metric not in BLOCKING_METRICS or self.threshold < 0.005:
+            return list(itertools.combinations(range(len(keys)), 2))
+        if not any(strings):
+            return []
+        # Metrics are rounded percentages
+        min_ratio = self.threshold - 0.005
+        if self.blocking == 'prefix':
+            candidate_pairs = get_prefix_candidate_pairs(strings, min_ratio)
+        elif self.blocking == 'minhash':
+            candidate_pairs = get_minhash_candidate_pairs(strings, **self.minhash_params)
+        else:
+            raise Exception(f'{self.blocking} blocking not implemented')
+        # Characters & bigrams overlaps bounds of each chunk of candidate pairs
+        lengths = np.array([len(string) for string in strings], dtype=np.int64)
+        characters_counts = get_q_grams_counts(strings, q=1)
+        bigrams_counts = get_q_grams_counts(strings, q=2) if min_ratio > 2 / 3 else None
+        upper_bounds = {}
+        for pairs in candidate_pairs:
+            pairs_lengths = lengths[pairs].sum(axis=1)
+            pairs_upper_bounds = 2 * get_q_grams_overlaps(characters_counts, pairs) / np.maximum(pairs_lengths, 1)
+            kept = pairs_upper_bounds >= min_ratio
+            if bigrams_counts is not None:
+                kept[kept] = get_q_grams_overlaps(bigrams_counts, pairs[kept]) >= \
+                    get_min_q_grams_overlap(pairs_lengths[kept], min_ratio, q=2) - 1e-9
+            upper_bounds.update(zip(map(tuple, pairs[kept].tolist()), pairs_upper_bounds[kept].tolist()))
+        if self.metric is fuzz.token_set_ratio and self.blocking == 'prefix':
+            # Words with common tokens are compared on their tokens intersection (not bounded by q-grams overlaps)
+            token_index = defaultdict(list)
+            for i, key in enumerate(keys):
+                for token in set(key.split()):
+                    token_index[token].append(i)
+            for i, key in enumerate(keys):
+                if len(key.split()) > 1:
+                    for j in set(j for token in set(key.split()) for j in token_index[token] if j != i):
+                        upper_bound = get_token_set_upper_bound(key, keys[j])
+                        if upper_bound >= min_ratio:
+                            upper_bounds[(min(i, j), max(i, j))] = upper_bound
+        elif self.metric is fuzz.token_set_ratio:
+            # Approximate blocking : only words whose tokens are a subset of other words tokens (token_set_ratio is 100)
+            token_set_index = defaultdict(list)
+            for i, key in enumerate(keys):
+                token_set_index[frozenset(key.split())].append(i)
+            for token_set, indexes in token_set_index.items():
+                upper_bounds.update((pair, 1) for pair in itertools.combinations(indexes, 2))
+                for size in range(1, min(len(token_set), 8)):
+                    for subset in itertools.combinations(sorted(token_set), size):
+                        upper_bounds.update(((min(i, j), max(i, j)), 1) for i in indexes
+                                            for j in token_set_index.get(frozenset(subset), []))
+        return sorted(upper_bounds, key=upper_bounds.get, reverse=True)
+
+    def get_similar_words(self, words):
+        """
+        Get words similar to at least one other word of the list
+
+        :param words: list of words
+
+        :return: similar words (set)
+        """
+        key_function, string_function = BLOCKING_METRICS.get(self.metric, (None, None))
+        word_keys = {word: (key_function or str)(word) for word in set(words)}
+        key_counts = Counter(word_keys[word] for word in words)
+        keys = list(key_counts)
+        strings = [(string_function or str)(key) for key in keys]
+        similar_keys = set()
+        # Several occurrences of a key (repeated word or words with same processed string)
+        for key, count in key_counts.items():
+            if count > 1 and self.metric(key, key) * 0.01 > self.threshold:
+                similar_keys.add(key)
+        candidate_pairs = self.get_candidate_pairs(keys, strings)
+        verified_pairs = 0
+        for i, j in candidate_pairs:
+            if keys[i] not in similar_keys or keys[j] not in similar_keys:
+                verified_pairs += 1
+                # token_sort_ratio & token_set_ratio of words without common token are ratios of compared strings
+                if self.metric is fuzz.token_sort_ratio or \
+                        (self.metric is fuzz.token_set_ratio and set(keys[i].split()).isdisjoint(keys[j].split())):
+                    is_similar = self.is_similar_pair(strings[i], strings[j], metric=get_strings_ratio)
+                else:
+                    is_similar = self.is_similar_pair(keys[i], keys[j])
+                if is_similar:
+                    similar_keys.update([keys[i], keys[j]])
+        self.stats = {'words': len(words),
+                      'distinct_keys': len(keys),
+                      'candidate_pairs': len(candidate_pairs),
+                      'verified_pairs': verified_pairs,
+                      'similar_words': sum(key in similar_keys for key in word_keys.values())}
+        return {word for word, key in word_keys.items() if key in similar_keys}
+
+    def filter(self, words):
+        """
+        Filter similar words from a list of words
+
+        :param words: list of words
+
+        :return: list of words filtered by similarity (order is kept)
+        """
+        similar_words = self.get_similar_words(words)
+        return [word for word in words if word not in similar_words]
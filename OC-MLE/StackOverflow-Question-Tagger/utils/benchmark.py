@@ -0,0 +1,245 @@
+import time
+import string
+from src.nlp.text_preprocessor import np, pd, keras
+from src.nlp.sequence_encoder import SequenceEncoder
+from src.nlp.sequence_dataset import load_sequence_dataset, get_shards_meta
+from src.nlp.dnn import get_memory_usage, TrainingMonitor, build_embedding_matrix
+from src.nlp.word_similarity import fuzz, SimilarWordsFilter
+
+
+########################################################################################################################
+#                                              WORD SIMILARITY FILTER                                                  #
+########################################################################################################################
+
+
+def generate_vocabulary(n_words, typo_ratio=0.2, seed=0):
+    """
+    Generate a synthetic tokens vocabulary (random words, some technical tokens & misspelled variants)
+
+    :param n_words: vocabulary size
+    :param typo_ratio: ratio of words generated as misspelled variants of previous words
+    :param seed: random seed
+
+    :return: list of distinct words
+    """
+    random_state = np.random.RandomState(seed)
+    letters = np.array(list(string.ascii_lowercase))
+    vocabulary, words = set(), []
+    while len(words) < n_words:
+        if len(words) > 0 and random_state.rand() < typo_ratio:
+            # Misspelled variant (one substituted, deleted or inserted letter)
+            word = list(words[random_state.randint(len(words))])
+            position = random_state.randint(len(word))
+            operation = random_state.randint(3)
+            if operation == 0:
+                word[position] = random_state.choice(letters)
+            elif operation == 1 and len(word) > 2:
+                del word[position]
+            else:
+                word.insert(position, random_state.choice(letters))
+            word = ''.join(word)
+        else:
+            word = ''.join(random_state.choice(letters, size=random_state.randint(3, 13)))
+            # Technical tokens (e.g. 'node.js', 'c++', 'python3')
+            suffix = random_state.randint(50)
+            word += {0: '.js', 1: '++', 2: str(random_state.randint(10))}.get(suffix, '')
+        if word not in vocabulary:
+            vocabulary.add(word)
+            words.append(word)
+    return words
+
+
+def benchmark_similar_words_filter(vocabulary_sizes=(10000, 100000, 1000000), threshold=0.80,
+                                   metric=fuzz.token_set_ratio, blockings=('prefix', 'minhash'), max_prefix_size=100000,
+                                   minhash_params=None, seed=0):
+    """
+    Benchmark SimilarWordsFilter blockings on synthetic vocabularies (MinHash recall is measured against exact prefix
+    blocking when both run on the same vocabulary)
+
+    :param vocabulary_sizes: vocabulary sizes
+    :param threshold: similarity threshold ratio (near duplicates of a vocabulary)
+    :param metric: fuzzywuzzy scorer
+    :param blockings: benchmarked blockings ('prefix' and/or 'minhash')
+    :param max_prefix_size: maximal vocabulary size of exact prefix blocking (slower on low thresholds)
+    :param minhash_params: get_minhash_candidate_pairs parameters (dict)
+    :param seed: random seed
+
+    :return: a dataframe with run time, candidate pairs & similar words of each blocking by vocabulary size
+    """
+    results = []
+    for vocabulary_size in vocabulary_sizes:
+        vocabulary = generate_vocabulary(vocabulary_size, seed=seed)
+        similar_words_by_blocking, results_by_blocking = {}, {}
+        for blocking in blockings:
+            if blocking == 'prefix' and vocabulary_size > max_prefix_size:
+                continue
+            similar_words_filter = SimilarWordsFilter(threshold=threshold, metric=metric, blocking=blocking,
+                                                      minhash_params=minhash_params)
+            start_time = time.perf_counter()
+            similar_words_by_blocking[blocking] = similar_words_filter.get_similar_words(vocabulary)
+            run_time = time.perf_counter() - start_time
+            results_by_blocking[blocking] = {'vocabulary_size': vocabulary_size,
+                                             'blocking': blocking,
+                                             'run_time_s': round(run_time, 3),
+                                             'words_per_s': round(vocabulary_size / run_time, 1),
+                                             'candidate_pairs': similar_words_filter.stats['candidate_pairs'],
+                                             'verified_pairs': similar_words_filter.stats['verified_pairs'],
+                                             'similar_words': similar_words_filter.stats['similar_words']}
+        if 'prefix' in similar_words_by_blocking and 'minhash' in similar_words_by_blocking:
+            exact_similar_words = similar_words_by_blocking['prefix']
+            found_similar_words = exact_similar_words & similar_words_by_blocking['minhash']
+            recall = len(found_similar_words) / max(len(exact_similar_words), 1)
+            results_by_blocking['minhash']['recall'] = round(recall, 4)
+        results.extend(results_by_blocking.values())
+    return pd.DataFrame(results)
+
+
+########################################################################################################################
+#                                               SEQUENCE ENCODER                                                       #
+########################################################################################################################
+
+
+def benchmark_sequence_encoder(tokenizer, texts, maxlen=100, batch_size=512, n_runs=3, **padding_params):
+    """
+    Compare keras texts_to_sequences + pad_sequences & SequenceEncoder batches (throughput & identical outputs)
+
+    :param tokenizer: a fitted keras Tokenizer
+    :param texts: texts (str) or lists of normalized tokens (joined for keras)
+    :param maxlen: padded sequences length
+    :param batch_size: number of texts by batch
+    :param n_runs: number of runs (SequenceEncoder cache is warm after first run)
+    :param padding_params: pad_sequences parameters (padding, truncating, value)
+
+    :return: a dataframe with best & first run times, texts by second & identical outputs of each encoder
+    """
+    keras_texts = [text if isinstance(text, str) else ' '.join(text) for text in texts]
+    batches = [(start, start + batch_size) for start in range(0, len(texts), batch_size)]
+    encoder = SequenceEncoder.from_tokenizer(tokenizer)
+    encoders = {'keras': lambda start, end: keras.preprocessing.sequence.pad_sequences(
+                    tokenizer.texts_to_sequences(keras_texts[start:end]), maxlen=maxlen, **padding_params),
+                'sequence_encoder': lambda start, end: encoder.encode_batch(texts[start:end], maxlen=maxlen,
+                                                                            **padding_params)}
+    results, outputs = [], {}
+    for name, encode in encoders.items():
+        run_times = []
+        for _ in range(n_runs):
+            start_time = time.perf_counter()
+            outputs[name] = np.concatenate([encode(start, end) for start, end in batches])
+            run_times.append(time.perf_counter() - start_time)
+        results.append({'encoder': name,
+                        'first_run_s': round(run_times[0], 4),
+                        'best_run_s': round(min(run_times), 4),
+                        'texts_per_s': round(len(texts) / min(run_times), 1),
+                        'identical_outputs': bool(np.array_equal(outputs[name], outputs['keras']))})
+    return pd.DataFrame(results)
+
+
+########################################################################################################################
+#                                               SEQUENCE DATASET                                                       #
+########################################################################################################################
+
+
+def benchmark_sequence_dataset(folder, batch_sizes=(128, 512), n_epochs=2, **dataset_params):
+    """
+    Benchmark streamed shards input pipeline alone (examples by second & memory while iterating over all batches)
+
+    :param folder: shards folder (see write_sequence_shards)
+    :param batch_sizes: benchmarked batch sizes
+    :param n_epochs: number of passes over shards (first pass includes pipeline warm up)
+    :param dataset_params: load_sequence_dataset parameters (e.g. maxlen, shuffle_buffer_size)
+
+    :return: a dataframe with first & best epoch run times, examples by second & memory of each batch size
+    """
+    n_examples = get_shards_meta(folder)['n_examples']
+    results = []
+    for batch_size in batch_sizes:
+        dataset = load_sequence_dataset(folder, batch_size=batch_size, **dataset_params)
+        run_times, peak_memory = [], 0
+        for _ in range(n_epochs):
+            start_time = time.perf_counter()
+            for _ in dataset:
+                pass
+            run_times.append(time.perf_counter() - start_time)
+            peak_memory = max(peak_memory, get_memory_usage()[0] or 0)
+        results.append({'batch_size': batch_size,
+                        'first_epoch_s': round(run_times[0], 3),
+                        'best_epoch_s': round(min(run_times), 3),
+                        'examples_per_s': round(n_examples / min(run_times), 1),
+                        'memory_mb': round(peak_memory, 1),
+                        'max_memory_mb': round(get_memory_usage()[1], 1)})
+    return pd.DataFrame(results)
+
+
+def benchmark_bucketed_training(build_model, folder, batch_size=256, maxlen=None,
+                                bucket_boundaries=(16, 32, 64, 128), n_epochs=2):
+    """
+    Compare training on fixed length & length bucketed batches (tokens by second, tokens are non padding words)
+
+    :param build_model: function returning a new compiled keras model, its embedding layer must mask zeros (e.g. built
+    with DNN.add_embedding_layer(variable_length=True))
+    :param folder: shards folder (see write_sequence_shards)
+    :param batch_size: number of examples by batch
+    :param maxlen: padded sequences length (None : longest sequence length of shards)
+    :param bucket_boundaries: upper length boundaries of length buckets
+    :param n_epochs: number of training epochs (first epoch includes graph tracing)
+
+    :return: a dataframe with first & best epoch run times & tokens by second of each batching
+    """
+    n_tokens = get_shards_meta(folder)['n_tokens']
+    results = []
+    for batching, boundaries in [('fixed', None), ('bucketed', bucket_boundaries)]:
+        dataset = load_sequence_dataset(folder, batch_size=batch_size, maxlen=maxlen, bucket_boundaries=boundaries)
+        training_monitor = TrainingMonitor(verbose=False)
+        build_model().fit(dataset, epochs=n_epochs, verbose=0, callbacks=[training_monitor])
+        run_times = [epoch_report['run_time_s'] for epoch_report in training_monitor.report]
+        peak_memory = max(epoch_report['peak_memory_mb'] for epoch_report in training_monitor.report)
+        results.append({'batching': batching,
+                        'first_epoch_s': run_times[0],
+                        'best_epoch_s': min(run_times),
+                        'tokens_per_s': round(n_tokens / min(run_times), 1),
+                        'peak_memory_mb': peak_memory})
+    return pd.DataFrame(results)
+
+
+########################################################################################################################
+#                                               EMBEDDING MATRIX                                                       #
+########################################################################################################################
+
+
+def benchmark_embedding_matrix(word_index, keyed_vectors, dtypes=('float32', 'float16'), n_runs=3):
+    """
+    Compare embedding matrix construction by a loop over tokenizer words & build_embedding_matrix (run time, memory
+    & identical matrices)
+
+    :param word_index: tokenizer word index (dict of word & index)
+    :param keyed_vectors: gensim KeyedVectors (e.g. memory mapped by load_word_vectors)
+    :param dtypes: build_embedding_matrix types
+    :param n_runs: number of runs (best run is kept)
+
+    :return: a dataframe with best run time, matrix size & identical matrices of each builder
+    """
+    def build_loop_embedding_matrix():
+        embedding_matrix = np.zeros((max(word_index.values(), default=0) + 1, keyed_vectors.vector_size))
+        for word, i in word_index.items():
+            if word in keyed_vectors:
+                embedding_matrix[i] = keyed_vectors[word]
+        return embedding_matrix
+
+    builders = {'loop': build_loop_embedding_matrix}
+    builders.update({f'vectorized_{dtype}': lambda dtype=dtype: build_embedding_matrix(word_index, keyed_vectors,
+                                                                                       dtype=dtype)
+                     for dtype in dtypes})
+    results, matrices = [], {}
+    for name, build in builders.items():
+        run_times = []
+        for _ in range(n_runs):
+            start_time = time.perf_counter()
+            matrices[name] = build()
+            run_times.append(time.perf_counter() - start_time)
+        results.append({'builder': name,
+                        'best_run_s': round(min(run_times), 4),
+                        'words_per_s': round(len(word_index) / min(run_times), 1),
+                        'matrix_mb': round(matrices[name].nbytes / 1024 ** 2, 1),
+                        'identical_matrix': bool(np.array_equal(matrices[name],
+                                                                matrices['loop'].astype(matrices[name].dtype)))})
+    return pd.DataFrame(results)